@@ -0,0 +1,35 @@
+"""add smtp send rate limits
+
+Revision ID: 0a6d3f8e5b12
+Revises: f5c8b2e19a47
+Create Date: 2026-10-17 14:02:17.640215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0a6d3f8e5b12'
+down_revision: Union[str, None] = 'f5c8b2e19a47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('smtp_rate_buckets',
+    sa.Column('name', sa.String(length=20), nullable=False),
+    sa.Column('tokens', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.add_column('smtp_settings', sa.Column('rate_per_minute', sa.Integer(), server_default='30', nullable=False))
+    op.add_column('smtp_settings', sa.Column('rate_per_day', sa.Integer(), server_default='10000', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('smtp_settings', 'rate_per_day')
+    op.drop_column('smtp_settings', 'rate_per_minute')
+    op.drop_table('smtp_rate_buckets')
@@ -0,0 +1,26 @@
+"""add email outbox text part
+
+Revision ID: 1b7e4c2d9f30
+Revises: 0a6d3f8e5b12
+Create Date: 2026-10-17 14:48:05.102937
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1b7e4c2d9f30'
+down_revision: Union[str, None] = '0a6d3f8e5b12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('email_outbox', sa.Column('text', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('email_outbox', 'text')
@@ -0,0 +1,78 @@
+"""compact submission scores
+
+Revision ID: 2c9f5a1e7d48
+Revises: 1b7e4c2d9f30
+Create Date: 2026-10-17 16:21:37.418206
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2c9f5a1e7d48'
+down_revision: Union[str, None] = '1b7e4c2d9f30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SURVEY_RESPONSES_VIEW = """
+CREATE VIEW survey_responses AS
+SELECT s.submission_hash,
+       s.survey_name,
+       s.department,
+       r.question_no::integer AS question_no,
+       r.score::integer AS score,
+       s.created_at
+FROM submission_scores s
+CROSS JOIN LATERAL unnest(s.scores) WITH ORDINALITY AS r(score, question_no)
+"""
+
+
+def upgrade() -> None:
+    op.create_table('submission_scores',
+    sa.Column('submission_hash', sa.String(length=128), nullable=False),
+    sa.Column('survey_name', sa.String(length=50), nullable=False),
+    sa.Column('department', sa.String(length=255), nullable=False),
+    sa.Column('scores', postgresql.ARRAY(sa.SmallInteger()), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('submission_hash')
+    )
+    # One row per submission, answers in question order
+    op.execute("""
+        INSERT INTO submission_scores (submission_hash, survey_name, department, scores, created_at)
+        SELECT submission_hash,
+               min(survey_name),
+               min(department),
+               array_agg(score::smallint ORDER BY question_no),
+               min(created_at)
+        FROM survey_responses
+        GROUP BY submission_hash
+    """)
+    op.drop_table('survey_responses')
+    op.execute(SURVEY_RESPONSES_VIEW)
+
+
+def downgrade() -> None:
+    op.execute("DROP VIEW survey_responses")
+    op.create_table('survey_responses',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('submission_hash', sa.String(length=128), nullable=False),
+    sa.Column('survey_name', sa.String(length=50), nullable=False),
+    sa.Column('department', sa.String(length=255), nullable=False),
+    sa.Column('question_no', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("""
+        INSERT INTO survey_responses (submission_hash, survey_name, department, question_no, score, created_at)
+        SELECT s.submission_hash, s.survey_name, s.department, r.question_no, r.score, s.created_at
+        FROM submission_scores s
+        CROSS JOIN LATERAL unnest(s.scores) WITH ORDINALITY AS r(score, question_no)
+        ORDER BY s.submission_hash, r.question_no
+    """)
+    op.drop_table('submission_scores')
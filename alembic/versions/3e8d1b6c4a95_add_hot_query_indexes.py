@@ -0,0 +1,44 @@
+"""add hot query indexes
+
+Revision ID: 3e8d1b6c4a95
+Revises: 2c9f5a1e7d48
+Create Date: 2026-10-17 17:05:12.660394
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3e8d1b6c4a95'
+down_revision: Union[str, None] = '2c9f5a1e7d48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction, so these
+# run in autocommit blocks and do not block writes on large tables. If one
+# fails it leaves an INVALID index behind; drop it and rerun the upgrade.
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_employees_department', 'employees', ['department'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_employees_position', 'employees', ['position'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_survey_assignments_pending', 'survey_assignments', ['manager_email', 'id'], unique=False, postgresql_where=sa.text('is_submitted = false'), postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_survey_assignments_manager_email', 'survey_assignments', ['manager_email'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_survey_assignments_survey_status', 'survey_assignments', ['survey_name', 'is_submitted'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_employee_submissions_submission_hash', 'employee_submissions', ['submission_hash'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_submission_totals_employee_id', 'submission_totals', ['employee_id'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_submission_totals_employee_id', table_name='submission_totals', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_employee_submissions_submission_hash', table_name='employee_submissions', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_survey_assignments_survey_status', table_name='survey_assignments', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_survey_assignments_manager_email', table_name='survey_assignments', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_survey_assignments_pending', table_name='survey_assignments', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_employees_position', table_name='employees', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_employees_department', table_name='employees', postgresql_concurrently=True, if_exists=True)
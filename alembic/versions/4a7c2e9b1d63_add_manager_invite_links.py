@@ -0,0 +1,33 @@
+"""add manager invite links
+
+Revision ID: 4a7c2e9b1d63
+Revises: 3e8d1b6c4a95
+Create Date: 2026-10-17 18:12:40.218577
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4a7c2e9b1d63'
+down_revision: Union[str, None] = '3e8d1b6c4a95'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('manager_invite_links',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('manager_email', sa.String(length=255), nullable=False),
+    sa.Column('token_hash', sa.String(length=128), nullable=False),
+    sa.Column('issued_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('manager_email')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('manager_invite_links')
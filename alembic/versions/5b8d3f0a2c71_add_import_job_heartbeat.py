@@ -0,0 +1,26 @@
+"""add import job heartbeat
+
+Revision ID: 5b8d3f0a2c71
+Revises: 4a7c2e9b1d63
+Create Date: 2026-10-17 19:02:11.538214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b8d3f0a2c71'
+down_revision: Union[str, None] = '4a7c2e9b1d63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('import_jobs', sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('import_jobs', 'heartbeat_at')
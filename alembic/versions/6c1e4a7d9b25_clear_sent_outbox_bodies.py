@@ -0,0 +1,33 @@
+"""clear sent outbox bodies
+
+Revision ID: 6c1e4a7d9b25
+Revises: 5b8d3f0a2c71
+Create Date: 2026-10-17 20:14:03.771920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6c1e4a7d9b25'
+down_revision: Union[str, None] = '5b8d3f0a2c71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.alter_column('email_outbox', 'html',
+               existing_type=sa.Text(),
+               nullable=True)
+    # Emails already sent no longer need their survey links
+    op.execute("UPDATE email_outbox SET html = NULL, text = NULL WHERE status = 'sent'")
+
+
+def downgrade() -> None:
+    op.execute("UPDATE email_outbox SET html = '' WHERE html IS NULL")
+    op.alter_column('email_outbox', 'html',
+               existing_type=sa.Text(),
+               nullable=False)
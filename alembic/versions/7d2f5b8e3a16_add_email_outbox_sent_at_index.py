@@ -0,0 +1,31 @@
+"""add email outbox sent_at index
+
+Revision ID: 7d2f5b8e3a16
+Revises: 6c1e4a7d9b25
+Create Date: 2026-10-17 21:02:47.318544
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d2f5b8e3a16'
+down_revision: Union[str, None] = '6c1e4a7d9b25'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Built CONCURRENTLY so a large outbox stays writable; see
+# 3e8d1b6c4a95_add_hot_query_indexes for recovering from an INVALID index.
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_email_outbox_sent_at', 'email_outbox', ['sent_at'], unique=False, postgresql_where=sa.text("status = 'sent'"), postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_email_outbox_sent_at', table_name='email_outbox', postgresql_concurrently=True, if_exists=True)
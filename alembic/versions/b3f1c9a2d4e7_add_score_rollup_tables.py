@@ -0,0 +1,69 @@
+"""add score rollup tables
+
+Revision ID: b3f1c9a2d4e7
+Revises: 640e1972799f
+Create Date: 2026-10-17 09:12:41.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3f1c9a2d4e7'
+down_revision: Union[str, None] = '640e1972799f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('submission_totals',
+    sa.Column('submission_hash', sa.String(length=128), nullable=False),
+    sa.Column('employee_id', sa.Integer(), nullable=False),
+    sa.Column('survey_name', sa.String(length=50), nullable=False),
+    sa.Column('total_score', sa.Integer(), nullable=False),
+    sa.Column('question_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['employee_id'], ['employees.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('submission_hash')
+    )
+    op.create_table('employee_score_rollups',
+    sa.Column('employee_id', sa.Integer(), nullable=False),
+    sa.Column('survey_name', sa.String(length=50), nullable=False),
+    sa.Column('department', sa.String(length=255), nullable=False),
+    sa.Column('position', sa.String(length=255), nullable=False),
+    sa.Column('score_sum', sa.Integer(), nullable=False),
+    sa.Column('submission_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['employee_id'], ['employees.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('employee_id', 'survey_name')
+    )
+    op.create_table('question_score_rollups',
+    sa.Column('survey_name', sa.String(length=50), nullable=False),
+    sa.Column('question_no', sa.Integer(), nullable=False),
+    sa.Column('score_sum', sa.Integer(), nullable=False),
+    sa.Column('response_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('survey_name', 'question_no')
+    )
+    op.create_table('department_score_rollups',
+    sa.Column('survey_name', sa.String(length=50), nullable=False),
+    sa.Column('department', sa.String(length=255), nullable=False),
+    sa.Column('avg_sum', sa.Float(), nullable=False),
+    sa.Column('employee_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('survey_name', 'department')
+    )
+    op.create_table('position_score_rollups',
+    sa.Column('survey_name', sa.String(length=50), nullable=False),
+    sa.Column('position', sa.String(length=255), nullable=False),
+    sa.Column('avg_sum', sa.Float(), nullable=False),
+    sa.Column('employee_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('survey_name', 'position')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('position_score_rollups')
+    op.drop_table('department_score_rollups')
+    op.drop_table('question_score_rollups')
+    op.drop_table('employee_score_rollups')
+    op.drop_table('submission_totals')
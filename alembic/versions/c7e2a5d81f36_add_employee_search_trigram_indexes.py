@@ -0,0 +1,29 @@
+"""add employee search trigram indexes
+
+Revision ID: c7e2a5d81f36
+Revises: b3f1c9a2d4e7
+Create Date: 2026-10-17 10:03:27.581904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7e2a5d81f36'
+down_revision: Union[str, None] = 'b3f1c9a2d4e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index('ix_employees_name_trgm', 'employees', ['name'], unique=False, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('ix_employees_email_trgm', 'employees', ['email'], unique=False, postgresql_using='gin', postgresql_ops={'email': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    op.drop_index('ix_employees_email_trgm', table_name='employees')
+    op.drop_index('ix_employees_name_trgm', table_name='employees')
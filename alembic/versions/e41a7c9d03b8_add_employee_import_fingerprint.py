@@ -0,0 +1,28 @@
+"""add employee import fingerprint
+
+Revision ID: e41a7c9d03b8
+Revises: d94b6e0c2a51
+Create Date: 2026-10-17 12:02:31.550184
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e41a7c9d03b8'
+down_revision: Union[str, None] = 'd94b6e0c2a51'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('employees', sa.Column('import_fingerprint', sa.String(length=64), nullable=True))
+    op.add_column('import_jobs', sa.Column('unchanged', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('import_jobs', 'unchanged')
+    op.drop_column('employees', 'import_fingerprint')
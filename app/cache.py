@@ -0,0 +1,105 @@
+"""
+In-process caches.
+
+Each process keeps its own copy. Writes publish an invalidation topic (see
+app.invalidation), which bumps the matching cache in this worker after the
+commit and in every other worker via LISTEN/NOTIFY.
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+from app import invalidation
+from app.config import settings
+
+MISSING = object()
+
+
+class VersionedCache:
+    """
+    Bounded LRU cache with versioned invalidation. `bump()` invalidates every
+    entry at once and `discard(key)` a single one; entries also expire after
+    `ttl` seconds as a ceiling.
+
+    Callers read `version` *before* computing a value and pass it to `set()`,
+    so a value computed from data that a concurrent write has since replaced
+    is never stored: `set()` refuses it if the cache was bumped, or that key
+    discarded, after the version was read. Discarded keys leave a tombstone
+    (at most `max_size` of them; stores that started before an evicted
+    tombstone are refused too).
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        # Advanced by every bump() and discard()
+        self.version = 0
+        self._bumped_at = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        # key -> version of its last discard
+        self._tombstones: "OrderedDict[Hashable, int]" = OrderedDict()
+        self._tombstone_floor = 0
+
+    def get(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISSING
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, version: Optional[int] = None) -> None:
+        if version is None:
+            version = self.version
+        if version < self._bumped_at or version < self._tombstone_floor:
+            return
+        if version < self._tombstones.get(key, 0):
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def discard(self, key: Hashable) -> None:
+        self.version += 1
+        self._entries.pop(key, None)
+        self._tombstones[key] = self.version
+        self._tombstones.move_to_end(key)
+        while len(self._tombstones) > self.max_size:
+            _, discarded_at = self._tombstones.popitem(last=False)
+            self._tombstone_floor = max(self._tombstone_floor, discarded_at)
+
+    def bump(self) -> None:
+        self.version += 1
+        self._bumped_at = self.version
+        self._entries.clear()
+        self._tombstones.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Computed survey_stats entries for the admin dashboard, keyed by survey code
+dashboard_cache = VersionedCache(
+    ttl=settings.dashboard_cache_ttl,
+    max_size=settings.dashboard_cache_max_size,
+)
+
+# Snapshot of the SMTP settings row used for sending
+smtp_cache = VersionedCache(ttl=settings.smtp_cache_ttl, max_size=1)
+
+# What the survey form needs about an invite link, keyed by token hash.
+# Submitting evicts that link's entry; token rotations and employee changes
+# clear them all.
+survey_form_cache = VersionedCache(
+    ttl=settings.survey_form_cache_ttl,
+    max_size=settings.survey_form_cache_max_size,
+)
+
+invalidation.on_invalidate(invalidation.DASHBOARD, dashboard_cache.bump)
+invalidation.on_invalidate(invalidation.SMTP, smtp_cache.bump)
+invalidation.on_invalidate(invalidation.SURVEY_FORMS, survey_form_cache.bump)
+invalidation.on_invalidate_key(invalidation.SURVEY_FORMS, survey_form_cache.discard)
@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from pydantic import Field
+from datetime import date
 from typing import Optional
 
 class Settings(BaseSettings):
@@ -13,6 +14,19 @@ class Settings(BaseSettings):
     app_host: str = Field(default="0.0.0.0", alias="APP_HOST")
     app_port: int = Field(default=8000, alias="APP_PORT")
     environment: str = Field(default="development", alias="ENVIRONMENT")
+    # Also accept unsigned invite links issued before signed tokens (one DB lookup per hit).
+    # On for the rollout, so links emailed before signed tokens keep working, and
+    # retired on its own after LEGACY_INVITE_TOKENS_UNTIL (UTC date, inclusive).
+    accept_legacy_invite_tokens: bool = Field(default=True, alias="ACCEPT_LEGACY_INVITE_TOKENS")
+    legacy_invite_tokens_until: Optional[date] = Field(default=date(2026, 12, 31), alias="LEGACY_INVITE_TOKENS_UNTIL")
+
+    password_hash_workers: int = Field(default=2, alias="PASSWORD_HASH_WORKERS")
+    password_hash_queue: int = Field(default=8, alias="PASSWORD_HASH_QUEUE")
+    login_max_failures: int = Field(default=5, alias="LOGIN_MAX_FAILURES")
+    login_max_failures_per_ip: int = Field(default=20, alias="LOGIN_MAX_FAILURES_PER_IP")
+    login_failure_window: float = Field(default=300.0, alias="LOGIN_FAILURE_WINDOW")
+    # Comma-separated proxy addresses/networks whose X-Forwarded-For is believed
+    trusted_proxies: str = Field(default="", alias="TRUSTED_PROXIES")
 
     smtp_host: str = Field(default="localhost", alias="SMTP_HOST")
     smtp_port: int = Field(default=1025, alias="SMTP_PORT")
@@ -21,6 +35,37 @@ class Settings(BaseSettings):
     smtp_use_tls: bool = Field(default=False, alias="SMTP_USE_TLS")
     smtp_from_email: str = Field(default="survey@example.com", alias="SMTP_FROM_EMAIL")
     smtp_from_name: str = Field(default="Survey Bot", alias="SMTP_FROM_NAME")
+    smtp_validate_certs: bool = Field(default=True, alias="SMTP_VALIDATE_CERTS")
+
+    dashboard_cache_ttl: float = Field(default=30.0, alias="DASHBOARD_CACHE_TTL")
+    dashboard_cache_max_size: int = Field(default=32, alias="DASHBOARD_CACHE_MAX_SIZE")
+    smtp_cache_ttl: float = Field(default=300.0, alias="SMTP_CACHE_TTL")
+    survey_form_cache_ttl: float = Field(default=60.0, alias="SURVEY_FORM_CACHE_TTL")
+    survey_form_cache_max_size: int = Field(default=10000, alias="SURVEY_FORM_CACHE_MAX_SIZE")
+
+    smtp_pool_size: int = Field(default=4, alias="SMTP_POOL_SIZE")
+    smtp_pool_idle_timeout: float = Field(default=60.0, alias="SMTP_POOL_IDLE_TIMEOUT")
+    smtp_pool_max_messages: int = Field(default=100, alias="SMTP_POOL_MAX_MESSAGES")
+    smtp_rate_burst: int = Field(default=3, alias="SMTP_RATE_BURST")
+    smtp_rate_max_wait: float = Field(default=60.0, alias="SMTP_RATE_MAX_WAIT")
+    email_concurrency: int = Field(default=4, alias="EMAIL_CONCURRENCY")
+    email_max_retries: int = Field(default=5, alias="EMAIL_MAX_RETRIES")
+    email_retry_backoff: float = Field(default=30.0, alias="EMAIL_RETRY_BACKOFF")
+    outbox_batch_size: int = Field(default=50, alias="OUTBOX_BATCH_SIZE")
+    outbox_poll_interval: float = Field(default=5.0, alias="OUTBOX_POLL_INTERVAL")
+    outbox_lease: float = Field(default=900.0, alias="OUTBOX_LEASE")
+    outbox_dead_retention_days: float = Field(default=7.0, alias="OUTBOX_DEAD_RETENTION_DAYS")
+    invite_stream_batch: int = Field(default=500, alias="INVITE_STREAM_BATCH")
+    batch_survey_links: bool = Field(default=False, alias="BATCH_SURVEY_LINKS")
+
+    submit_group_commit: bool = Field(default=False, alias="SUBMIT_GROUP_COMMIT")
+    submit_batch_size: int = Field(default=100, alias="SUBMIT_BATCH_SIZE")
+    submit_batch_window_ms: float = Field(default=5.0, alias="SUBMIT_BATCH_WINDOW_MS")
+
+    employees_page_size: int = Field(default=50, alias="EMPLOYEES_PAGE_SIZE")
+    import_chunk_size: int = Field(default=500, alias="IMPORT_CHUNK_SIZE")
+    import_spool_dir: Optional[str] = Field(default=None, alias="IMPORT_SPOOL_DIR")
+    import_job_stale_after: int = Field(default=900, alias="IMPORT_JOB_STALE_AFTER")
 
     class Config:
         env_file = ".env"
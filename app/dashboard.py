@@ -0,0 +1,153 @@
+"""
+Dashboard data layer.
+
+Everything the admin dashboard shows comes from two grouped queries: one row
+per survey (assignment counts plus question/department/position averages
+aggregated from the rollup tables, see app.rollups) and one row per
+employee average. Both return plain rows, no ORM objects are hydrated.
+"""
+from collections import defaultdict
+from typing import Dict
+
+from sqlalchemy import Float, cast, func, select
+from sqlalchemy.dialects.postgresql import JSON, aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+from app.cache import MISSING, dashboard_cache
+from app.utils import GRADING_FUNCTIONS, SURVEY_DETAILS
+
+
+def _averages_cte(model, key_col, sum_col, count_col, name: str):
+    """Per-survey JSON array of [key, average] pairs, ordered by key."""
+    avg = cast(sum_col, Float) / count_col
+    return (
+        select(
+            model.survey_name,
+            func.json_agg(
+                aggregate_order_by(func.json_build_array(key_col, avg), key_col),
+                type_=JSON,
+            ).label(name),
+        )
+        .where(count_col > 0)
+        .group_by(model.survey_name)
+        .cte(f"{name}_avgs")
+    )
+
+
+def survey_summary_stmt():
+    a = models.SurveyAssignment
+    counts = (
+        select(
+            a.survey_name,
+            func.count().label("total"),
+            func.count().filter(a.is_submitted).label("submitted"),
+        )
+        .group_by(a.survey_name)
+        .cte("assignment_counts")
+    )
+
+    q = models.QuestionScoreRollup
+    d = models.DepartmentScoreRollup
+    p = models.PositionScoreRollup
+    questions = _averages_cte(q, q.question_no, q.score_sum, q.response_count, "questions")
+    departments = _averages_cte(d, d.department, d.avg_sum, d.employee_count, "departments")
+    positions = _averages_cte(p, p.position, p.avg_sum, p.employee_count, "positions")
+
+    return (
+        select(
+            counts.c.survey_name,
+            counts.c.total,
+            counts.c.submitted,
+            questions.c.questions,
+            departments.c.departments,
+            positions.c.positions,
+        )
+        .select_from(counts)
+        .outerjoin(questions, questions.c.survey_name == counts.c.survey_name)
+        .outerjoin(departments, departments.c.survey_name == counts.c.survey_name)
+        .outerjoin(positions, positions.c.survey_name == counts.c.survey_name)
+    )
+
+
+def employee_averages_stmt():
+    r = models.EmployeeScoreRollup
+    return (
+        select(
+            r.survey_name,
+            models.Employee.name,
+            models.Employee.department,
+            models.Employee.position,
+            r.score_sum,
+            r.submission_count,
+        )
+        .join(models.Employee, models.Employee.id == r.employee_id)
+        .where(r.submission_count > 0)
+    )
+
+
+def build_survey_stats(survey_rows, employee_rows) -> Dict[str, dict]:
+    """Shapes the raw rows into the `survey_stats` dict used by dashboard.html."""
+    summaries = {row.survey_name: row for row in survey_rows}
+    individual = defaultdict(list)
+    for r in employee_rows:
+        individual[r.survey_name].append(r)
+
+    survey_stats = {}
+    for s_key, s_info in SURVEY_DETAILS.items():
+        summary = summaries.get(s_key)
+        if not summary or not summary.total:
+            continue
+        grading_func = GRADING_FUNCTIONS.get(s_key)
+
+        individual_scores = []
+        for r in individual.get(s_key, []):
+            score = r.score_sum / r.submission_count
+            individual_scores.append({
+                "name": r.name,
+                "department": r.department,
+                "position": r.position,
+                "score": score,
+                "submission_count": r.submission_count,
+                "category": grading_func(score) if grading_func else "N/A"
+            })
+        all_scores = [i["score"] for i in individual_scores]
+        overall_avg_val = sum(all_scores) / len(all_scores) if all_scores else 0
+
+        survey_stats[s_key] = {
+            "display_name": s_info["full_name"],
+            "total_employees": summary.total,
+            "submitted_employees": summary.submitted,
+            "pending_employees": summary.total - summary.submitted,
+            "questions": s_info["questions"],
+            "overall_avg": {"score": overall_avg_val, "category": grading_func(overall_avg_val)},
+            "dept_avgs": [{"name": n, "score": v, "category": grading_func(v)} for n, v in summary.departments or []],
+            "pos_avgs": [{"name": n, "score": v, "category": grading_func(v)} for n, v in summary.positions or []],
+            "question_avgs": [{"question_no": n, "score": v, "category": grading_func(v)} for n, v in summary.questions or []],
+            "individual_scores": sorted(individual_scores, key=lambda x: x['score'], reverse=True)
+        }
+
+    return survey_stats
+
+
+async def load_survey_stats(session: AsyncSession) -> Dict[str, dict]:
+    survey_rows = (await session.execute(survey_summary_stmt())).all()
+    employee_rows = (await session.execute(employee_averages_stmt())).all()
+    return build_survey_stats(survey_rows, employee_rows)
+
+
+async def get_survey_stats(session: AsyncSession) -> Dict[str, dict]:
+    """
+    `load_survey_stats`, served from `dashboard_cache` while no write has
+    bumped its version. Surveys without assignments are cached as None so
+    they count as hits too.
+    """
+    cached = {code: dashboard_cache.get(code) for code in SURVEY_DETAILS}
+    if all(v is not MISSING for v in cached.values()):
+        return {code: stats for code, stats in cached.items() if stats is not None}
+
+    version = dashboard_cache.version
+    survey_stats = await load_survey_stats(session)
+    for code in SURVEY_DETAILS:
+        dashboard_cache.set(code, survey_stats.get(code), version)
+    return survey_stats
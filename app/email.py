@@ -1,13 +1,253 @@
+import asyncio
 import os
 import socket
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
 from aiosmtplib import SMTP
 from email.message import EmailMessage
-from aiosmtplib.errors import SMTPAuthenticationError, SMTPException
+from aiosmtplib.errors import (
+    SMTPAuthenticationError,
+    SMTPConnectError,
+    SMTPException,
+    SMTPRecipientsRefused,
+    SMTPResponseException,
+    SMTPServerDisconnected,
+    SMTPTimeoutError,
+)
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+from app.cache import MISSING, smtp_cache
+from app.config import settings
+
+
+@dataclass(frozen=True)
+class SMTPConfig:
+    """Detached snapshot of the SMTP settings row, safe to share across requests"""
+    host: str
+    port: int
+    username: Optional[str]
+    password: Optional[str]
+    use_tls: bool
+    from_email: str
+    from_name: str
+    rate_per_minute: int
+    rate_per_day: int
+
+
+async def get_smtp_config(session: AsyncSession) -> SMTPConfig:
+    """SMTP settings for sending, cached until save_smtp publishes a change."""
+    config = smtp_cache.get("smtp")
+    if config is MISSING:
+        version = smtp_cache.version
+        row = (await session.execute(select(models.SMTPSettings).limit(1))).scalars().first()
+        if row is None:
+            raise RuntimeError("SMTP settings not initialized")
+        config = SMTPConfig(
+            host=row.host,
+            port=row.port,
+            username=row.username,
+            password=row.password,
+            use_tls=row.use_tls,
+            from_email=row.from_email,
+            from_name=row.from_name,
+            rate_per_minute=row.rate_per_minute,
+            rate_per_day=row.rate_per_day,
+        )
+        smtp_cache.set("smtp", config, version)
+    return config
+
+
+class _PooledConnection:
+    def __init__(self, smtp: SMTP):
+        self.smtp = smtp
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+
+class SMTPPool:
+    """
+    Reusable, authenticated SMTP connections to one server.
+
+    At most `size` connections are open (idle or in use). An idle connection
+    is reused if it was used less than `idle_timeout` seconds ago and has sent
+    fewer than `max_messages` messages; otherwise it is closed and replaced.
+    A send that fails because the server dropped the connection or answered
+    421 (service closing) is retried once on a fresh connection. Once the
+    pool is closed, connections still checked out are closed on release.
+    """
+
+    def __init__(
+        self,
+        *,
+        host: str,
+        port: int,
+        username: str,
+        password: str,
+        size: int,
+        idle_timeout: float,
+        max_messages: int,
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.idle_timeout = idle_timeout
+        self.max_messages = max(max_messages, 1)
+        self._idle: List[_PooledConnection] = []
+        self._slots = asyncio.Semaphore(max(size, 1))
+        self._closed = False
+
+    async def _connect(self) -> SMTP:
+        # Office365 on Port 587 requires start_tls=True
+        smtp = SMTP(
+            hostname=self.host,
+            port=self.port,
+            use_tls=False,
+            start_tls=True,
+            validate_certs=settings.smtp_validate_certs,
+            timeout=30,
+        )
+        print(f"[DEBUG] Connecting to {self.host}:{self.port}...")
+        await smtp.connect()
+
+        # Office365 handling: Explicitly discard XOAUTH2
+        # because we are using an App Password (Basic Auth)
+        if smtp.supported_auth_methods:
+            if "XOAUTH2" in smtp.supported_auth_methods:
+                smtp.supported_auth_methods.discard("XOAUTH2")
+            print(f"[DEBUG] Supported Auth Methods: {smtp.supported_auth_methods}")
+
+        print(f"[DEBUG] Attempting login for {self.username} using App Password...")
+        try:
+            await smtp.login(self.username, self.password)
+        except Exception:
+            await self._close(smtp)
+            raise
+        return smtp
+
+    @staticmethod
+    async def _close(smtp: SMTP) -> None:
+        try:
+            if smtp.is_connected:
+                await smtp.quit()
+        except Exception:  # noqa: BLE001
+            smtp.close()
+
+    async def _acquire(self) -> _PooledConnection:
+        await self._slots.acquire()
+        try:
+            now = time.monotonic()
+            while self._idle:
+                conn = self._idle.pop()
+                if conn.smtp.is_connected and now - conn.last_used < self.idle_timeout:
+                    return conn
+                await self._close(conn.smtp)
+            return _PooledConnection(await self._connect())
+        except BaseException:
+            self._slots.release()
+            raise
+
+    async def _release(self, conn: _PooledConnection, reusable: bool) -> None:
+        try:
+            if reusable and not self._closed and conn.sent < self.max_messages:
+                conn.last_used = time.monotonic()
+                self._idle.append(conn)
+            else:
+                await self._close(conn.smtp)
+        finally:
+            self._slots.release()
+
+    async def send_message(self, msg: EmailMessage) -> None:
+        for attempt in (1, 2):
+            conn = await self._acquire()
+            try:
+                await conn.smtp.send_message(msg)
+            except (SMTPServerDisconnected, ConnectionError) as e:
+                await self._release(conn, reusable=False)
+                if attempt == 2:
+                    raise
+                print(f"[DEBUG] SMTP connection lost ({e}), reconnecting...")
+                continue
+            except SMTPResponseException as e:
+                if e.code != 421:
+                    # A rejected message (e.g. 550 for one recipient): aiosmtplib
+                    # has already reset the envelope, so the session is reusable
+                    await self._release(conn, reusable=conn.smtp.is_connected)
+                    raise
+                await self._release(conn, reusable=False)
+                if attempt == 2:
+                    raise
+                print(f"[DEBUG] SMTP server closing connection (421), reconnecting...")
+                continue
+            except SMTPRecipientsRefused:
+                await self._release(conn, reusable=conn.smtp.is_connected)
+                raise
+            except BaseException:
+                await self._release(conn, reusable=False)
+                raise
+            conn.sent += 1
+            await self._release(conn, reusable=True)
+            return
+
+    async def close(self) -> None:
+        self._closed = True
+        while self._idle:
+            await self._close(self._idle.pop().smtp)
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    """True for failures worth retrying: lost connections, timeouts and 4xx replies."""
+    if isinstance(exc, (SMTPServerDisconnected, SMTPConnectError, SMTPTimeoutError, ConnectionError, asyncio.TimeoutError)):
+        return True
+    return isinstance(exc, SMTPResponseException) and 400 <= exc.code < 500
+
+
+# One pool per server/credentials; changing the SMTP settings starts a new one
+_pools: Dict[Tuple[str, int, str, str], SMTPPool] = {}
+# Serializes creating and replacing pools, so concurrent senders share one
+_pools_lock = asyncio.Lock()
+
+
+async def get_pool(host: str, port: int, username: str, password: str) -> SMTPPool:
+    key = (host, port, username, password)
+    pool = _pools.get(key)
+    if pool is not None:
+        return pool
+    async with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            stale = [_pools.pop(k) for k in list(_pools) if k != key]
+            pool = _pools[key] = SMTPPool(
+                host=host,
+                port=port,
+                username=username,
+                password=password,
+                size=settings.smtp_pool_size,
+                idle_timeout=settings.smtp_pool_idle_timeout,
+                max_messages=settings.smtp_pool_max_messages,
+            )
+            for old in stale:
+                await old.close()
+    return pool
+
+
+async def close_smtp_pools() -> None:
+    async with _pools_lock:
+        while _pools:
+            _, pool = _pools.popitem()
+            await pool.close()
+
 
 async def send_email(
     to_email: str,
     subject: str,
     html_content: str,
+    text_content: str = None,
     host: str = None,
     port: int = None,
     username: str = None,
@@ -32,42 +272,20 @@ async def send_email(
     msg["From"] = f"{from_name} <{from_email}>"
     msg["To"] = to_email
     msg["Subject"] = subject
-    
+
     # Standard headers to prevent spam flagging
     msg["Message-ID"] = f"<{os.urandom(16).hex()}@{socket.gethostname()}>"
-    
-    msg.set_content("This email requires HTML support.")
-    msg.add_alternative(html_content, subtype="html")
 
-    # 3. SMTP Initialization
-    # Office365 on Port 587 requires start_tls=True
-    smtp = SMTP(
-        hostname=host,
-        port=port,
-        use_tls=False, 
-        start_tls=True,
-        timeout=30,
-    )
+    msg.set_content(text_content or "This email requires HTML support.")
+    msg.add_alternative(html_content, subtype="html")
 
+    # 3. Send over a pooled connection (connect + STARTTLS + login only when
+    # no reusable connection is idle)
     try:
-        print(f"[DEBUG] Connecting to {host}:{port}...")
-        await smtp.connect()
-
-        # Office365 handling: Explicitly discard XOAUTH2 
-        # because we are using an App Password (Basic Auth)
-        if smtp.supported_auth_methods:
-            if "XOAUTH2" in smtp.supported_auth_methods:
-                smtp.supported_auth_methods.discard("XOAUTH2")
-            print(f"[DEBUG] Supported Auth Methods: {smtp.supported_auth_methods}")
-
-        print(f"[DEBUG] Attempting login for {username} using App Password...")
-        await smtp.login(username, password)
-        
+        pool = await get_pool(host, port, username, password)
         print(f"[DEBUG] Sending message to {to_email}...")
-        await smtp.send_message(msg)
-        
+        await pool.send_message(msg)
         print(f"[DEBUG] Email sent successfully.")
-        await smtp.quit()
 
     except SMTPAuthenticationError as e:
         print(f"[ERROR] Authentication Failed (535).")
@@ -76,4 +294,4 @@ async def send_email(
         raise
     except Exception as e:
         print(f"[ERROR] Unexpected email error: {type(e).__name__}: {e}")
-        raise
\ No newline at end of file
+        raise
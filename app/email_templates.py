@@ -0,0 +1,45 @@
+"""
+Email rendering.
+
+Email templates live in app/templates/email/ and are compiled once, at
+import, into their own Jinja2 environment (autoescaped, `auto_reload` off so
+a render never stats the template files). Each template renders its subject,
+HTML body and plain-text alternative from the same blocks; see
+email/layout.html.
+"""
+import os
+from dataclasses import dataclass
+
+from jinja2 import Environment, FileSystemLoader
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "templates")
+
+INVITATION = "email/invitation.html"
+REMINDER = "email/reminder.html"
+
+env = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    autoescape=True,
+    auto_reload=False,
+    trim_blocks=True,
+    lstrip_blocks=True,
+)
+
+# Compiled templates, keyed by name
+_templates = {name: env.get_template(name) for name in (INVITATION, REMINDER)}
+
+
+@dataclass
+class RenderedEmail:
+    subject: str
+    html: str
+    text: str
+
+
+def render_email(name: str, **context) -> RenderedEmail:
+    template = _templates.get(name) or env.get_template(name)
+    return RenderedEmail(
+        subject=template.render(context, part="subject").strip(),
+        html=template.render(context, part="html"),
+        text=template.render(context, part="text").strip() + "\n",
+    )
@@ -0,0 +1,225 @@
+"""
+Storing survey submissions, optionally with group commit.
+
+`store_submissions()` writes any number of validated submissions in the
+caller's transaction: one guarded UPDATE claims their assignments (an
+assignment that is already submitted, or whose link has since been
+replaced, is skipped), then one multi-row INSERT per table and one upsert
+per rollup table. submit_survey uses it for a batch of one and commits.
+
+With SUBMIT_GROUP_COMMIT on, submit_survey instead hands the submission to
+this process's `writer` and awaits it. The writer takes the first waiting
+submission, gathers more for up to SUBMIT_BATCH_WINDOW_MS or until it has
+SUBMIT_BATCH_SIZE, and stores them all in one transaction, so a burst of
+submissions shares one commit (and one WAL flush). Each caller's future
+resolves only once that commit has returned. If a batch fails, its
+submissions are retried one per transaction so a single bad row does not
+fail the rest.
+"""
+import asyncio
+import datetime as dt
+import secrets
+from dataclasses import dataclass, field
+from typing import List, Optional, Set, Tuple
+
+from sqlalchemy import Integer, String, column, insert, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import invalidation, models, rollups
+from app.config import settings
+from app.db import AsyncSessionLocal
+
+
+@dataclass(frozen=True)
+class Submission:
+    """A validated survey submission, detached from any session."""
+    assignment_id: int
+    token_hash: str
+    employee_id: int
+    department: str
+    position: str
+    manager_email: str
+    survey_code: str
+    scores: Tuple[int, ...]
+    submission_hash: str = field(default_factory=lambda: secrets.token_hex(32))
+
+
+async def store_submissions(session: AsyncSession, submissions: List[Submission]) -> Set[str]:
+    """
+    Claims and stores `submissions` in the session's transaction (the caller
+    commits). Returns the submission hashes that were stored; the others
+    lost the race for their assignment.
+    """
+    # Only the first submission per assignment can win
+    by_assignment = {}
+    for sub in submissions:
+        by_assignment.setdefault(sub.assignment_id, sub)
+    if not by_assignment:
+        return set()
+
+    # 1. Claim the assignments. The guarded UPDATE row-locks them, so of two
+    # concurrent submits of the same link only one gets its id back.
+    a = models.SurveyAssignment
+    now = dt.datetime.utcnow()
+    claims = values(column("id", Integer), column("token_hash", String), name="claims").data(
+        sorted((sub.assignment_id, sub.token_hash) for sub in by_assignment.values())
+    )
+    claimed_ids = set((await session.execute(
+        update(a)
+        .where(a.id == claims.c.id, a.invite_token_hash == claims.c.token_hash, a.is_submitted.isnot(True))
+        .values(is_submitted=True, submitted_at=now)
+        .returning(a.id)
+        .execution_options(synchronize_session=False)
+    )).scalars())
+    claimed = [sub for sub in by_assignment.values() if sub.assignment_id in claimed_ids]
+    if not claimed:
+        return set()
+
+    # 2. All answers and submission records in one INSERT each
+    await session.execute(
+        insert(models.SubmissionScores).values([
+            {
+                "submission_hash": sub.submission_hash,
+                "department": sub.department,
+                "survey_name": sub.survey_code,
+                "scores": list(sub.scores),
+                "created_at": now,
+            }
+            for sub in claimed
+        ])
+    )
+    await session.execute(
+        insert(models.EmployeeSubmission).values([
+            {
+                "employee_id": sub.employee_id,
+                "manager_email": sub.manager_email,
+                "survey_name": sub.survey_code,
+                "submission_hash": sub.submission_hash,
+                "submitted_at": now,
+            }
+            for sub in claimed
+        ])
+    )
+
+    # 3. Keep the dashboard rollups in step within the same transaction
+    await rollups.record_submissions(session, [
+        rollups.ScoredSubmission(
+            employee_id=sub.employee_id,
+            department=sub.department,
+            position=sub.position,
+            survey_code=sub.survey_code,
+            submission_hash=sub.submission_hash,
+            scores=sub.scores,
+        )
+        for sub in claimed
+    ])
+
+    # 4. Drop these links' cached forms in every worker
+    await invalidation.publish(
+        session,
+        invalidation.DASHBOARD,
+        *(invalidation.keyed(invalidation.SURVEY_FORMS, sub.token_hash) for sub in claimed),
+    )
+    return {sub.submission_hash for sub in claimed}
+
+
+_Pending = Tuple[Submission, asyncio.Future]
+
+
+class GroupCommitWriter:
+    """Stores queued submissions in batches from one task per process."""
+
+    def __init__(self):
+        self._task: asyncio.Task | None = None
+        self._queue: "asyncio.Queue[Optional[_Pending]]" = asyncio.Queue()
+        self._arrived = asyncio.Event()
+        self.batches = 0
+        self.submissions = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stores everything already queued, then stops."""
+        if self._task is not None:
+            self._queue.put_nowait(None)
+            self._arrived.set()
+            await self._task
+            self._task = None
+
+    async def submit(self, submission: Submission) -> bool:
+        """Waits until the submission is committed. False if its assignment was already submitted."""
+        if self._task is None:
+            raise RuntimeError("Group commit writer is not running")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((submission, future))
+        self._arrived.set()
+        return await future
+
+    async def _next_batch(self) -> Tuple[List[_Pending], bool]:
+        """Waits for a submission, then gathers more until the batch is full or the window closes."""
+        first = await self._queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.submit_batch_window_ms / 1000
+        size = max(settings.submit_batch_size, 1)
+        while len(batch) < size:
+            while len(batch) < size and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is None:
+                    return batch, True
+                batch.append(item)
+            remaining = deadline - loop.time()
+            if len(batch) >= size or remaining <= 0:
+                break
+            self._arrived.clear()
+            if not self._queue.empty():
+                continue
+            try:
+                await asyncio.wait_for(self._arrived.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+        return batch, False
+
+    async def _store(self, batch: List[_Pending]) -> None:
+        async with AsyncSessionLocal() as session:
+            stored = await store_submissions(session, [sub for sub, _ in batch])
+            await session.commit()
+        self.batches += 1
+        self.submissions += len(batch)
+        for sub, future in batch:
+            if not future.done():
+                future.set_result(sub.submission_hash in stored)
+
+    async def _flush(self, batch: List[_Pending]) -> None:
+        try:
+            await self._store(batch)
+            return
+        except Exception as e:  # noqa: BLE001
+            if len(batch) == 1:
+                print(f"[ERROR] Storing submission failed: {type(e).__name__}: {e}")
+                _, future = batch[0]
+                if not future.done():
+                    future.set_exception(e)
+                return
+            print(f"[ERROR] Storing a batch of {len(batch)} submissions failed ({type(e).__name__}: {e}), retrying one by one.")
+        for item in batch:
+            await self._flush([item])
+
+    async def _run(self) -> None:
+        while True:
+            batch, stopping = await self._next_batch()
+            if batch:
+                await self._flush(batch)
+            if stopping:
+                return
+
+
+writer = GroupCommitWriter()
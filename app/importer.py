@@ -0,0 +1,548 @@
+"""
+Bulk CSV import of employees and survey assignments.
+
+Rows are parsed and normalized in Python, bulk loaded into temporary staging
+tables with asyncpg's COPY (`copy_records_to_table`), then merged with two
+set-based statements: an `INSERT ... ON CONFLICT (email)` upsert of employees
+and an `INSERT ... ON CONFLICT ON CONSTRAINT uq_emp_mgr_assignment DO NOTHING`
+for assignments. A whole file costs a handful of round trips instead of one
+SELECT per row and per (survey x manager).
+
+Re-imports are diff based: every employee gets a fingerprint of its
+normalized CSV content (`row_fingerprint`), stored in
+`employees.import_fingerprint`. One lookup by email drops employees whose
+fingerprint did not change before anything is staged, so re-uploading the
+same export writes nothing.
+
+Large files can run as an ImportJob instead: the upload is spooled to disk
+and processed in the background in chunks of `IMPORT_CHUNK_SIZE` rows with a
+commit per chunk, so a bad row only loses its own chunk and progress can be
+polled. A first pass over the file fingerprints every employee across all
+of its rows (`plan_import`), so chunk boundaries do not affect dedup.
+"""
+import asyncio
+import csv
+import datetime as dt
+import hashlib
+import itertools
+import json
+import os
+import secrets
+import tempfile
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import aiofiles
+from sqlalchemy import text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import invalidation, models, rollups
+from app.config import settings
+from app.db import AsyncSessionLocal
+from app.utils import hash_token, normalize_survey_name
+
+VALID_SURVEYS = ("MSES", "ICSES", "TSES")
+
+
+@dataclass
+class ImportRow:
+    row_no: int
+    email: str
+    name: str
+    position: str
+    department: str
+    surveys: List[str]
+    # (manager_email, manager_name) pairs
+    managers: List[Tuple[str, str]] = field(default_factory=list)
+
+
+@dataclass
+class ImportSummary:
+    added: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    skipped: int = 0
+
+
+def parse_row(row_no: int, row: List[str]) -> Optional[ImportRow]:
+    """
+    Normalizes one CSV row:
+    SurveyNames, EmpName, Position, Dept, MgrNames, MgrEmails, EmpEmail
+    Returns None if the row has to be skipped.
+    """
+    if not row or len(row) < 7:
+        return None
+
+    # Parse and normalize survey names
+    raw_survey_names = [s.strip() for s in row[0].split(",") if s.strip()]
+    surveys = []
+    for s in raw_survey_names:
+        norm = normalize_survey_name(s)
+        if norm in VALID_SURVEYS:
+            surveys.append(norm)
+    if not surveys:
+        return None  # Skip row if no valid survey
+
+    emp_email = row[6].strip().lower()
+    if not emp_email:
+        return None
+
+    manager_names = [m.strip() for m in row[4].split(",") if m.strip()]
+    manager_emails = [m.strip().lower() for m in row[5].split(",") if m.strip()]
+    managers = [
+        (m_email, manager_names[i] if i < len(manager_names) else "Manager")
+        for i, m_email in enumerate(manager_emails)
+    ]
+
+    return ImportRow(
+        row_no=row_no,
+        email=emp_email,
+        name=row[1].strip(),
+        position=row[2].strip(),
+        department=row[3].strip(),
+        surveys=surveys,
+        managers=managers,
+    )
+
+
+class FingerprintBuilder:
+    """
+    Accumulates `row_fingerprint` per email over a stream of rows, keeping
+    only one small record per employee rather than the rows themselves.
+    """
+
+    def __init__(self):
+        self.last_rows: Dict[str, ImportRow] = {}
+        self._managers: Dict[str, Dict[str, str]] = {}
+        self._pairs: Dict[str, set] = {}
+
+    def add(self, row: ImportRow) -> None:
+        self.last_rows[row.email] = row
+        managers = self._managers.setdefault(row.email, {})
+        pairs = self._pairs.setdefault(row.email, set())
+        for m_email, m_name in row.managers:
+            managers.setdefault(m_email, m_name)  # first row wins, like the assignment insert
+            pairs.update((survey, m_email) for survey in row.surveys)
+
+    def fingerprints(self) -> Dict[str, str]:
+        return {email: self._fingerprint(email) for email in self.last_rows}
+
+    def _fingerprint(self, email: str) -> str:
+        last = self.last_rows[email]
+        managers = self._managers[email]
+        pairs = sorted((survey, m_email, managers[m_email]) for survey, m_email in self._pairs[email])
+        parts = [last.email, last.name, last.position, last.department]
+        parts += ["|".join(p) for p in pairs]
+        return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def row_fingerprint(rows: List[ImportRow]) -> str:
+    """
+    sha256 of what importing `rows` (all rows for one email, in file order)
+    would write: the last row's details plus every (survey, manager) pair.
+    """
+    builder = FingerprintBuilder()
+    for r in rows:
+        builder.add(r)
+    return builder.fingerprints()[rows[-1].email]
+
+
+@dataclass
+class ImportPlan:
+    """
+    Whole-file view of an import that is applied in chunks: each employee's
+    fingerprint and final details over all of its rows, and the employees
+    whose stored fingerprint already matches. Employees whose rows cross a
+    chunk boundary then dedup, and get the same details, in every chunk.
+    """
+    fingerprints: Dict[str, str]
+    last_rows: Dict[str, ImportRow]
+    unchanged: set
+
+
+def fingerprint_rows(rows: Iterable[ImportRow]) -> FingerprintBuilder:
+    """CPU-bound (and I/O-bound when `rows` streams a file): run it off the event loop for big inputs."""
+    builder = FingerprintBuilder()
+    for r in rows:
+        builder.add(r)
+    return builder
+
+
+async def plan_import(session: AsyncSession, builder: FingerprintBuilder, batch_size: int = 10000) -> ImportPlan:
+    fingerprints = builder.fingerprints()
+    emails = list(fingerprints)
+    unchanged = set()
+    for i in range(0, len(emails), batch_size):
+        batch = emails[i:i + batch_size]
+        stored = dict((await session.execute(_STORED_FINGERPRINTS, {"emails": batch})).all())
+        unchanged.update(email for email in batch if stored.get(email) == fingerprints[email])
+    return ImportPlan(fingerprints=fingerprints, last_rows=builder.last_rows, unchanged=unchanged)
+
+
+def parse_rows(reader: Iterable[List[str]], start: int = 1) -> Iterator[Tuple[int, Optional[ImportRow]]]:
+    """Yields (row_no, ImportRow or None) for every data row of a CSV reader."""
+    for row_no, row in enumerate(reader, start=start):
+        yield row_no, parse_row(row_no, row)
+
+
+_STAGING_DDL = (
+    """
+    CREATE TEMP TABLE IF NOT EXISTS import_employee_stage (
+        row_no integer NOT NULL,
+        email text NOT NULL,
+        name text NOT NULL,
+        position text NOT NULL,
+        department text NOT NULL,
+        import_fingerprint text NOT NULL
+    ) ON COMMIT DROP
+    """,
+    """
+    CREATE TEMP TABLE IF NOT EXISTS import_assignment_stage (
+        row_no integer NOT NULL,
+        email text NOT NULL,
+        manager_email text NOT NULL,
+        manager_name text NOT NULL,
+        survey_name text NOT NULL,
+        invite_token_hash text NOT NULL
+    ) ON COMMIT DROP
+    """,
+    "TRUNCATE import_employee_stage, import_assignment_stage",
+)
+
+# Last row wins for employee details, like applying the rows one by one
+_UPSERT_EMPLOYEES = text("""
+    INSERT INTO employees (name, email, department, position, is_active, created_at, import_fingerprint)
+    SELECT DISTINCT ON (email) name, email, department, position, true, timezone('utc', now()), import_fingerprint
+    FROM import_employee_stage
+    ORDER BY email, row_no DESC
+    ON CONFLICT (email) DO UPDATE
+        SET name = EXCLUDED.name,
+            department = EXCLUDED.department,
+            position = EXCLUDED.position,
+            import_fingerprint = EXCLUDED.import_fingerprint
+        WHERE employees.import_fingerprint IS DISTINCT FROM EXCLUDED.import_fingerprint
+    RETURNING id, email, (xmax = 0) AS inserted
+""")
+
+_STORED_FINGERPRINTS = text("SELECT email, import_fingerprint FROM employees WHERE email = ANY(:emails)")
+
+# First row wins for a (employee, manager, survey), existing assignments are kept
+_INSERT_ASSIGNMENTS = text("""
+    INSERT INTO survey_assignments
+        (employee_id, manager_email, manager_name, survey_name, invite_token_hash, invited_at, is_submitted)
+    SELECT DISTINCT ON (e.id, s.manager_email, s.survey_name)
+        e.id, s.manager_email, s.manager_name, s.survey_name, s.invite_token_hash, timezone('utc', now()), false
+    FROM import_assignment_stage s
+    JOIN employees e ON e.email = s.email
+    ORDER BY e.id, s.manager_email, s.survey_name, s.row_no
+    ON CONFLICT ON CONSTRAINT uq_emp_mgr_assignment DO NOTHING
+""")
+
+
+async def bulk_import(session: AsyncSession, rows: List[ImportRow], plan: Optional[ImportPlan] = None) -> ImportSummary:
+    """
+    Upserts `rows` in the session's transaction (the caller commits) and
+    returns added/updated/unchanged counts per CSV row. Skipped rows are the
+    caller's to count.
+
+    `rows` must hold every row of each employee in it, unless `plan` (from
+    `plan_import` over the whole file) is given.
+    """
+    summary = ImportSummary()
+    if not rows:
+        return summary
+
+    # 1. Drop employees whose content did not change since the last import
+    chunked = plan is not None
+    if plan is None:
+        plan = await plan_import(session, fingerprint_rows(rows))
+    summary.unchanged = sum(1 for r in rows if r.email in plan.unchanged)
+    rows = [r for r in rows if r.email not in plan.unchanged]
+    if not rows:
+        return summary
+    fingerprints = plan.fingerprints
+
+    # 2. Stage the rows with COPY on the session's own connection
+    for ddl in _STAGING_DDL:
+        await session.execute(text(ddl))
+    conn = await session.connection()
+    raw = await conn.get_raw_connection()
+    driver = raw.driver_connection
+
+    await driver.copy_records_to_table(
+        "import_employee_stage",
+        # Every chunk stages the employee's final details (its last row in the file)
+        records=[
+            (last.row_no, last.email, last.name, last.position, last.department, fingerprints[last.email])
+            for last in (plan.last_rows[email] for email in dict.fromkeys(r.email for r in rows))
+        ],
+        columns=["row_no", "email", "name", "position", "department", "import_fingerprint"],
+    )
+    assignment_records = [
+        (r.row_no, r.email, m_email, m_name, survey, hash_token(secrets.token_urlsafe(32)))
+        for r in rows
+        for survey in r.surveys
+        for m_email, m_name in r.managers
+    ]
+    if assignment_records:
+        await driver.copy_records_to_table(
+            "import_assignment_stage",
+            records=assignment_records,
+            columns=["row_no", "email", "manager_email", "manager_name", "survey_name", "invite_token_hash"],
+        )
+
+    # 3. Upsert employees. Counts follow the row-by-row semantics: the first
+    # row for a new email is "added", every other row is "updated". Rows
+    # the upsert skipped had their fingerprint written meanwhile: by an
+    # earlier chunk of the same file ("updated", their assignments are still
+    # added below) or by a concurrent import ("unchanged").
+    rows_per_email = Counter(r.email for r in rows)
+    updated_ids = []
+    for emp_id, email, inserted in (await session.execute(_UPSERT_EMPLOYEES)).all():
+        n = rows_per_email.pop(email)
+        if inserted:
+            summary.added += 1
+            summary.updated += n - 1
+        else:
+            summary.updated += n
+            updated_ids.append(emp_id)
+    if chunked:
+        summary.updated += sum(rows_per_email.values())
+    else:
+        summary.unchanged += sum(rows_per_email.values())
+
+    # 4. Create missing assignments
+    if assignment_records:
+        await session.execute(_INSERT_ASSIGNMENTS)
+
+    # 5. Move rollup averages of employees whose department/position changed
+    await rollups.reassign_employees(session, updated_ids)
+
+    return summary
+
+
+async def import_csv(session: AsyncSession, reader: Iterable[List[str]]) -> ImportSummary:
+    """Parses every row of `reader` (header already consumed) and imports them in one batch."""
+    rows = []
+    skipped = 0
+    for _, row in parse_rows(reader):
+        if row is None:
+            skipped += 1
+        else:
+            rows.append(row)
+
+    summary = await bulk_import(session, rows)
+    summary.skipped = skipped
+    return summary
+
+
+# ===============================
+# Background import jobs
+# ===============================
+
+# Keep references so running jobs are not garbage collected
+_running_jobs = set()
+
+
+def _spool_dir() -> str:
+    path = settings.import_spool_dir or os.path.join(tempfile.gettempdir(), "survey-imports")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+async def spool_upload(upload=None, csv_text: Optional[str] = None) -> str:
+    """Writes an UploadFile (or pasted CSV text) to the spool dir and returns its path."""
+    path = os.path.join(_spool_dir(), f"{uuid.uuid4().hex}.csv")
+    async with aiofiles.open(path, "wb") as out:
+        if upload is not None:
+            while chunk := await upload.read(1 << 20):
+                await out.write(chunk)
+        else:
+            await out.write(csv_text.encode("utf-8"))
+    return path
+
+
+async def create_import_job(session: AsyncSession, spool_path: str, filename: Optional[str]) -> models.ImportJob:
+    job = models.ImportJob(
+        status="queued",
+        filename=filename,
+        spool_path=spool_path,
+        chunk_size=max(settings.import_chunk_size, 1),
+        errors=[],
+    )
+    session.add(job)
+    await session.commit()
+    return job
+
+
+def start_import_job(job_id: int) -> None:
+    task = asyncio.create_task(run_import_job(job_id))
+    _running_jobs.add(task)
+    task.add_done_callback(_running_jobs.discard)
+
+
+def _read_spool(path: str) -> Iterator[Tuple[int, Optional[ImportRow]]]:
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        next(reader, None)  # Skip header row if present
+        # Row numbers are file line numbers (header is line 1)
+        yield from parse_rows(reader, start=2)
+
+
+def _chunks(iterable, size: int):
+    it = iter(iterable)
+    while chunk := list(itertools.islice(it, size)):
+        yield chunk
+
+
+async def _update_running_job(session: AsyncSession, job_id: int, **values) -> bool:
+    """
+    Updates the job only while it is still "running". False once the stale
+    sweep (`fail_stale_jobs`) has marked it failed; the task then stops.
+    """
+    j = models.ImportJob
+    return (await session.execute(
+        update(j).where(j.id == job_id, j.status == "running").values(**values).returning(j.id)
+    )).first() is not None
+
+
+async def _heartbeat(job_id: int) -> None:
+    """Touches heartbeat_at on a timer, so a slow chunk is not taken for a dead job."""
+    interval = max(settings.import_job_stale_after / 3, 1.0)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with AsyncSessionLocal() as session:
+                alive = await _update_running_job(session, job_id, heartbeat_at=dt.datetime.utcnow())
+                await session.commit()
+        except Exception as e:  # noqa: BLE001
+            print(f"[ERROR] Import job {job_id} heartbeat: {type(e).__name__}: {e}")
+            continue
+        if not alive:
+            return
+
+
+async def run_import_job(job_id: int) -> None:
+    """Streams the spooled CSV and imports it chunk by chunk, one commit per chunk."""
+    j = models.ImportJob
+    async with AsyncSessionLocal() as session:
+        job = await session.get(j, job_id)
+        if job is None:
+            return
+        spool_path, chunk_size, errors = job.spool_path, job.chunk_size, list(job.errors)
+        now = dt.datetime.utcnow()
+        claimed = (await session.execute(
+            update(j).where(j.id == job_id, j.status == "queued")
+            .values(status="running", started_at=now, heartbeat_at=now)
+            .returning(j.id)
+        )).first()
+        await session.commit()
+        if claimed is None:
+            return  # Already failed by the stale sweep
+        heartbeat = asyncio.create_task(_heartbeat(job_id))
+
+        try:
+            # 1. Fingerprint every employee over the whole file first, so an
+            # employee whose rows cross a chunk boundary still dedups. Reading
+            # and parsing run in a thread so the event loop keeps serving.
+            builder = await asyncio.to_thread(
+                fingerprint_rows, (row for _, row in _read_spool(spool_path) if row is not None)
+            )
+            plan = await plan_import(session, builder)
+            await session.commit()
+
+            # 2. Import chunk by chunk, each read and parsed in a thread.
+            # Progress is written with the chunk, and only while the job is
+            # still "running".
+            chunks = _chunks(_read_spool(spool_path), chunk_size)
+            while (chunk := await asyncio.to_thread(next, chunks, None)) is not None:
+                rows = [row for _, row in chunk if row is not None]
+                progress = {"rows_processed": j.rows_processed + len(chunk)}
+                try:
+                    summary = await bulk_import(session, rows, plan)
+                    await invalidation.publish(session, invalidation.DASHBOARD, invalidation.SURVEY_FORMS)
+                    progress.update(
+                        added=j.added + summary.added,
+                        updated=j.updated + summary.updated,
+                        unchanged=j.unchanged + summary.unchanged,
+                        skipped=j.skipped + len(chunk) - len(rows),
+                    )
+                except Exception as e:  # noqa: BLE001
+                    # Only this chunk is lost; earlier chunks are committed
+                    await session.rollback()
+                    errors.append({
+                        "first_row": chunk[0][0],
+                        "last_row": chunk[-1][0],
+                        "error": f"{type(e).__name__}: {e}",
+                    })
+                    progress.update(failed=j.failed + len(chunk), errors=errors)
+                    print(f"[ERROR] Import job {job_id} rows {chunk[0][0]}-{chunk[-1][0]}: {e}")
+                if not await _update_running_job(session, job_id, heartbeat_at=dt.datetime.utcnow(), **progress):
+                    await session.rollback()
+                    print(f"[ERROR] Import job {job_id} was marked failed while running; stopping.")
+                    return
+                await session.commit()
+            final = {"status": "completed"}
+        except Exception as e:  # noqa: BLE001
+            await session.rollback()
+            errors.append({"first_row": None, "last_row": None, "error": f"{type(e).__name__}: {e}"})
+            final = {"status": "failed", "errors": errors}
+            print(f"[ERROR] Import job {job_id} failed: {e}")
+        finally:
+            heartbeat.cancel()
+            try:
+                os.remove(spool_path)
+            except OSError:
+                pass
+        await _update_running_job(session, job_id, finished_at=dt.datetime.utcnow(), **final)
+        await session.commit()
+
+
+_FAIL_STALE_JOBS = text("""
+    UPDATE import_jobs
+    SET status = 'failed',
+        finished_at = timezone('utc', now()),
+        errors = errors || CAST(:error AS jsonb)
+    WHERE status IN ('queued', 'running')
+      AND coalesce(heartbeat_at, created_at) < timezone('utc', now()) - make_interval(secs => :stale_after)
+      AND (CAST(:job_id AS integer) IS NULL OR id = :job_id)
+    RETURNING id
+""")
+
+
+async def fail_stale_jobs(session: AsyncSession, job_id: Optional[int] = None) -> List[int]:
+    """
+    Marks queued/running jobs (or just `job_id`) with no progress for
+    IMPORT_JOB_STALE_AFTER seconds as failed: their task died with the
+    process that ran it. Jobs still running in another worker keep beating
+    and are left alone. The caller commits; returns the failed job ids.
+    """
+    error = json.dumps([{"first_row": None, "last_row": None, "error": "Interrupted: the server restarted while the job was running"}])
+    ids = (await session.execute(
+        _FAIL_STALE_JOBS,
+        {"error": error, "stale_after": settings.import_job_stale_after, "job_id": job_id},
+    )).scalars().all()
+    for stale_id in ids:
+        print(f"[ERROR] Import job {stale_id} was interrupted; marked as failed.")
+    return ids
+
+
+def job_status(job: models.ImportJob) -> dict:
+    return {
+        "id": job.id,
+        "status": job.status,
+        "filename": job.filename,
+        "rows_processed": job.rows_processed,
+        "added": job.added,
+        "updated": job.updated,
+        "unchanged": job.unchanged,
+        "skipped": job.skipped,
+        "failed": job.failed,
+        "errors": job.errors,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "heartbeat_at": job.heartbeat_at.isoformat() if job.heartbeat_at else None,
+    }
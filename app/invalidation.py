@@ -0,0 +1,160 @@
+"""
+Cross-worker cache invalidation over PostgreSQL LISTEN/NOTIFY.
+
+Writes call `publish(session, topic)` before committing. That queues a
+NOTIFY inside the write's transaction, so other workers only hear about
+changes that actually committed. The writing worker drops its own
+entries right after the commit through a session `after_commit` hook, with
+no round trip.
+
+Each worker keeps one dedicated asyncpg connection LISTENing on the channel
+(`InvalidationListener`, started from `startup_event`) and runs the handlers
+registered for each topic it receives.
+
+A topic can also name a single entry, `keyed(topic, key)`, for caches that
+evict one key at a time; those run the handlers registered with
+`on_invalidate_key`. Plain topics still clear the whole cache.
+"""
+import asyncio
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List
+
+import asyncpg
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import settings
+
+CHANNEL = "survey_cache_invalidation"
+MAX_PAYLOAD = 7900
+
+# Topics
+DASHBOARD = "dashboard"
+SMTP = "smtp"
+SURVEY_FORMS = "survey_forms"
+
+_handlers: Dict[str, List[Callable[[], None]]] = defaultdict(list)
+_key_handlers: Dict[str, List[Callable[[str], None]]] = defaultdict(list)
+
+
+def on_invalidate(topic: str, handler: Callable[[], None]) -> None:
+    """Registers a handler that evicts the cache entries behind `topic`."""
+    _handlers[topic].append(handler)
+
+
+def on_invalidate_key(topic: str, handler: Callable[[str], None]) -> None:
+    """Registers a handler that evicts one entry, for topics published with `keyed()`."""
+    _key_handlers[topic].append(handler)
+
+
+def keyed(topic: str, key: str) -> str:
+    # Keys must not contain "," (the payload separator)
+    return f"{topic}:{key}"
+
+
+def apply(topics: Iterable[str]) -> None:
+    for topic in set(topics):
+        name, sep, key = topic.partition(":")
+        if sep:
+            for handler in _key_handlers.get(name, []):
+                handler(key)
+        else:
+            for handler in _handlers.get(topic, []):
+                handler()
+
+
+def apply_all() -> None:
+    apply(list(_handlers))
+
+
+async def publish(session: AsyncSession, *topics: str) -> None:
+    """Queues invalidation of `topics` for when `session` commits."""
+    pending = session.info.setdefault("invalidate_topics", set())
+    new = [t for t in dict.fromkeys(topics) if t not in pending]
+    pending.update(new)
+    # One NOTIFY for the lot, split to stay under the 8000-byte payload limit
+    payload = ""
+    for topic in new:
+        if payload and len(payload) + len(topic) + 1 > MAX_PAYLOAD:
+            await _notify(session, payload)
+            payload = ""
+        payload = f"{payload},{topic}" if payload else topic
+    if payload:
+        await _notify(session, payload)
+
+
+async def _notify(session: AsyncSession, payload: str) -> None:
+    await session.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANNEL, "payload": payload})
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_after_commit(session: Session) -> None:
+    topics = session.info.pop("invalidate_topics", None)
+    if topics:
+        apply(topics)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop("invalidate_topics", None)
+
+
+def _listener_dsn() -> str:
+    # asyncpg wants a plain libpq URL, not the SQLAlchemy dialect form
+    return settings.database_url.replace("postgresql+asyncpg://", "postgresql://", 1)
+
+
+class InvalidationListener:
+    """Keeps one LISTEN connection open per worker, reconnecting with backoff."""
+
+    def __init__(self, dsn: str = None, channel: str = CHANNEL):
+        self.dsn = dsn or _listener_dsn()
+        self.channel = channel
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        apply(payload.split(","))
+
+    async def _run(self) -> None:
+        delay = 1.0
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(self.dsn)
+                closed = asyncio.Event()
+                conn.add_termination_listener(lambda c: closed.set())
+                await conn.add_listener(self.channel, self._on_notify)
+                # Anything published while we were not listening is lost, so
+                # start from empty caches after every (re)connect.
+                apply_all()
+                delay = 1.0
+                print(f"[INFO] Listening for cache invalidations on '{self.channel}'.")
+                await closed.wait()
+                print("[ERROR] Cache invalidation listener connection lost.")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:  # noqa: BLE001
+                print(f"[ERROR] Cache invalidation listener: {type(e).__name__}: {e}")
+            finally:
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            apply_all()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+
+listener = InvalidationListener()
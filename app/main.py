@@ -1,6 +1,11 @@
 import asyncio
+import hmac
+import math
 import secrets
 import uuid
+from dataclasses import dataclass
+from types import MappingProxyType
+from urllib.parse import urlencode
 from datetime import datetime
 from sqlalchemy.orm import joinedload
 import datetime as dt
@@ -10,20 +15,44 @@ from fastapi import Depends, FastAPI, Form, HTTPException, Request, status
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from sqlalchemy import and_, func, select
+from sqlalchemy import and_, func, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.middleware.sessions import SessionMiddleware
 from sqlalchemy.orm import selectinload
 
 from app import models
 from app.config import settings
-from app.db import Base, engine, get_session
-from app.email import send_email
-from app.security import get_password_hash, hash_token, verify_password
-from app.utils import QUESTIONS,hash_token,  CLIENT_QNS, TEAM_QNS, SCORES, management_score_category, management_score_description, client_score_category, client_score_description, team_score_category, team_score_description
+from app.cache import MISSING, survey_form_cache
+from app.db import AsyncSessionLocal, Base, engine, get_session
+from app.email import close_smtp_pools, get_smtp_config, send_email
+from app.email_templates import INVITATION, REMINDER, render_email
+from app import rollups
+from app import invalidation
+from app import group_commit
+from app import outbox
+from app import ratelimit
+from app.dashboard import get_survey_stats
+from app.importer import create_import_job, fail_stale_jobs, import_csv, job_status, spool_upload, start_import_job
+from app.security import (
+    PasswordHasherBusy,
+    client_address,
+    email_login_limiter,
+    get_password_hash_async,
+    hash_token,
+    ip_login_limiter,
+    is_legacy_invite_token,
+    legacy_invite_tokens_accepted,
+    make_invite_token,
+    make_manager_token,
+    parse_invite_token,
+    parse_manager_token,
+    verify_password_async,
+)
+from app.utils import QUESTIONS, CLIENT_QNS, TEAM_QNS, SCORES, management_score_category, management_score_description, client_score_category, client_score_description, team_score_category, team_score_description
 from fastapi import Query
 
-from app.models import Employee, EmployeeSubmission, SurveyResponse
+from app.models import Employee, EmployeeSubmission
 from sqlalchemy import join
 from sqlalchemy import distinct
 from fastapi import UploadFile, File, Form, HTTPException
@@ -45,6 +74,8 @@ SURVEY_CATEGORY_FUNC = {
 
 async def init_db() -> None:
     async with engine.begin() as conn:
+        # Directory search uses trigram indexes
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
         await conn.run_sync(Base.metadata.create_all)
 
 
@@ -55,7 +86,20 @@ async def startup_event():
         await ensure_admin_user(session)
         await ensure_smtp_settings(session)
         await ensure_department_heads(session)
+        await fail_stale_jobs(session)
         await session.commit()
+    invalidation.listener.start()
+    outbox.worker.start()
+    if settings.submit_group_commit:
+        group_commit.writer.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await group_commit.writer.stop()
+    await invalidation.listener.stop()
+    await outbox.worker.stop()
+    await close_smtp_pools()
 
 
 async def ensure_admin_user(session: AsyncSession) -> None:
@@ -83,7 +127,7 @@ async def ensure_admin_user(session: AsyncSession) -> None:
             session.add(
                 models.AdminUser(
                     email=email,
-                    password_hash=get_password_hash(password),
+                    password_hash=await get_password_hash_async(password),
                 )
             )
 
@@ -153,12 +197,34 @@ async def admin_login_page(request: Request):
 
 @app.post("/admin/login")
 async def admin_login(request: Request, email: str = Form(...), password: str = Form(...), session: AsyncSession = Depends(get_session)):
+    # Refuse throttled clients/accounts before spending any bcrypt time
+    client_ip = client_address(request.client.host if request.client else None, request.headers.get("x-forwarded-for"))
+    email_key = email.strip().lower()
+    retry_after = max(email_login_limiter.retry_after([email_key]), ip_login_limiter.retry_after([client_ip]))
+    if retry_after:
+        error = f"Too many failed attempts. Try again in {int(retry_after) + 1} seconds."
+        return templates.TemplateResponse(
+            "admin/login.html", {"request": request, "error": error}, status_code=429,
+            headers={"Retry-After": str(int(retry_after) + 1)},
+        )
+
     result = await session.execute(select(models.AdminUser).where(models.AdminUser.email == email))
     admin = result.scalars().first()
     error = None
-    if not admin or not verify_password(password, admin.password_hash):
+    try:
+        valid = bool(admin) and await verify_password_async(password, admin.password_hash)
+    except PasswordHasherBusy:
+        error = "Too many sign-in attempts in progress. Please try again shortly."
+        return templates.TemplateResponse(
+            "admin/login.html", {"request": request, "error": error}, status_code=503,
+            headers={"Retry-After": "1"},
+        )
+    if not valid:
+        email_login_limiter.record_failure([email_key])
+        ip_login_limiter.record_failure([client_ip])
         error = "Invalid credentials"
         return templates.TemplateResponse("admin/login.html", {"request": request, "error": error}, status_code=400)
+    email_login_limiter.reset([email_key])
     request.session["admin_user_id"] = admin.id
     return RedirectResponse(url="/admin", status_code=303)
 
@@ -170,7 +236,7 @@ async def admin_logout(request: Request):
 
 
 from sqlalchemy import select, func, distinct
-from app.models import Employee, EmployeeSubmission, SurveyResponse, DepartmentHead
+from app.models import Employee, EmployeeSubmission, DepartmentHead
 
 from sqlalchemy import func, distinct, select
 
@@ -211,92 +277,10 @@ async def admin_dashboard(
     session: AsyncSession = Depends(get_session),
     admin_id: int = Depends(require_admin),
 ):
-    GRADING_MAP = {
-        "MSES": management_score_category,
-        "ICSES": client_score_category,
-        "TSES": team_score_category,
-    }
-
-    survey_stats = {}
-
-    for s_key, s_info in SURVEY_DETAILS.items():
-        grading_func = GRADING_MAP.get(s_key)
-
-        # 1. Get Assignment Stats (Total assigned vs Pending)
-        assign_stmt = select(models.SurveyAssignment).where(models.SurveyAssignment.survey_name == s_key)
-        assignments = (await session.execute(assign_stmt)).scalars().all()
-        if not assignments: 
-            continue
-
-        # 2. Results Query: Grouping by Employee to handle multiple submissions
-        # STEP A: Get total score for EACH unique submission_hash
-        sub_stmt = (
-            select(
-                models.EmployeeSubmission.employee_id,
-                func.sum(models.SurveyResponse.score).label("submission_total")
-            )
-            .join(models.SurveyResponse, models.EmployeeSubmission.submission_hash == models.SurveyResponse.submission_hash)
-            .where(models.EmployeeSubmission.survey_name == s_key)
-            .group_by(models.EmployeeSubmission.submission_hash, models.EmployeeSubmission.employee_id)
-        ).subquery()
-
-        # STEP B: Average those totals for each Employee
-        stmt = (
-            select(
-                models.Employee.name,
-                models.Employee.department,
-                models.Employee.position,
-                func.avg(sub_stmt.c.submission_total).label("avg_total_score"),
-                func.count(sub_stmt.c.employee_id).label("submission_count")
-            )
-            .join(sub_stmt, models.Employee.id == sub_stmt.c.employee_id)
-            .group_by(models.Employee.id, models.Employee.name, models.Employee.department, models.Employee.position)
-        )
-        
-        results = (await session.execute(stmt)).all()
-        
-        all_scores = []
-        dept_data = {}
-        pos_data = {}
-        individual_scores = []
-
-        for r in results:
-            score = float(r.avg_total_score)
-            all_scores.append(score)
-            dept_data.setdefault(r.department, []).append(score)
-            pos_data.setdefault(r.position, []).append(score)
-            
-            individual_scores.append({
-                "name": r.name,
-                "department": r.department,
-                "position": r.position,
-                "score": score,
-                "submission_count": r.submission_count,
-                "category": grading_func(score) if grading_func else "N/A"
-            })
-
-        overall_avg_val = sum(all_scores) / len(all_scores) if all_scores else 0
-
-        # 3. Question Stats (Average score per question across all submissions)
-        q_avg_stmt = (
-            select(models.SurveyResponse.question_no, func.avg(models.SurveyResponse.score))
-            .where(models.SurveyResponse.survey_name == s_key)
-            .group_by(models.SurveyResponse.question_no)
-        )
-        q_results = (await session.execute(q_avg_stmt)).all()
-
-        survey_stats[s_key] = {
-            "display_name": s_info["full_name"],
-            "total_employees": len(assignments),
-            "submitted_employees": sum(1 for a in assignments if a.is_submitted),
-            "pending_employees": len(assignments) - sum(1 for a in assignments if a.is_submitted),
-            "questions": s_info["questions"],
-            "overall_avg": {"score": overall_avg_val, "category": grading_func(overall_avg_val)},
-            "dept_avgs": [{"name": d, "score": sum(s)/len(s), "category": grading_func(sum(s)/len(s))} for d, s in dept_data.items()],
-            "pos_avgs": [{"name": p, "score": sum(s)/len(s), "category": grading_func(sum(s)/len(s))} for p, s in pos_data.items()],
-            "question_avgs": sorted([{"question_no": qno, "score": avg, "category": grading_func(avg)} for qno, avg in q_results], key=lambda x: x["question_no"]),
-            "individual_scores": sorted(individual_scores, key=lambda x: x['score'], reverse=True)
-        }
+    # Assignment counts, employee averages and question/department/position
+    # averages for every survey, in two grouped queries over the rollups.
+    # Served from memory until the next submission/import/delete.
+    survey_stats = await get_survey_stats(session)
 
     return templates.TemplateResponse("admin/dashboard.html", {"request": request, "survey_stats": survey_stats})
 
@@ -312,9 +296,52 @@ from app.utils import (
     management_score_category, 
     client_score_category, 
     team_score_category,
-    aggregate_employee_scores
+    GRADING_FUNCTIONS,
 )
 
+def _like_pattern(term: str) -> str:
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def employee_filter_conditions(
+    *,
+    q: str = "",
+    department: str = "",
+    position: str = "",
+    survey: str = "",
+    manager: str = "",
+    status: str = "",
+) -> list:
+    """WHERE conditions on Employee for the directory filters (empty values are ignored)."""
+    conditions = []
+    if q:
+        # Served by the pg_trgm GIN indexes on employees.name/email
+        pattern = _like_pattern(q)
+        conditions.append(or_(
+            models.Employee.name.ilike(pattern, escape="\\"),
+            models.Employee.email.ilike(pattern, escape="\\"),
+        ))
+    if department:
+        conditions.append(models.Employee.department == department)
+    if position:
+        conditions.append(models.Employee.position == position)
+
+    # Survey / manager / status filters match on the employee's assignments
+    assignment_conditions = []
+    if survey:
+        assignment_conditions.append(models.SurveyAssignment.survey_name == survey)
+    if manager:
+        assignment_conditions.append(models.SurveyAssignment.manager_email == manager)
+    if status == "submitted":
+        assignment_conditions.append(models.SurveyAssignment.is_submitted == True)
+    elif status == "pending":
+        assignment_conditions.append(models.SurveyAssignment.is_submitted == False)
+    if assignment_conditions:
+        conditions.append(models.Employee.assignments.any(and_(*assignment_conditions)))
+    return conditions
+
+
 @app.get("/admin/employees", response_class=HTMLResponse)
 async def admin_employees(
     request: Request,
@@ -322,34 +349,139 @@ async def admin_employees(
     imported: int | None = None,
     added: int | None = None,
     updated: int | None = None,
+    unchanged: int | None = None,
     added_single: int | None = None,
     invited: int | None = None,
     invited_count: int | None = None,
     reminded: int | None = None,
+    after: int | None = None,
+    limit: int | None = None,
+    q: str | None = None,
+    department: str | None = None,
+    position: str | None = None,
+    survey: str | None = None,
+    manager: str | None = None,
+    status: str | None = None,
 ):
-    # --- 1. Fetch employees ---
-    stmt = select(models.Employee).options(selectinload(models.Employee.assignments)).order_by(models.Employee.id)
+    # --- 1. Fetch one page of employees (keyset pagination on Employee.id) ---
+    page_size = min(max(limit or settings.employees_page_size, 1), 200)
+    filters = {
+        "q": (q or "").strip(),
+        "department": (department or "").strip(),
+        "position": (position or "").strip(),
+        "survey": (survey or "").strip().upper(),
+        "manager": (manager or "").strip().lower(),
+        "status": (status or "").strip().lower(),
+    }
+    stmt = (
+        select(models.Employee)
+        .options(selectinload(models.Employee.assignments))
+        .where(*employee_filter_conditions(**filters))
+        .order_by(models.Employee.id)
+        .limit(page_size + 1)
+    )
+    if after:
+        stmt = stmt.where(models.Employee.id > after)
     result = await session.execute(stmt)
     employees = result.scalars().all()
 
-    # --- 2. Fetch submissions ---
+    has_next = len(employees) > page_size
+    employees = employees[:page_size]
+    active_filters = {k: v for k, v in filters.items() if v}
+    if page_size != settings.employees_page_size:
+        active_filters["limit"] = page_size
+    next_url = None
+    if has_next:
+        next_url = "/admin/employees?" + urlencode({**active_filters, "after": employees[-1].id})
+    first_url = "/admin/employees?" + urlencode(active_filters) if after else None
+
+    departments = (await session.execute(
+        select(models.Employee.department).distinct().order_by(models.Employee.department)
+    )).scalars().all()
+    positions = (await session.execute(
+        select(models.Employee.position).distinct().order_by(models.Employee.position)
+    )).scalars().all()
+
+    # --- 2. Per-survey averages for the page, from the employee rollups ---
+    # The per-manager, per-question breakdown is loaded on demand from
+    # /admin/employees/{id}/details.
     emp_ids = [e.id for e in employees]
-    submissions = []
+    employee_scores = {emp_id: {} for emp_id in emp_ids}
     if emp_ids:
-        sub_stmt = select(models.EmployeeSubmission).where(models.EmployeeSubmission.employee_id.in_(emp_ids))
-        sub_result = await session.execute(sub_stmt)
-        submissions = sub_result.scalars().all()
-
-    # --- 3. Fetch survey responses ---
-    all_hashes = [sub.submission_hash for sub in submissions]
-    response_map = {}
-    if all_hashes:
-        resp_stmt = select(models.SurveyResponse).where(models.SurveyResponse.submission_hash.in_(all_hashes))
-        resp_result = await session.execute(resp_stmt)
-        for resp in resp_result.scalars().all():
-            response_map.setdefault(resp.submission_hash, []).append(resp)
-
-    # --- 4. Grading functions ---
+        rollup_stmt = (
+            select(
+                models.EmployeeScoreRollup.employee_id,
+                models.EmployeeScoreRollup.survey_name,
+                models.EmployeeScoreRollup.score_sum,
+                models.EmployeeScoreRollup.submission_count,
+            )
+            .where(
+                models.EmployeeScoreRollup.employee_id.in_(emp_ids),
+                models.EmployeeScoreRollup.submission_count > 0,
+            )
+            .order_by(models.EmployeeScoreRollup.survey_name)
+        )
+        for r in (await session.execute(rollup_stmt)).all():
+            avg_score = round(r.score_sum / r.submission_count, 2)
+            grading_func = GRADING_FUNCTIONS.get(r.survey_name)
+            employee_scores[r.employee_id][r.survey_name] = {
+                "num_submissions": r.submission_count,
+                "total_score": r.score_sum,
+                "avg_score": avg_score,
+                "category": grading_func(avg_score) if grading_func else "N/A",
+            }
+
+    # --- 3. Return template ---
+    return templates.TemplateResponse(
+        "admin/employees.html",
+        {
+            "request": request,
+            "employees": employees,
+            "imported": imported,
+            "added": added,
+            "updated": updated,
+            "unchanged": unchanged,
+            "added_single": added_single,
+            "invited": invited,
+            "invited_count": invited_count,
+            "reminded": reminded,
+            "employee_scores": employee_scores,
+            "SURVEY_DETAILS": SURVEY_DETAILS,
+            "filters": filters,
+            "departments": departments,
+            "positions": positions,
+            "next_url": next_url,
+            "first_url": first_url,
+        }
+    )
+
+
+def employee_submission_scores_stmt(employee_id: int):
+    """
+    One row per submission of the employee with its per-question scores,
+    already stored in question order, so nothing needs to be aggregated.
+    """
+    return (
+        select(
+            models.EmployeeSubmission.manager_email,
+            models.EmployeeSubmission.survey_name,
+            models.EmployeeSubmission.submitted_at,
+            models.SubmissionScores.scores,
+        )
+        .join(models.SubmissionScores, models.SubmissionScores.submission_hash == models.EmployeeSubmission.submission_hash)
+        .where(models.EmployeeSubmission.employee_id == employee_id)
+    )
+
+
+async def build_manager_summary(session: AsyncSession, employee: models.Employee) -> dict:
+    """
+    Per-manager, per-survey results for one employee, including the
+    per-question breakdown. `employee.assignments` must be loaded.
+    """
+    # --- 1. Load each submission's scores ---
+    scored_submissions = (await session.execute(employee_submission_scores_stmt(employee.id))).all()
+
+    # --- 2. Grading functions ---
     QUESTION_GRADING_FUNCTIONS = {
         "MSES": management_score_category,
         "ICSES": client_score_category,
@@ -358,9 +490,8 @@ async def admin_employees(
 
     processed_results_lookup = {}
 
-    # --- 5. Process each submission ---
-    for sub in submissions:
-        responses = response_map.get(sub.submission_hash, [])
+    # --- 3. Process each submission ---
+    for sub in scored_submissions:
         s_code = sub.survey_name.strip()
         survey_info = SURVEY_DETAILS.get(s_code, {})
         full_name = survey_info.get("full_name", s_code)
@@ -369,26 +500,20 @@ async def admin_employees(
         grading_func = QUESTION_GRADING_FUNCTIONS.get(s_code)
 
         detailed_scores = []
-        total_score = 0
-
-        for r in sorted(responses, key=lambda x: x.question_no):
-            q_idx = r.question_no - 1
-            q_text = q_text_list[q_idx] if q_idx < num_q else f"Question {r.question_no}"
-            score = int(r.score)
-            total_score += score
-            category = grading_func(score) if grading_func else "N/A"
-
+        for q_idx, score in enumerate(sub.scores):
+            q_text = q_text_list[q_idx] if q_idx < num_q else f"Question {q_idx + 1}"
             detailed_scores.append({
                 "question": q_text,
                 "score": score,
-                "category": category
+                "category": grading_func(score) if grading_func else "N/A"
             })
 
+        total_score = sum(sub.scores)
         # Compute final category for total score
         final_category = grading_func(total_score) if grading_func else "N/A"
 
         # Store processed data
-        key = (sub.employee_id, sub.manager_email.strip().lower(), s_code)
+        key = (sub.manager_email.strip().lower(), s_code)
         processed_results_lookup[key] = {
             "survey_name": s_code,
             "full_survey_name": full_name,
@@ -398,49 +523,52 @@ async def admin_employees(
             "submitted_at": sub.submitted_at
         }
 
-    # --- 6. Attach manager_summary to employees ---
-    for emp in employees:
-        emp.manager_summary = {}
-        for assignment in emp.assignments:
-            m_email = assignment.manager_email.strip().lower()
-            if m_email not in emp.manager_summary:
-                emp.manager_summary[m_email] = {
-                    "manager_name": assignment.manager_name,
-                    "surveys": [],
-                    "is_submitted": assignment.is_submitted
-                }
-
-            res_data = processed_results_lookup.get((emp.id, m_email, assignment.survey_name))
-            display_name = SURVEY_DETAILS.get(assignment.survey_name, {}).get("full_name", assignment.survey_name)
-
-            emp.manager_summary[m_email]["surveys"].append({
-                "survey_name": assignment.survey_name,
-                "display_name": display_name,
-                "is_submitted": assignment.is_submitted,
-                "result": res_data
-            })
+    # --- 4. Group by manager ---
+    manager_summary = {}
+    for assignment in employee.assignments:
+        m_email = assignment.manager_email.strip().lower()
+        if m_email not in manager_summary:
+            manager_summary[m_email] = {
+                "manager_name": assignment.manager_name,
+                "surveys": [],
+                "is_submitted": assignment.is_submitted
+            }
 
-    # --- 7. Return template ---
-    return templates.TemplateResponse(
-        "admin/employees.html",
-        {
-            "request": request,
-            "employees": employees,
-            "imported": imported,
-            "added": added,
-            "updated": updated,
-            "added_single": added_single,
-            "invited": invited,
-            "invited_count": invited_count,
-            "reminded": reminded,
-            "aggregate_employee_scores": aggregate_employee_scores,
-            "SURVEY_DETAILS": SURVEY_DETAILS
-        }
-    )
+        res_data = processed_results_lookup.get((m_email, assignment.survey_name))
+        display_name = SURVEY_DETAILS.get(assignment.survey_name, {}).get("full_name", assignment.survey_name)
 
+        manager_summary[m_email]["surveys"].append({
+            "survey_name": assignment.survey_name,
+            "display_name": display_name,
+            "is_submitted": assignment.is_submitted,
+            "result": res_data
+        })
 
+    return manager_summary
 
 
+@app.get("/admin/employees/{employee_id}/details", response_class=HTMLResponse)
+async def employee_details(
+    request: Request,
+    employee_id: int,
+    session: AsyncSession = Depends(get_session),
+    admin_id: int = Depends(require_admin),
+):
+    """HTML fragment with an employee's feedback breakdown, fetched when expanded in the directory."""
+    stmt = (
+        select(models.Employee)
+        .options(selectinload(models.Employee.assignments))
+        .where(models.Employee.id == employee_id)
+    )
+    employee = (await session.execute(stmt)).scalars().first()
+    if not employee:
+        raise HTTPException(status_code=404, detail="Employee not found")
+
+    manager_summary = await build_manager_summary(session, employee)
+    return templates.TemplateResponse(
+        "admin/employee_details.html",
+        {"request": request, "employee": employee, "manager_summary": manager_summary},
+    )
 
 
 from fastapi.responses import HTMLResponse, RedirectResponse
@@ -448,7 +576,6 @@ from sqlalchemy.future import select
 from typing import List
 
 import secrets
-from app.security import hash_token
 from sqlalchemy import select, and_
 
 @app.post("/admin/employees/add")
@@ -491,9 +618,14 @@ async def add_employee(
         await session.flush()  # To get the employee.id for assignments
     else:
         # Update existing employee details if they've changed
-        employee.name = name
-        employee.department = department
-        employee.position = position
+        if (employee.name, employee.department, employee.position) != (name, department, position):
+            employee.name = name
+            employee.department = department
+            employee.position = position
+            # The CSV row no longer describes this employee; make the next
+            # import compare fresh instead of reporting it unchanged
+            employee.import_fingerprint = None
+        await rollups.reassign_employees(session, [employee.id])
 
     # 2. Create SurveyAssignments for each survey AND each manager
     # This matches your new SurveyAssignment model structure
@@ -523,7 +655,9 @@ async def add_employee(
                     invite_token_hash=hash_token(token),
                 )
                 session.add(assignment)
+                employee.import_fingerprint = None
     await session.flush()
+    await invalidation.publish(session, invalidation.DASHBOARD, invalidation.SURVEY_FORMS)
     await session.commit()
     
     # Redirect back to directory with success flag
@@ -555,18 +689,20 @@ import csv
 import secrets
 
 from app import models
-from app.utils import hash_token, normalize_survey_name
+from app.utils import normalize_survey_name
 
 @app.post("/admin/employees/import")
 async def import_employees(
     request: Request,
     csv_rows: Optional[str] = Form(default=None),
     csv_file: Optional[UploadFile] = File(default=None),
+    background: Optional[bool] = Form(False),
     session: AsyncSession = Depends(get_session),
     admin_id: int = Depends(require_admin),
 ):
     """
-    Import employees from CSV.
+    Import employees from CSV. With `background` set, the CSV is spooled to
+    disk and imported as a chunked ImportJob; poll /admin/employees/import-jobs/{id}.
     Expected CSV columns:
     SurveyNames, EmpName, Position, Dept, MgrNames, MgrEmails, EmpEmail
     SurveyNames can be either:
@@ -574,6 +710,17 @@ async def import_employees(
       - Full names: Management Satisfaction Survey, Internal Customer Satisfaction, Team Satisfaction
     """
     # 1️⃣ Determine CSV source
+    if background:
+        if csv_file and csv_file.filename:
+            spool_path = await spool_upload(upload=csv_file)
+        elif csv_rows and csv_rows.strip():
+            spool_path = await spool_upload(csv_text=csv_rows)
+        else:
+            raise HTTPException(status_code=400, detail="No CSV data provided")
+        job = await create_import_job(session, spool_path, csv_file.filename if csv_file else None)
+        start_import_job(job.id)
+        return RedirectResponse(url=f"/admin/employees?import_job={job.id}", status_code=303)
+
     if csv_file and csv_file.filename:
         csv_stream = TextIOWrapper(csv_file.file, encoding="utf-8")
     elif csv_rows and csv_rows.strip():
@@ -584,103 +731,42 @@ async def import_employees(
     reader = csv.reader(csv_stream)
     next(reader, None)  # Skip header row if present
 
-    added_count = 0
-    updated_count = 0
-    skipped_rows = 0
-
-    for row in reader:
-        if not row or len(row) < 7:
-            skipped_rows += 1
-            continue
-
-        # 2️⃣ Parse and normalize survey names
-        raw_survey_names = [s.strip() for s in row[0].split(",") if s.strip()]
-        survey_names = []
-        for s in raw_survey_names:
-            norm = normalize_survey_name(s)
-            if norm in ("MSES", "ICSES", "TSES"):
-                survey_names.append(norm)
-
-        if not survey_names:
-            skipped_rows += 1
-            continue  # Skip row if no valid survey
-
-        # 3️⃣ Parse employee and manager info
-        emp_name = row[1].strip()
-        pos = row[2].strip()
-        dept = row[3].strip()
-        manager_names = [m.strip() for m in row[4].split(",") if m.strip()]
-        manager_emails = [m.strip().lower() for m in row[5].split(",") if m.strip()]
-        emp_email = row[6].strip().lower()
-
-        if not emp_email:
-            skipped_rows += 1
-            continue
-
-        # 4️⃣ Upsert Employee
-        stmt = select(models.Employee).where(models.Employee.email == emp_email)
-        result = await session.execute(stmt)
-        employee = result.scalars().first()
-
-        if not employee:
-            employee = models.Employee(
-                name=emp_name,
-                email=emp_email,
-                department=dept,
-                position=pos
-            )
-            session.add(employee)
-            await session.flush()  # Get employee.id
-            added_count += 1
-        else:
-            # Update existing employee
-            employee.name = emp_name
-            employee.position = pos
-            employee.department = dept
-            updated_count += 1
-
-        # 5️⃣ Create SurveyAssignments for each manager-survey combination
-        for survey in survey_names:
-            for i, mgr_email in enumerate(manager_emails):
-                mgr_name = manager_names[i] if i < len(manager_names) else "Manager"
-
-                # Skip if assignment already exists
-                assignment_stmt = select(models.SurveyAssignment).where(
-                    models.SurveyAssignment.employee_id == employee.id,
-                    models.SurveyAssignment.manager_email == mgr_email,
-                    models.SurveyAssignment.survey_name == survey
-                )
-                existing_assignment = (await session.execute(assignment_stmt)).scalars().first()
-                if existing_assignment:
-                    continue
-
-                # Create new assignment with unique token
-                token = secrets.token_urlsafe(32)
-                new_assignment = models.SurveyAssignment(
-                    employee_id=employee.id,
-                    manager_email=mgr_email,
-                    manager_name=mgr_name,
-                    survey_name=survey,
-                    invite_token_hash=hash_token(token)
-                )
-                session.add(new_assignment)
+    # 2️⃣ Parse, COPY into staging tables and upsert set-based
+    summary = await import_csv(session, reader)
 
+    await invalidation.publish(session, invalidation.DASHBOARD, invalidation.SURVEY_FORMS)
     await session.commit()
 
     return RedirectResponse(
-        url=f"/admin/employees?imported=1&added={added_count}&updated={updated_count}&skipped={skipped_rows}",
+        url=f"/admin/employees?imported=1&added={summary.added}&updated={summary.updated}"
+            f"&unchanged={summary.unchanged}&skipped={summary.skipped}",
         status_code=303
     )
 
 
 
+@app.get("/admin/employees/import-jobs/{job_id}")
+async def import_job_status(
+    job_id: int,
+    session: AsyncSession = Depends(get_session),
+    admin_id: int = Depends(require_admin),
+):
+    # A job whose worker restarted stops beating; report it as failed
+    if await fail_stale_jobs(session, job_id):
+        await session.commit()
+    job = await session.get(models.ImportJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job_status(job)
+
+
+# Copy for app/templates/email/; the templates append the employee name to "intro"
 SURVEY_EMAIL_CONTENT = {
     "TSES": {
         "subject": "Team Satisfaction Survey – Feedback Request",
         "intro": (
             "As part of our ongoing efforts to encourage feedback, "
-            "we kindly request your participation in providing feedback about your line manager, "
-            "<strong>{employee_name}</strong>."
+            "we kindly request your participation in providing feedback about your line manager,"
         ),
         "value": (
             "This feedback is invaluable in providing inputs on areas where individuals can do better. "
@@ -690,8 +776,7 @@ SURVEY_EMAIL_CONTENT = {
         "subject": "Management Satisfaction Survey – Feedback Request",
         "intro": (
             "As part of our ongoing efforts to encourage feedback, "
-            "we kindly request your participation in providing feedback on your team member, "
-            "<strong>{employee_name}</strong>."
+            "we kindly request your participation in providing feedback on your team member,"
         ),
         "value": (
             "Your feedback is essential in identifying individual strengths, areas for development, and supporting the overall growth of your team. "
@@ -701,8 +786,7 @@ SURVEY_EMAIL_CONTENT = {
         "subject": "Internal Customer Satisfaction Survey – Feedback Request",
         "intro": (
             "As part of our ongoing efforts to encourage feedback, "
-            "we kindly request your participation in providing feedback on your colleague, "
-            "<strong>{employee_name}</strong>."
+            "we kindly request your participation in providing feedback on your colleague,"
         ),
         "value": (
             "This feedback is invaluable in providing inputs on areas where individuals can do better. "
@@ -716,7 +800,7 @@ from collections import defaultdict
 import secrets
 import datetime as dt
 from sqlalchemy.future import select
-from app.utils import SURVEY_DETAILS, normalize_survey_name, hash_token
+from app.utils import SURVEY_DETAILS, normalize_survey_name
 from typing import Dict, List
 
 
@@ -734,7 +818,7 @@ from typing import Dict, List
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from app import models
-from app.utils import SURVEY_DETAILS, normalize_survey_name, hash_token
+from app.utils import SURVEY_DETAILS, normalize_survey_name
 
 
 
@@ -745,20 +829,31 @@ from typing import Dict, List
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import models
-from app.utils import SURVEY_DETAILS, normalize_survey_name, hash_token
+from app.utils import SURVEY_DETAILS, normalize_survey_name
+
+
+@dataclass
+class InvitationEmail:
+    """One rendered invitation email"""
+    to_email: str
+    subject: str
+    html: str
+    text: str
 
 
-async def invite_employee(
+def render_invitations(
     *,
-    session: AsyncSession,
-    smtp: models.SMTPSettings,
     base_url: str,
     manager_email: str,
     manager_name: str,
     employee_map: Dict[str, List[models.SurveyAssignment]],
-) -> None:
+    reminder: bool = False,
+    batch_link: Optional[str] = None,
+) -> List[InvitationEmail]:
     """
-    Sends survey invitations to a manager, batching by survey.
+    Rotates the invite tokens of a manager's assignments and renders one
+    invitation (or reminder) per survey. `batch_link`, if given, is added to
+    each email as the one-page alternative.
 
     employee_map = {
         "Alice": [assignment1, assignment2],
@@ -766,24 +861,20 @@ async def invite_employee(
     }
     """
     deadline = "10th Feb 2026"
+    year = dt.datetime.utcnow().year
 
     # --- 1️⃣ Group assignments by survey_code ---
     survey_map: defaultdict[str, List[Dict]] = defaultdict(list)
     for employee_name, assignments in employee_map.items():
         for assignment in assignments:
             survey_code = normalize_survey_name(assignment.survey_name)
-            token = secrets.token_urlsafe(32)
-            assignment.invite_token_hash = hash_token(token)
-            assignment.invited_at = dt.datetime.utcnow()
-            link = f"{base_url}/survey/{token}"
-
             survey_map[survey_code].append({
                 "employee_name": employee_name,
                 "assignment": assignment,
-                "link": link
             })
 
-    # --- 2️⃣ Send one email per survey_code ---
+    # --- 2️⃣ Render one email per survey_code ---
+    emails = []
     for survey_code, items in survey_map.items():
         email_cfg = SURVEY_EMAIL_CONTENT.get(survey_code)
         survey_info = SURVEY_DETAILS.get(survey_code)
@@ -791,179 +882,124 @@ async def invite_employee(
         if not email_cfg or not survey_info:
             continue
 
-        # --- 2a. Single employee ---
-        if len(items) == 1:
-            item = items[0]
-            employee_name = item["employee_name"]
-            link = item["link"]
-
-            body_html = f"""
-            <p style="font-size:15px; line-height:1.6; color:#000;">
-                <strong>{survey_info['full_name']}</strong>
-            </p>
-
-            <p style="font-size:15px; line-height:1.6; color:#000;">
-                {email_cfg['intro'].format(employee_name=employee_name)}
-            </p>
-
-            <p style="font-size:15px; line-height:1.6; color:#000;">
-                {email_cfg['value']}
-            </p>
-
-            <div style="text-align:center; margin:16px 0;">
-                <a href="{link}"
-                   style="display:inline-block; background:#000; color:#a99a68;
-                          padding:14px 28px; border-radius:6px;
-                          text-decoration:none; font-weight:bold;">
-                    Start {survey_info['full_name']}
-                </a>
-            </div>
-
-            <p style="font-size:13px; color:#333; word-break:break-all;">
-                If the button above doesn’t work, please copy the link below:<br>
-                <a href="{link}" style="color:#000; text-decoration:underline;">
-                    {link}
-                </a>
-            </p>
-            """
-        else:
-            # --- 2b. Multiple employees: table layout ---
-            rows = ""
-            for item in items:
-                employee_name = item["employee_name"]
-                link = item["link"]
-                rows += f"""
-                <tr>
-                    <td style="padding:8px; border:1px solid #000;">{employee_name}</td>
-                    <td style="padding:8px; border:1px solid #000; text-align:center;">
-                        <a href="{link}"
-                           style="display:inline-block; background:#000; color:#a99a68;
-                                  padding:8px 16px; border-radius:6px; text-decoration:none; font-weight:bold;">
-                            Start Survey
-                        </a>
-                    </td>
-                    <td style="padding:8px; border:1px solid #000; word-break:break-all;">
-                        <a href="{link}" style="color:#000; text-decoration:underline;">{link}</a>
-                    </td>
-                </tr>
-                """
-            body_html = f"""
-            <p style="font-size:15px; line-height:1.6; color:#000;">
-                <strong>{survey_info['full_name']}</strong>
-            </p>
-
-            <p style="font-size:15px; line-height:1.6; color:#000;">
-                {email_cfg['intro'].format(employee_name='your team members')}
-            </p>
-
-            <p style="font-size:15px; line-height:1.6; color:#000;">
-                {email_cfg['value']}
-            </p>
-
-            <table width="100%" cellpadding="4" cellspacing="0"
-                   style="border-collapse:collapse; margin-top:16px; font-size:14px;">
-                <thead>
-                    <tr style="background:#000; color:#a99a68;">
-                        <th style="padding:8px; border:1px solid #000;">Employee</th>
-                        <th style="padding:8px; border:1px solid #000;">Survey</th>
-                        <th style="padding:8px; border:1px solid #000;">Link</th>
-                    </tr>
-                </thead>
-                <tbody>
-                    {rows}
-                </tbody>
-            </table>
-            """
-
-        # --- 3️⃣ Wrap in full email template ---
-        html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-          <meta charset="UTF-8">
-          <title>{survey_info['full_name']} Invitation</title>
-        </head>
-        <body style="margin:0; padding:40px; background:#000; font-family:Arial, Helvetica, sans-serif;">
-
-          <table width="100%" cellpadding="0" cellspacing="0">
-            <tr>
-              <td align="center">
-                <table width="600" cellpadding="0" cellspacing="0"
-                       style="background:#a99a68; border-radius:8px; overflow:hidden;">
-
-                  <tr>
-                    <td style="background:#000; color:#a99a68; padding:20px; text-align:center;">
-                      <h2 style="margin:0;">Survey Invitation</h2>
-                    </td>
-                  </tr>
-
-                  <tr>
-                    <td style="padding:32px;">
-                      <p style="font-size:16px;">Dear {manager_name},</p>
-                      {body_html}
-                      <p style="font-size:14px; margin-top:24px;">
-                        <strong>All responses are anonymous.</strong>
-                      </p>
-                    
-                    </td>
-                  </tr>
-
-                  <tr>
-                    <td style="background:#000; color:#a99a68; padding:16px; text-align:center; font-size:12px;">
-                      © {dt.datetime.utcnow().year} InfinityCapital. All rights reserved.
-                    </td>
-                  </tr>
-
-                </table>
-              </td>
-            </tr>
-          </table>
-
-        </body>
-        </html>
-        """
-
-        # --- 4️⃣ Send the email ---
-        await send_email(
-            host=smtp.host,
-            port=smtp.port,
-            username=smtp.username,
-            password=smtp.password,
-            use_tls=smtp.use_tls,
-            from_email=smtp.from_email,
-            from_name=smtp.from_name,
-            to_email=manager_email,
-            subject=f"Feedback Survey – {survey_info['full_name']}",
-            html_content=html,
+        for item in items:
+            assignment = item["assignment"]
+            token = make_invite_token(assignment.id)
+            assignment.invite_token_hash = hash_token(token)
+            assignment.invited_at = dt.datetime.utcnow()
+            item["link"] = f"{base_url}/survey/{token}"
+
+        # --- 2a. Render subject, HTML and text from the compiled template ---
+        rendered = render_email(
+            REMINDER if reminder else INVITATION,
+            manager_name=manager_name,
+            survey_name=survey_info["full_name"],
+            content=email_cfg,
+            items=items,
+            year=year,
+            batch_link=batch_link,
         )
+        emails.append(InvitationEmail(
+            to_email=manager_email,
+            subject=rendered.subject,
+            html=rendered.html,
+            text=rendered.text,
+        ))
 
-    # --- 5️⃣ Commit assignments with token updates ---
-    await session.commit()
+    return emails
 
 
+def invite_employee(
+    *,
+    session: AsyncSession,
+    base_url: str,
+    manager_email: str,
+    manager_name: str,
+    employee_map: Dict[str, List[models.SurveyAssignment]],
+    reminder: bool = False,
+    batch_link: Optional[str] = None,
+) -> int:
+    """
+    Rotates a manager's tokens and queues one invitation per survey in the
+    outbox, in the session's transaction (the caller commits). Returns the
+    number of emails queued.
+    """
+    emails = render_invitations(
+        base_url=base_url,
+        manager_email=manager_email,
+        manager_name=manager_name,
+        employee_map=employee_map,
+        reminder=reminder,
+        batch_link=batch_link,
+    )
+    for email in emails:
+        outbox.enqueue(session, to_email=email.to_email, subject=email.subject, html=email.html, text=email.text)
+    return len(emails)
+
+
+async def issue_manager_link(session: AsyncSession, base_url: str, manager_email: str) -> str:
+    """
+    Issues the manager's batch survey link, revoking the previous one, in
+    the session's transaction (the caller commits).
+    """
+    link = models.ManagerInviteLink
+    now = dt.datetime.utcnow()
+    stmt = pg_insert(link).values(manager_email=manager_email, token_hash="", issued_at=now)
+    link_id = (await session.execute(
+        stmt.on_conflict_do_update(index_elements=[link.manager_email], set_={"issued_at": now})
+        .returning(link.id)
+    )).scalar_one()
+    token = make_manager_token(link_id)
+    await session.execute(update(link).where(link.id == link_id).values(token_hash=hash_token(token)))
+    return f"{base_url}/survey/manager/{token}"
+
+
+def pending_assignment_conditions(reminders_only: bool, employee_id: int | None = None) -> list:
+    """WHERE clause for the assignments an invite (or reminder) run covers."""
+    conditions = [models.SurveyAssignment.is_submitted == False]
+    if reminders_only:
+        conditions.append(models.SurveyAssignment.invited_at != None)
+    else:
+        conditions.append(models.SurveyAssignment.invited_at == None)
+    if employee_id:
+        conditions.append(models.SurveyAssignment.employee_id == employee_id)
+    return conditions
+
+
+def pending_assignment_ids_stmt(reminders_only: bool, employee_id: int | None = None):
+    """(id, manager_email) of the assignments a run covers, grouped by manager."""
+    a = models.SurveyAssignment
+    return (
+        select(a.id, a.manager_email)
+        .where(*pending_assignment_conditions(reminders_only, employee_id))
+        .order_by(a.manager_email, a.id)
+    )
 
 
 async def invite_managers(
     session: AsyncSession,
-    smtp: models.SMTPSettings,
     base_url: str,
     employee_id: int | None = None,
     reminders_only: bool = False,
-):
+    stream: bool = False,
+) -> int:
+    """
+    Queues invitations (or reminders) for every manager with pending
+    assignments and commits them together with the token rotations, so a
+    link is only replaced if its email is queued. Delivery is left to the
+    outbox worker. Returns the number of managers queued.
+
+    With `stream`, see `invite_managers_streaming`.
+    """
+    if stream:
+        return await invite_managers_streaming(session, base_url, employee_id, reminders_only)
+
     stmt = (
         select(models.SurveyAssignment)
         .options(joinedload(models.SurveyAssignment.employee))
-        .where(models.SurveyAssignment.is_submitted == False)
+        .where(*pending_assignment_conditions(reminders_only, employee_id))
     )
 
-    if reminders_only:
-        stmt = stmt.where(models.SurveyAssignment.invited_at != None)
-    else:
-        stmt = stmt.where(models.SurveyAssignment.invited_at == None)
-
-    if employee_id:
-        stmt = stmt.where(models.SurveyAssignment.employee_id == employee_id)
-
     assignments = (await session.execute(stmt)).scalars().all()
     if not assignments:
         return 0
@@ -973,22 +1009,92 @@ async def invite_managers(
     for a in assignments:
         manager_map[a.manager_email][a.employee.name].append(a)
 
+    # A single-employee run must not revoke batch links sent with other emails
+    batch_links = settings.batch_survey_links and employee_id is None
+
     for manager_email, emp_map in manager_map.items():
         manager_name = next(iter(emp_map.values()))[0].manager_name
 
-        await invite_employee(
+        invite_employee(
             session=session,
-            smtp=smtp,
             base_url=base_url,
             manager_email=manager_email,
             manager_name=manager_name,
             employee_map=emp_map,
+            reminder=reminders_only,
+            batch_link=await issue_manager_link(session, base_url, manager_email) if batch_links else None,
         )
 
+    # Cached forms of the replaced links must go
+    await invalidation.publish(session, invalidation.SURVEY_FORMS)
     await session.commit()
     return len(manager_map)
 
 
+async def invite_managers_streaming(
+    session: AsyncSession,
+    base_url: str,
+    employee_id: int | None = None,
+    reminders_only: bool = False,
+) -> int:
+    """
+    Same as `invite_managers`, but reads the pending assignment ids ordered
+    by manager from a server-side cursor (INVITE_STREAM_BATCH rows at a time)
+    on a separate connection and handles one manager group at a time: load
+    that group's assignments, queue its emails, commit, forget the objects.
+    Memory stays flat with org size and the outbox worker starts sending
+    after the first commit.
+    """
+    a = models.SurveyAssignment
+    conditions = pending_assignment_conditions(reminders_only, employee_id)
+    ids_stmt = pending_assignment_ids_stmt(reminders_only, employee_id).execution_options(
+        yield_per=settings.invite_stream_batch
+    )
+    batch_links = settings.batch_survey_links and employee_id is None
+
+    async def queue_group(assignment_ids: List[int]) -> bool:
+        # Re-check the conditions: a concurrent run or submit may have got there first
+        group = (await session.execute(
+            select(a)
+            .options(joinedload(a.employee))
+            .where(a.id.in_(assignment_ids), *conditions)
+            .order_by(a.id)
+        )).scalars().all()
+        if not group:
+            return False
+        emp_map = defaultdict(list)
+        for assignment in group:
+            emp_map[assignment.employee.name].append(assignment)
+        manager_email = group[0].manager_email
+        invite_employee(
+            session=session,
+            base_url=base_url,
+            manager_email=manager_email,
+            manager_name=group[0].manager_name,
+            employee_map=emp_map,
+            reminder=reminders_only,
+            batch_link=await issue_manager_link(session, base_url, manager_email) if batch_links else None,
+        )
+        await invalidation.publish(session, invalidation.SURVEY_FORMS)
+        await session.commit()
+        session.expunge_all()
+        return True
+
+    queued = 0
+    async with AsyncSessionLocal() as reader:
+        result = await reader.stream(ids_stmt)
+        current_manager, assignment_ids = None, []
+        async for assignment_id, manager_email in result:
+            if manager_email != current_manager and assignment_ids:
+                queued += await queue_group(assignment_ids)
+                assignment_ids = []
+            current_manager = manager_email
+            assignment_ids.append(assignment_id)
+        if assignment_ids:
+            queued += await queue_group(assignment_ids)
+    return queued
+
+
 from sqlalchemy import select, and_, exists
 
 @app.post("/admin/employees/{employee_id}/resend")
@@ -998,12 +1104,10 @@ async def resend_invite(
     session: AsyncSession = Depends(get_session),
     admin_id: int = Depends(require_admin),
 ):
-    smtp = await get_smtp(session)
     base_url = str(request.base_url).rstrip("/")
 
     await invite_managers(
         session,
-        smtp,
         base_url,
         employee_id=employee_id,
         reminders_only=True
@@ -1027,10 +1131,13 @@ async def toggle_employee(
         models.EmployeeSubmission.employee_id == employee_id
     )
 
-    # 2. Delete survey responses where the hash matches any of the employee's hashes
+    # Take the employee out of the dashboard rollups while the hashes still exist
+    await rollups.forget_employee(session, employee_id)
+
+    # 2. Delete survey scores where the hash matches any of the employee's hashes
     await session.execute(
-        delete(models.SurveyResponse).where(
-            models.SurveyResponse.submission_hash.in_(hashes_stmt)
+        delete(models.SubmissionScores).where(
+            models.SubmissionScores.submission_hash.in_(hashes_stmt)
         )
     )
 
@@ -1047,6 +1154,7 @@ async def toggle_employee(
         delete(models.Employee).where(models.Employee.id == employee_id)
     )
 
+    await invalidation.publish(session, invalidation.DASHBOARD, invalidation.SURVEY_FORMS)
     await session.commit()
     return RedirectResponse(url="/admin/employees", status_code=303)
 
@@ -1057,19 +1165,17 @@ async def send_single_invite(
     session: AsyncSession = Depends(get_session),
     admin_id: int = Depends(require_admin),
 ):
-    smtp = await get_smtp(session)
     base_url = str(request.base_url).rstrip("/")
 
-    await invite_managers(
+    count = await invite_managers(
         session,
-        smtp,
         base_url,
         employee_id=employee_id,
         reminders_only=False
     )
 
     return RedirectResponse(
-        url="/admin/employees?invited=1",
+        url=f"/admin/employees?invited=1&invited_count={count}",
         status_code=303
     )
 
@@ -1081,14 +1187,13 @@ async def send_invites(
     session: AsyncSession = Depends(get_session),
     admin_id: int = Depends(require_admin),
 ):
-    smtp = await get_smtp(session)
     base_url = str(request.base_url).rstrip("/")
 
     count = await invite_managers(
         session,
-        smtp,
         base_url,
-        reminders_only=False
+        reminders_only=False,
+        stream=True,
     )
 
     return RedirectResponse(
@@ -1103,14 +1208,13 @@ async def send_reminders(
     session: AsyncSession = Depends(get_session),
     admin_id: int = Depends(require_admin),
 ):
-    smtp = await get_smtp(session)
     base_url = str(request.base_url).rstrip("/")
 
     count = await invite_managers(
         session,
-        smtp,
         base_url,
-        reminders_only=True
+        reminders_only=True,
+        stream=True,
     )
 
     return RedirectResponse(
@@ -1154,7 +1258,12 @@ async def toggle_department_head(
 @app.get("/admin/smtp", response_class=HTMLResponse)
 async def smtp_page(request: Request, session: AsyncSession = Depends(get_session), admin_id: int = Depends(require_admin)):
     smtp = await get_smtp(session)
-    return templates.TemplateResponse("admin/smtp.html", {"request": request, "smtp": smtp, "message": None})
+    outbox_counts = await outbox.status_counts(session)
+    usage = await ratelimit.usage(session, await get_smtp_config(session))
+    return templates.TemplateResponse(
+        "admin/smtp.html",
+        {"request": request, "smtp": smtp, "message": None, "outbox_counts": outbox_counts, "usage": usage},
+    )
 
 
 @app.post("/admin/smtp")
@@ -1167,6 +1276,8 @@ async def save_smtp(
     use_tls: Optional[bool] = Form(False),
     from_email: str = Form(...),
     from_name: str = Form(...),
+    rate_per_minute: int = Form(30),
+    rate_per_day: int = Form(10000),
     session: AsyncSession = Depends(get_session),
     admin_id: int = Depends(require_admin),
 ):
@@ -1178,7 +1289,10 @@ async def save_smtp(
     smtp.use_tls = bool(use_tls)
     smtp.from_email = from_email
     smtp.from_name = from_name
+    smtp.rate_per_minute = max(rate_per_minute, 0)
+    smtp.rate_per_day = max(rate_per_day, 0)
     smtp.updated_at = datetime.utcnow()
+    await invalidation.publish(session, invalidation.SMTP)
     await session.commit()
     return RedirectResponse(url="/admin/smtp", status_code=303)
 
@@ -1190,49 +1304,86 @@ async def test_smtp(
     session: AsyncSession = Depends(get_session),
     admin_id: int = Depends(require_admin),
 ):
-    smtp = await get_smtp(session)
+    smtp = await get_smtp_config(session)
     html = "<p>This is a test email from the survey system.</p>"
     try:
-        await send_email(
-            host=smtp.host,
-            port=smtp.port,
-            username=smtp.username,
-            password=smtp.password,
-            use_tls=smtp.use_tls,
-            from_email=smtp.from_email,
-            from_name=smtp.from_name,
-            to_email=to_email,
-            subject="SMTP test",
-            html_content=html,
-        )
-        message = "Test email sent"
+        # Don't hold the admin's request until the quota refills (up to a day)
+        wait = await ratelimit.acquire(smtp, max_wait=settings.smtp_rate_max_wait)
+        if wait:
+            message = f"Rate limit reached, retry in {math.ceil(wait)} s"
+        else:
+            await send_email(
+                host=smtp.host,
+                port=smtp.port,
+                username=smtp.username,
+                password=smtp.password,
+                use_tls=smtp.use_tls,
+                from_email=smtp.from_email,
+                from_name=smtp.from_name,
+                to_email=to_email,
+                subject="SMTP test",
+                html_content=html,
+            )
+            message = "Test email sent"
     except Exception as exc:  # noqa: BLE001
         message = f"Failed to send: {exc}"
-    return templates.TemplateResponse("admin/smtp.html", {"request": request, "smtp": smtp, "message": message})
-
-async def get_assignment_by_token(session: AsyncSession, token: str) -> Optional[models.SurveyAssignment]:
-    token_hash = hash_token(token)
-    # Join with employee to get names/department/etc in one query
-    result = await session.execute(
-        select(models.SurveyAssignment)
-        .options(joinedload(models.SurveyAssignment.employee))
-        .where(models.SurveyAssignment.invite_token_hash == token_hash)
+    outbox_counts = await outbox.status_counts(session)
+    usage = await ratelimit.usage(session, smtp)
+    return templates.TemplateResponse(
+        "admin/smtp.html",
+        {"request": request, "smtp": smtp, "message": message, "outbox_counts": outbox_counts, "usage": usage},
     )
-    return result.scalars().first()
 
 
+@app.get("/admin/outbox")
+async def outbox_status(
+    session: AsyncSession = Depends(get_session),
+    admin_id: int = Depends(require_admin),
+):
+    return await outbox.status_counts(session)
+
+
+@app.get("/admin/smtp/usage")
+async def smtp_usage(
+    session: AsyncSession = Depends(get_session),
+    admin_id: int = Depends(require_admin),
+):
+    return await ratelimit.usage(session, await get_smtp_config(session))
 
-from sqlalchemy.orm import joinedload
 
-async def get_assignment_by_token(session: AsyncSession, token: str):
-    h = hash_token(token)
-    stmt = (
+@app.post("/admin/outbox/requeue")
+async def requeue_outbox(
+    session: AsyncSession = Depends(get_session),
+    admin_id: int = Depends(require_admin),
+):
+    await outbox.requeue_dead(session)
+    await session.commit()
+    return RedirectResponse(url="/admin/smtp", status_code=303)
+
+async def get_assignment_by_token(session: AsyncSession, token: str) -> Optional[models.SurveyAssignment]:
+    """
+    The assignment an invite link belongs to, with its employee, or None.
+    Tokens that fail the signature check are rejected without a query.
+    """
+    assignment_id = parse_invite_token(token)
+    if assignment_id is None:
+        if not (legacy_invite_tokens_accepted() and is_legacy_invite_token(token)):
+            return None
+        condition = models.SurveyAssignment.invite_token_hash == hash_token(token)
+    else:
+        condition = models.SurveyAssignment.id == assignment_id
+
+    # Join with employee to get names/department/etc in one query
+    assignment = (await session.execute(
         select(models.SurveyAssignment)
-        .options(joinedload(models.SurveyAssignment.employee)) # Crucial for your code
-        .where(models.SurveyAssignment.invite_token_hash == h)
-    )
-    result = await session.execute(stmt)
-    return result.scalars().first()
+        .options(joinedload(models.SurveyAssignment.employee))
+        .where(condition)
+    )).scalars().first()
+    # Only the most recently issued link of an assignment is valid
+    if assignment is None or not hmac.compare_digest(assignment.invite_token_hash, hash_token(token)):
+        return None
+    return assignment
+
 
 import secrets
 import datetime as dt
@@ -1250,41 +1401,90 @@ def get_survey_data(stored_name: str):
             return key, data
     return None, None
 
+# Form context per survey, built once: everything on the form except the
+# employee line and the token.
+SURVEY_FORM_CONTEXTS = {
+    code: MappingProxyType({
+        "questions": tuple(info["questions"]),
+        "scores": tuple(sorted(SCORES, reverse=True)),
+        "score_labels": MappingProxyType(dict(SCORES)),
+        "current_survey_name": info["full_name"],
+        "survey_code": code,
+    })
+    for code, info in SURVEY_DETAILS.items()
+}
+
+
+@dataclass(frozen=True)
+class EmployeeDisplay:
+    name: str
+    department: str
+
+
+@dataclass(frozen=True)
+class SurveyFormEntry:
+    """What the survey page needs about one invite link (cached in survey_form_cache)"""
+    assignment_id: int
+    employee: EmployeeDisplay
+    survey_code: Optional[str]
+    is_submitted: bool
+
+
+async def get_survey_form_entry(session: AsyncSession, token: str) -> Optional[SurveyFormEntry]:
+    """
+    Read-through lookup for the survey page. A hit needs no database round
+    trip; a miss goes through get_assignment_by_token. Only links of active
+    employees are cached.
+    """
+    token_hash = hash_token(token)
+    entry = survey_form_cache.get(token_hash)
+    if entry is not MISSING:
+        return entry
+
+    version = survey_form_cache.version
+    assignment = await get_assignment_by_token(session, token)
+    if not assignment or not assignment.employee or not assignment.employee.is_active:
+        return None
+    survey_code, _ = get_survey_data(assignment.survey_name)
+    entry = SurveyFormEntry(
+        assignment_id=assignment.id,
+        employee=EmployeeDisplay(name=assignment.employee.name, department=assignment.employee.department),
+        survey_code=survey_code,
+        is_submitted=bool(assignment.is_submitted),
+    )
+    survey_form_cache.set(token_hash, entry, version)
+    return entry
+
+
 @app.get("/survey/{token}", response_class=HTMLResponse)
 async def survey_page(
     request: Request,
     token: str,
     session: AsyncSession = Depends(get_session),
 ):
-    assignment = await get_assignment_by_token(session, token)
-    
-    if not assignment or not assignment.employee or not assignment.employee.is_active:
+    entry = await get_survey_form_entry(session, token)
+
+    if entry is None:
         raise HTTPException(status_code=404, detail="Invite link invalid or employee inactive")
 
-    if assignment.is_submitted:
+    if entry.is_submitted:
         return templates.TemplateResponse(
             "survey/submitted.html",
-            {"request": request, "employee": assignment.employee},
+            {"request": request, "employee": entry.employee},
         )
 
-    # Use the flexible lookup
-    survey_code, survey_info = get_survey_data(assignment.survey_name)
-    
-    if not survey_info:
+    form_context = SURVEY_FORM_CONTEXTS.get(entry.survey_code)
+    if form_context is None:
         raise HTTPException(status_code=400, detail="Invalid survey type")
 
     return templates.TemplateResponse(
         "survey/form.html",
         {
             "request": request,
-            "employee": assignment.employee,
-            "questions": survey_info["questions"],
-            "scores": sorted(list(SCORES.keys()), reverse=True),
-            "score_labels": SCORES,
+            **form_context,
+            "employee": entry.employee,
             "token": token,
-            "current_survey_name": survey_info["full_name"], # Display full name
-            "survey_code": survey_code,
-            "survey_index": 0, 
+            "survey_index": 0,
             "total_surveys": 1,
         },
     )
@@ -1316,8 +1516,9 @@ async def submit_survey(
     submission_hash = secrets.token_hex(32)
 
     total_score = 0  # Initialize total score
+    scores = []
 
-    # Validate and Save Responses
+    # 1. Validate every answer before writing anything
     for i in range(1, len(questions_list) + 1):
         raw_val = form_data.get(f"q{i}")
         try:
@@ -1329,40 +1530,44 @@ async def submit_survey(
                 "survey/form.html",
                 {
                     "request": request,
+                    **SURVEY_FORM_CONTEXTS[survey_code],
                     "employee": employee,
-                    "questions": questions_list,
-                    "scores": sorted(list(SCORES.keys()), reverse=True),
-                    "score_labels": SCORES,
                     "token": token,
-                    "current_survey_name": full_name,
                     "error": "All questions are required"
                 },
                 status_code=400
             )
 
         total_score += score  # **just sum the scores**
-
-        # Save individual response
-        session.add(models.SurveyResponse(
-            submission_hash=submission_hash,
-            department=employee.department,
-            survey_name=survey_code,
-            question_no=i,
-            score=score  # store actual score
-        ))
-
-    # Record the submission
-    session.add(models.EmployeeSubmission(
+        scores.append(score)
+
+    # 2. Claim the assignment and store the answers and rollups (see
+    # app.group_commit): in this request's transaction, or batched with other
+    # submissions by the group-commit writer.
+    submission = group_commit.Submission(
+        assignment_id=assignment.id,
+        token_hash=assignment.invite_token_hash,
         employee_id=employee.id,
+        department=employee.department,
+        position=employee.position,
         manager_email=assignment.manager_email,
-        survey_name=survey_code,
+        survey_code=survey_code,
+        scores=tuple(scores),
         submission_hash=submission_hash,
-        submitted_at=dt.datetime.utcnow()
-    ))
-
-    assignment.is_submitted = True
-    assignment.submitted_at = dt.datetime.utcnow()
-    await session.commit()
+    )
+    if group_commit.writer.running:
+        # Don't hold a pooled connection while queued; loaded attributes
+        # stay readable on the detached objects.
+        await session.close()
+        claimed = await group_commit.writer.submit(submission)
+    else:
+        claimed = submission_hash in await group_commit.store_submissions(session, [submission])
+        if claimed:
+            await session.commit()
+        else:
+            await session.rollback()
+    if not claimed:
+        raise HTTPException(status_code=400, detail="Already submitted.")
 
     # Optionally, you can pass total_score to the template for display
     return templates.TemplateResponse(
@@ -1376,6 +1581,151 @@ async def submit_survey(
     )
 
 
+# ===============================
+# Batch survey page (one link per manager)
+# ===============================
+
+async def get_manager_link_by_token(session: AsyncSession, token: str) -> Optional[models.ManagerInviteLink]:
+    """The batch link a manager token belongs to, or None (bad signatures without a query)."""
+    link_id = parse_manager_token(token)
+    if link_id is None:
+        return None
+    link = await session.get(models.ManagerInviteLink, link_id)
+    # Only the most recently issued link of a manager is valid
+    if link is None or not hmac.compare_digest(link.token_hash, hash_token(token)):
+        return None
+    return link
+
+
+async def get_pending_assignments(session: AsyncSession, manager_email: str) -> List[models.SurveyAssignment]:
+    """A manager's unsubmitted assignments for active employees, with their employees."""
+    a = models.SurveyAssignment
+    return (await session.execute(
+        select(a)
+        .join(a.employee)
+        .options(joinedload(a.employee))
+        .where(a.manager_email == manager_email, a.is_submitted == False, models.Employee.is_active == True)
+        .order_by(models.Employee.name, a.id)
+    )).scalars().all()
+
+
+def batch_sections(assignments: List[models.SurveyAssignment]) -> List[dict]:
+    sections = []
+    for assignment in assignments:
+        survey_code, _ = get_survey_data(assignment.survey_name)
+        form_context = SURVEY_FORM_CONTEXTS.get(survey_code)
+        if form_context is None:
+            continue
+        sections.append({
+            "assignment_id": assignment.id,
+            "employee": EmployeeDisplay(name=assignment.employee.name, department=assignment.employee.department),
+            **form_context,
+        })
+    return sections
+
+
+def render_batch_page(
+    request: Request,
+    token: str,
+    assignments: List[models.SurveyAssignment],
+    *,
+    submitted: int = 0,
+    error: str | None = None,
+    answers=None,
+    status_code: int = 200,
+):
+    return templates.TemplateResponse(
+        "survey/batch.html",
+        {
+            "request": request,
+            "token": token,
+            "sections": batch_sections(assignments),
+            "submitted": submitted,
+            "error": error,
+            "answers": answers or {},
+        },
+        status_code=status_code,
+    )
+
+
+@app.get("/survey/manager/{token}", response_class=HTMLResponse)
+async def batch_survey_page(
+    request: Request,
+    token: str,
+    submitted: int = Query(0, ge=0),
+    session: AsyncSession = Depends(get_session),
+):
+    link = await get_manager_link_by_token(session, token)
+    if link is None:
+        raise HTTPException(status_code=404, detail="Invite link invalid")
+    assignments = await get_pending_assignments(session, link.manager_email)
+    return render_batch_page(request, token, assignments, submitted=submitted)
+
+
+@app.post("/survey/manager/{token}")
+async def submit_batch_survey(
+    request: Request,
+    token: str,
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Stores every fully answered section of the batch page in one
+    transaction. Untouched sections stay pending; each stored assignment
+    gets its own submission hash, exactly as if submitted through its own
+    link.
+    """
+    link = await get_manager_link_by_token(session, token)
+    if link is None:
+        raise HTTPException(status_code=404, detail="Invite link invalid")
+    assignments = await get_pending_assignments(session, link.manager_email)
+    form_data = await request.form()
+
+    # 1. Validate every answered section before writing anything
+    submissions = []
+    for assignment in assignments:
+        survey_code, survey_info = get_survey_data(assignment.survey_name)
+        if not survey_info:
+            continue
+        raw = [form_data.get(f"a{assignment.id}_q{i}") for i in range(1, len(survey_info["questions"]) + 1)]
+        if not any(raw):
+            continue
+        try:
+            scores = tuple(int(v) for v in raw)
+            if any(score not in SCORES for score in scores):
+                raise ValueError
+        except (TypeError, ValueError):
+            return render_batch_page(
+                request, token, assignments,
+                error=f"Please answer every question for {assignment.employee.name} ({survey_info['full_name']}), or leave it blank for later.",
+                answers=form_data,
+                status_code=400,
+            )
+        employee = assignment.employee
+        submissions.append(group_commit.Submission(
+            assignment_id=assignment.id,
+            token_hash=assignment.invite_token_hash,
+            employee_id=employee.id,
+            department=employee.department,
+            position=employee.position,
+            manager_email=assignment.manager_email,
+            survey_code=survey_code,
+            scores=scores,
+        ))
+
+    if not submissions:
+        return render_batch_page(
+            request, token, assignments,
+            error="Please complete at least one survey before submitting.",
+            status_code=400,
+        )
+
+    # 2. Claim and store them all in this request's transaction. An
+    # assignment submitted (or re-invited) meanwhile is skipped, not failed.
+    stored = await group_commit.store_submissions(session, submissions)
+    await session.commit()
+    return RedirectResponse(url=f"/survey/manager/{token}?submitted={len(stored)}", status_code=303)
+
+
 @app.get("/health")
 async def healthcheck():
     return {"status": "ok"}
\ No newline at end of file
@@ -1,7 +1,24 @@
 import datetime as dt
 import uuid
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, UniqueConstraint
-from sqlalchemy.dialects.postgresql import UUID, ARRAY
+from sqlalchemy import (
+    DDL,
+    Boolean,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    MetaData,
+    SmallInteger,
+    String,
+    Table,
+    Text,
+    UniqueConstraint,
+    event,
+    text as sa_text,
+)
+from sqlalchemy.dialects.postgresql import UUID, ARRAY, JSONB
 from sqlalchemy.orm import relationship
 from app.db import Base
 
@@ -25,12 +42,22 @@ class Employee(Base):
     position= Column(String(255), nullable=False) 
     is_active = Column(Boolean, nullable=False, default=True)
     created_at = Column(DateTime, default=dt.datetime.utcnow, nullable=False)
+    # sha256 of the normalized CSV content last imported for this employee
+    import_fingerprint = Column(String(64), nullable=True)
 
     assignments = relationship(
         "SurveyAssignment",
         back_populates="employee",
         cascade="all, delete-orphan",
     )
+    __table_args__ = (
+        # Trigram indexes for the directory's name/email search (needs pg_trgm)
+        Index("ix_employees_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+        Index("ix_employees_email_trgm", "email", postgresql_using="gin", postgresql_ops={"email": "gin_trgm_ops"}),
+        # Directory filters and their dropdown values
+        Index("ix_employees_department", "department"),
+        Index("ix_employees_position", "position"),
+    )
 
 class SurveyAssignment(Base):
     """Tracks individual invitations for each manager"""
@@ -50,8 +77,25 @@ class SurveyAssignment(Base):
     employee = relationship("Employee", back_populates="assignments")
     __table_args__ = (
         UniqueConstraint("employee_id", "manager_email", "survey_name", name="uq_emp_mgr_assignment"),
+        # Invite/reminder runs walk the unsubmitted assignments grouped by manager
+        Index("ix_survey_assignments_pending", "manager_email", "id", postgresql_where=sa_text("is_submitted = false")),
+        # Directory manager filter
+        Index("ix_survey_assignments_manager_email", "manager_email"),
+        # Dashboard counts and the directory survey/status filters
+        Index("ix_survey_assignments_survey_status", "survey_name", "is_submitted"),
     )
 
+class ManagerInviteLink(Base):
+    """A manager's batch link, covering all of their pending assignments"""
+    __tablename__ = "manager_invite_links"
+
+    id = Column(Integer, primary_key=True)
+    manager_email = Column(String(255), unique=True, nullable=False)
+    # Hash of the most recently issued link; reissuing revokes the previous one
+    token_hash = Column(String(128), nullable=False)
+    issued_at = Column(DateTime, nullable=False, default=dt.datetime.utcnow)
+
+
 class DepartmentHead(Base):
     __tablename__ = "department_heads"
 
@@ -72,21 +116,122 @@ class EmployeeSubmission(Base):
     submitted_at = Column(DateTime, nullable=False, default=dt.datetime.utcnow)
 
    
-    __table_args__ = (UniqueConstraint("employee_id", "submission_hash", "survey_name", name="uq_employee_submission"),)
+    __table_args__ = (
+        UniqueConstraint("employee_id", "submission_hash", "survey_name", name="uq_employee_submission"),
+        # Joins from submission_scores/submission_totals back to the submission
+        Index("ix_employee_submissions_submission_hash", "submission_hash"),
+    )
 
 
-class SurveyResponse(Base):
-    __tablename__ = "survey_responses"
+class SubmissionScores(Base):
+    """
+    One row per submission with its answers in question order:
+    scores[1] is question 1. Replaces the one-row-per-answer
+    survey_responses table, which is now a view over this one.
+    """
+    __tablename__ = "submission_scores"
 
-    id = Column(Integer, primary_key=True)
-    submission_hash = Column(String(128), nullable=False)  # <- use hash
+    submission_hash = Column(String(128), primary_key=True)
     survey_name = Column(String(50), nullable=False)
     department = Column(String(255), nullable=False)
-    question_no = Column(Integer, nullable=False)
-    score = Column(Integer, nullable=False)
+    scores = Column(ARRAY(SmallInteger), nullable=False)
     created_at = Column(DateTime, nullable=False, default=dt.datetime.utcnow)
 
 
+# Per-question compatibility view for ad-hoc SQL and reports written against
+# the old table. It is not part of Base.metadata: it is created by the
+# migration, or after submission_scores by create_all on a fresh database.
+SURVEY_RESPONSES_VIEW = """
+CREATE VIEW survey_responses AS
+SELECT s.submission_hash,
+       s.survey_name,
+       s.department,
+       r.question_no::integer AS question_no,
+       r.score::integer AS score,
+       s.created_at
+FROM submission_scores s
+CROSS JOIN LATERAL unnest(s.scores) WITH ORDINALITY AS r(score, question_no)
+"""
+
+event.listen(
+    SubmissionScores.__table__,
+    "after_create",
+    DDL(
+        "DO $$ BEGIN IF to_regclass('survey_responses') IS NULL THEN "
+        + SURVEY_RESPONSES_VIEW.strip()
+        + "; END IF; END $$"
+    ),
+)
+
+survey_responses = Table(
+    "survey_responses",
+    MetaData(),
+    Column("submission_hash", String(128)),
+    Column("survey_name", String(50)),
+    Column("department", String(255)),
+    Column("question_no", Integer),
+    Column("score", Integer),
+    Column("created_at", DateTime),
+)
+
+
+class SubmissionTotal(Base):
+    """Total score of a single submission, written alongside its responses"""
+    __tablename__ = "submission_totals"
+
+    submission_hash = Column(String(128), primary_key=True)
+    employee_id = Column(Integer, ForeignKey("employees.id", ondelete="CASCADE"), nullable=False)
+    survey_name = Column(String(50), nullable=False)
+    total_score = Column(Integer, nullable=False)
+    question_count = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        # forget_employee deletes by employee
+        Index("ix_submission_totals_employee_id", "employee_id"),
+    )
+
+
+class EmployeeScoreRollup(Base):
+    """Running sum/count of submission totals per employee and survey"""
+    __tablename__ = "employee_score_rollups"
+
+    employee_id = Column(Integer, ForeignKey("employees.id", ondelete="CASCADE"), primary_key=True)
+    survey_name = Column(String(50), primary_key=True)
+    # Department/position the employee's average is currently counted under
+    department = Column(String(255), nullable=False)
+    position = Column(String(255), nullable=False)
+    score_sum = Column(Integer, nullable=False, default=0)
+    submission_count = Column(Integer, nullable=False, default=0)
+
+
+class QuestionScoreRollup(Base):
+    __tablename__ = "question_score_rollups"
+
+    survey_name = Column(String(50), primary_key=True)
+    question_no = Column(Integer, primary_key=True)
+    score_sum = Column(Integer, nullable=False, default=0)
+    response_count = Column(Integer, nullable=False, default=0)
+
+
+class DepartmentScoreRollup(Base):
+    """Sum of per-employee averages, so the dashboard keeps averaging employees, not submissions"""
+    __tablename__ = "department_score_rollups"
+
+    survey_name = Column(String(50), primary_key=True)
+    department = Column(String(255), primary_key=True)
+    avg_sum = Column(Float, nullable=False, default=0)
+    employee_count = Column(Integer, nullable=False, default=0)
+
+
+class PositionScoreRollup(Base):
+    __tablename__ = "position_score_rollups"
+
+    survey_name = Column(String(50), primary_key=True)
+    position = Column(String(255), primary_key=True)
+    avg_sum = Column(Float, nullable=False, default=0)
+    employee_count = Column(Integer, nullable=False, default=0)
+
+
 # class SurveyComment(Base):
 #     __tablename__ = "survey_comments"
 
@@ -97,6 +242,56 @@ class SurveyResponse(Base):
 #     created_at = Column(DateTime, nullable=False, default=dt.datetime.utcnow)
 
 
+class ImportJob(Base):
+    """Background CSV import, processed and committed in chunks"""
+    __tablename__ = "import_jobs"
+
+    id = Column(Integer, primary_key=True)
+    status = Column(String(20), nullable=False, default="queued")  # queued | running | completed | failed
+    filename = Column(String(255), nullable=True)
+    spool_path = Column(String(1024), nullable=False)
+    chunk_size = Column(Integer, nullable=False)
+    rows_processed = Column(Integer, nullable=False, default=0)
+    added = Column(Integer, nullable=False, default=0)
+    updated = Column(Integer, nullable=False, default=0)
+    skipped = Column(Integer, nullable=False, default=0)
+    unchanged = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    # [{"first_row": 2, "last_row": 501, "error": "..."}]
+    errors = Column(JSONB, nullable=False, default=list)
+    created_at = Column(DateTime, nullable=False, default=dt.datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    # Touched on every commit of a running job; a stale one was interrupted
+    heartbeat_at = Column(DateTime, nullable=True, default=dt.datetime.utcnow)
+
+
+class EmailOutbox(Base):
+    """Rendered emails waiting for (or done with) delivery by the outbox worker"""
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True)
+    to_email = Column(String(255), nullable=False)
+    subject = Column(String(255), nullable=False)
+    # Bodies carry live survey links: cleared once sent, and once a dead
+    # email is past OUTBOX_DEAD_RETENTION_DAYS
+    html = Column(Text, nullable=True)
+    text = Column(Text, nullable=True)  # plain-text alternative
+    status = Column(String(20), nullable=False, default="pending")  # pending | sent | dead
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=dt.datetime.utcnow)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=dt.datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # The worker's claim query: pending rows that are due, oldest first
+        Index("ix_email_outbox_pending", "next_attempt_at", "id", postgresql_where=sa_text("status = 'pending'")),
+        # Quota usage: emails sent in the last day (app.ratelimit.usage)
+        Index("ix_email_outbox_sent_at", "sent_at", postgresql_where=sa_text("status = 'sent'")),
+    )
+
+
 class SMTPSettings(Base):
     __tablename__ = "smtp_settings"
 
@@ -108,4 +303,16 @@ class SMTPSettings(Base):
     use_tls = Column(Boolean, nullable=False, default=True)
     from_email = Column(String(255), nullable=False)
     from_name = Column(String(255), nullable=False)
+    # Provider quotas enforced by app.ratelimit (0 = unlimited)
+    rate_per_minute = Column(Integer, nullable=False, default=30)
+    rate_per_day = Column(Integer, nullable=False, default=10000)
     updated_at = Column(DateTime, nullable=False, default=dt.datetime.utcnow, onupdate=dt.datetime.utcnow)
+
+
+class SMTPRateBucket(Base):
+    """Shared token bucket state for the SMTP send-rate limiter"""
+    __tablename__ = "smtp_rate_buckets"
+
+    name = Column(String(20), primary_key=True)  # minute | day
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
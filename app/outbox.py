@@ -0,0 +1,293 @@
+"""
+Durable email outbox.
+
+Request handlers render their emails and `enqueue()` them in the same
+transaction as the token rotations they carry, so a link is only replaced
+if the email announcing it is queued, and return without waiting for SMTP.
+
+Each app worker runs one `OutboxWorker` (started from `startup_event`). It
+claims due rows with `SELECT ... FOR UPDATE SKIP LOCKED`, so several workers
+never pick the same row, and leases them by pushing next_attempt_at
+OUTBOX_LEASE seconds ahead in that short transaction. It then sends up to
+EMAIL_CONCURRENCY of them in parallel outside any transaction and records
+each outcome in its own. Sends are paced by the SMTP quotas (app.ratelimit);
+a message whose slot is further away than SMTP_RATE_MAX_WAIT is rescheduled
+instead of held. Failed sends are retried with exponential backoff; after
+EMAIL_MAX_RETRIES retries, or on a permanent SMTP error, the row is marked
+dead and kept for inspection and requeueing.
+
+The bodies carry live survey links, so a sent email's html/text are cleared
+when it is marked sent, and a dead one's after OUTBOX_DEAD_RETENTION_DAYS.
+
+Delivery is at least once: the rows of a worker that dies mid-batch become
+due again when their lease expires and are sent again.
+"""
+import asyncio
+import datetime as dt
+import time
+from typing import Dict, List, Optional, Tuple
+
+from aiosmtplib.errors import SMTPAuthenticationError
+from sqlalchemy import event, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app import models, ratelimit
+from app.config import settings
+from app.db import AsyncSessionLocal
+from app.email import get_smtp_config, is_transient_error, send_email
+
+PENDING = "pending"
+SENT = "sent"
+DEAD = "dead"
+
+
+def enqueue(
+    session: AsyncSession,
+    *,
+    to_email: str,
+    subject: str,
+    html: str,
+    text: Optional[str] = None,
+) -> models.EmailOutbox:
+    """Adds an email to the outbox in the session's transaction (the caller commits)."""
+    message = models.EmailOutbox(
+        to_email=to_email,
+        subject=subject,
+        html=html,
+        text=text,
+        status=PENDING,
+        next_attempt_at=dt.datetime.utcnow(),
+    )
+    session.add(message)
+    session.info["outbox_wake"] = True
+    return message
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_after_commit(session: Session) -> None:
+    # Other workers pick the rows up on their next poll
+    if session.info.pop("outbox_wake", False):
+        worker.wake()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop("outbox_wake", None)
+
+
+def _retry_delay(attempts: int) -> dt.timedelta:
+    return dt.timedelta(seconds=min(settings.email_retry_backoff * 2 ** (attempts - 1), 3600))
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    # Bad credentials are fixed on the SMTP page, so they are worth retrying too
+    return is_transient_error(exc) or isinstance(exc, SMTPAuthenticationError)
+
+
+async def claim_batch(session: AsyncSession) -> Tuple[List[models.EmailOutbox], dt.datetime]:
+    """
+    Leases up to OUTBOX_BATCH_SIZE due rows to this worker by moving their
+    next_attempt_at to the end of the lease, so other workers skip them
+    until then. The caller commits right away, which releases the row locks.
+    Returns the claimed rows and the lease end.
+    """
+    now = dt.datetime.utcnow()
+    lease_until = now + dt.timedelta(seconds=settings.outbox_lease)
+    o = models.EmailOutbox
+    due = (
+        select(o.id)
+        .where(o.status == PENDING, o.next_attempt_at <= now)
+        .order_by(o.next_attempt_at, o.id)
+        .limit(settings.outbox_batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    messages = (await session.scalars(
+        update(o)
+        .where(o.id.in_(due.scalar_subquery()))
+        .values(next_attempt_at=lease_until)
+        .returning(o)
+        .execution_options(synchronize_session=False)
+    )).all()
+    return sorted(messages, key=lambda m: m.id), lease_until
+
+
+async def _record(message_id: int, lease_until: dt.datetime, **values) -> None:
+    """Stores one send outcome in its own transaction, if this worker still holds the row's lease."""
+    o = models.EmailOutbox
+    async with AsyncSessionLocal() as session:
+        await session.execute(
+            update(o)
+            .where(o.id == message_id, o.status == PENDING, o.next_attempt_at == lease_until)
+            .values(**values)
+        )
+        await session.commit()
+
+
+async def deliver_batch() -> int:
+    """
+    Claims a batch (see `claim_batch`) and commits the claim, then sends the
+    emails outside any transaction, recording each outcome in its own short
+    transaction. No connection or row lock is held while sends wait for the
+    SMTP quota. Rows whose lease runs out before they are sent are left to
+    whichever worker claims them next. Returns the number of rows claimed.
+    """
+    async with AsyncSessionLocal() as session:
+        messages, lease_until = await claim_batch(session)
+        await session.commit()
+        if not messages:
+            return 0
+        smtp = await get_smtp_config(session)
+
+    semaphore = asyncio.Semaphore(max(settings.email_concurrency, 1))
+
+    async def deliver(message: models.EmailOutbox) -> None:
+        async with semaphore:
+            if dt.datetime.utcnow() >= lease_until:
+                return  # Another worker may have claimed it by now
+            wait = await ratelimit.acquire(smtp, max_wait=settings.smtp_rate_max_wait)
+            if wait:
+                # Quota exhausted for longer than we want to hold the claim
+                await _record(message.id, lease_until, next_attempt_at=dt.datetime.utcnow() + dt.timedelta(seconds=wait))
+                return
+            attempts = message.attempts + 1
+            try:
+                await send_email(
+                    host=smtp.host,
+                    port=smtp.port,
+                    username=smtp.username,
+                    password=smtp.password,
+                    use_tls=smtp.use_tls,
+                    from_email=smtp.from_email,
+                    from_name=smtp.from_name,
+                    to_email=message.to_email,
+                    subject=message.subject,
+                    html_content=message.html,
+                    text_content=message.text,
+                )
+            except Exception as e:  # noqa: BLE001
+                last_error = f"{type(e).__name__}: {e}"[:2000]
+                if attempts > settings.email_max_retries or not _is_retryable(e):
+                    print(f"[ERROR] Outbox email {message.id} to {message.to_email} is dead: {last_error}")
+                    await _record(message.id, lease_until, attempts=attempts, last_error=last_error, status=DEAD)
+                else:
+                    await _record(
+                        message.id,
+                        lease_until,
+                        attempts=attempts,
+                        last_error=last_error,
+                        next_attempt_at=dt.datetime.utcnow() + _retry_delay(attempts),
+                    )
+                return
+            # The bodies hold bearer survey links; only keep them while needed
+            await _record(
+                message.id,
+                lease_until,
+                attempts=attempts,
+                last_error=None,
+                status=SENT,
+                sent_at=dt.datetime.utcnow(),
+                html=None,
+                text=None,
+            )
+
+    await asyncio.gather(*(deliver(m) for m in messages))
+    return len(messages)
+
+
+async def status_counts(session: AsyncSession) -> Dict[str, int]:
+    rows = (await session.execute(
+        select(models.EmailOutbox.status, func.count()).group_by(models.EmailOutbox.status)
+    )).all()
+    counts = {PENDING: 0, SENT: 0, DEAD: 0}
+    counts.update({status: count for status, count in rows})
+    return counts
+
+
+async def requeue_dead(session: AsyncSession) -> int:
+    """Gives every dead email that still has its body a fresh set of attempts (the caller commits)."""
+    result = await session.execute(
+        update(models.EmailOutbox)
+        .where(models.EmailOutbox.status == DEAD, models.EmailOutbox.html.isnot(None))
+        .values(status=PENDING, attempts=0, next_attempt_at=dt.datetime.utcnow())
+    )
+    if result.rowcount:
+        session.info["outbox_wake"] = True
+    return result.rowcount
+
+
+async def redact_expired(session: AsyncSession) -> int:
+    """
+    Clears the bodies of dead emails older than OUTBOX_DEAD_RETENTION_DAYS
+    (the caller commits); they can no longer be requeued. Sent emails are
+    cleared as soon as they are sent.
+    """
+    cutoff = dt.datetime.utcnow() - dt.timedelta(days=settings.outbox_dead_retention_days)
+    o = models.EmailOutbox
+    result = await session.execute(
+        update(o)
+        .where(o.status == DEAD, o.html.isnot(None), o.created_at < cutoff)
+        .values(html=None, text=None)
+    )
+    return result.rowcount
+
+
+class OutboxWorker:
+    """Drains the outbox in this process: right after local enqueues, otherwise every OUTBOX_POLL_INTERVAL."""
+
+    def __init__(self):
+        self._task: asyncio.Task | None = None
+        self._wake = asyncio.Event()
+        self._redacted_at = 0.0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    async def _run(self) -> None:
+        while True:
+            self._wake.clear()
+            try:
+                claimed = await deliver_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:  # noqa: BLE001
+                print(f"[ERROR] Outbox worker: {type(e).__name__}: {e}")
+                claimed = 0
+            if claimed:
+                continue  # More may be due
+            await self._redact_hourly()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=settings.outbox_poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+    async def _redact_hourly(self) -> None:
+        now = time.monotonic()
+        if now - self._redacted_at < 3600:
+            return
+        self._redacted_at = now
+        try:
+            async with AsyncSessionLocal() as session:
+                redacted = await redact_expired(session)
+                await session.commit()
+            if redacted:
+                print(f"[INFO] Outbox: cleared the bodies of {redacted} expired dead emails.")
+        except Exception as e:  # noqa: BLE001
+            print(f"[ERROR] Outbox redaction: {type(e).__name__}: {e}")
+
+
+worker = OutboxWorker()
@@ -0,0 +1,156 @@
+"""
+Send-rate limiting for the SMTP mailbox.
+
+Two token buckets, sized from the SMTPSettings row, sit in front of every
+send: `rate_per_minute` refills continuously at rate_per_minute / 60 tokens
+per second with a small burst (SMTP_RATE_BURST), so messages are paced
+rather than sent in bursts that trip the provider's throttling;
+`rate_per_day` refills at rate_per_day / 86400 per second with the whole
+day's quota as capacity. A rate of 0 disables that bucket.
+
+The bucket state lives in `smtp_rate_buckets` and is updated under a row
+lock, so every app worker draws from the same quota.
+"""
+import asyncio
+import datetime as dt
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+from app.config import settings
+from app.db import AsyncSessionLocal
+from app.email import SMTPConfig
+
+MINUTE = "minute"
+DAY = "day"
+
+
+@dataclass
+class Bucket:
+    name: str
+    capacity: float
+    rate: float  # tokens per second
+
+    def refill(self, tokens: float, elapsed: float) -> float:
+        return min(self.capacity, tokens + elapsed * self.rate)
+
+
+def buckets_for(config: SMTPConfig) -> List[Bucket]:
+    buckets = []
+    if config.rate_per_minute:
+        burst = max(1, min(settings.smtp_rate_burst, config.rate_per_minute))
+        buckets.append(Bucket(MINUTE, burst, config.rate_per_minute / 60))
+    if config.rate_per_day:
+        buckets.append(Bucket(DAY, config.rate_per_day, config.rate_per_day / 86400))
+    return buckets
+
+
+async def _locked_state(session: AsyncSession, buckets: List[Bucket]) -> Dict[str, models.SMTPRateBucket]:
+    now = dt.datetime.utcnow()
+    # New buckets start full
+    await session.execute(
+        insert(models.SMTPRateBucket)
+        .values([{"name": b.name, "tokens": b.capacity, "updated_at": now} for b in buckets])
+        .on_conflict_do_nothing(index_elements=["name"])
+    )
+    rows = (await session.execute(
+        select(models.SMTPRateBucket)
+        .where(models.SMTPRateBucket.name.in_([b.name for b in buckets]))
+        .order_by(models.SMTPRateBucket.name)
+        .with_for_update()
+    )).scalars().all()
+    return {row.name: row for row in rows}
+
+
+async def try_acquire(session: AsyncSession, config: SMTPConfig) -> float:
+    """
+    Takes one token from every bucket if all have one and returns 0.
+    Otherwise takes nothing and returns the seconds until they will.
+    The caller commits.
+    """
+    buckets = buckets_for(config)
+    if not buckets:
+        return 0.0
+
+    state = await _locked_state(session, buckets)
+    now = dt.datetime.utcnow()
+    tokens = {}
+    for b in buckets:
+        row = state[b.name]
+        elapsed = max((now - row.updated_at).total_seconds(), 0.0)
+        tokens[b.name] = b.refill(row.tokens, elapsed)
+
+    wait = max((1 - tokens[b.name]) / b.rate for b in buckets)
+    taken = 1 if wait <= 0 else 0
+    for b in buckets:
+        state[b.name].tokens = tokens[b.name] - taken
+        state[b.name].updated_at = now
+    return max(wait, 0.0)
+
+
+async def acquire(config: SMTPConfig, max_wait: Optional[float] = None) -> float:
+    """
+    Waits for a send slot and takes it, in its own short transactions.
+    Returns 0 once a slot is taken. If the next slot is more than `max_wait`
+    seconds away, returns that delay instead without taking anything.
+    """
+    if not buckets_for(config):
+        return 0.0
+    while True:
+        async with AsyncSessionLocal() as session:
+            wait = await try_acquire(session, config)
+            await session.commit()
+        if wait <= 0:
+            return 0.0
+        if max_wait is not None and wait > max_wait:
+            return wait
+        await asyncio.sleep(wait)
+
+
+async def usage(session: AsyncSession, config: SMTPConfig) -> dict:
+    """Current quota usage and an estimate of how long the pending outbox takes to drain."""
+    now = dt.datetime.utcnow()
+    outbox = models.EmailOutbox
+    # Only the last day's sends, read through ix_email_outbox_sent_at
+    sent_last_minute, sent_last_day = (await session.execute(
+        select(
+            func.count().filter(outbox.sent_at >= now - dt.timedelta(minutes=1)),
+            func.count(),
+        )
+        .where(outbox.status == "sent", outbox.sent_at >= now - dt.timedelta(days=1))
+    )).one()
+    pending = (await session.execute(
+        select(func.count()).select_from(outbox).where(outbox.status == "pending")
+    )).scalar_one()
+
+    buckets = buckets_for(config)
+    rows = {}
+    if buckets:
+        rows = {
+            row.name: row
+            for row in (await session.execute(
+                select(models.SMTPRateBucket).where(models.SMTPRateBucket.name.in_([b.name for b in buckets]))
+            )).scalars()
+        }
+
+    available = {}
+    drain_seconds = 0.0
+    for b in buckets:
+        row = rows.get(b.name)
+        tokens = b.capacity if row is None else b.refill(row.tokens, max((now - row.updated_at).total_seconds(), 0.0))
+        available[b.name] = int(tokens)
+        drain_seconds = max(drain_seconds, max(pending - tokens, 0) / b.rate)
+
+    return {
+        "rate_per_minute": config.rate_per_minute,
+        "rate_per_day": config.rate_per_day,
+        "sent_last_minute": sent_last_minute,
+        "sent_last_day": sent_last_day,
+        "available_now": min(available.values()) if available else None,
+        "pending": pending,
+        "drain_eta_seconds": round(drain_seconds),
+    }
@@ -0,0 +1,335 @@
+"""
+Incrementally maintained score rollups for the admin dashboard.
+
+Submissions update these tables in the same transaction as their raw
+scores (app.group_commit.store_submissions), so the dashboard reads a
+handful of precomputed rows instead of re-aggregating every answer on every
+page load. Per-answer reads go through
+the survey_responses view over submission_scores.
+
+Run `python -m app.rollups` to rebuild all rollups from the raw data
+(backfill after deploying, or to repair drift).
+"""
+import asyncio
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import Float, cast, delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+
+ROLLUP_MODELS = (
+    models.SubmissionTotal,
+    models.EmployeeScoreRollup,
+    models.QuestionScoreRollup,
+    models.DepartmentScoreRollup,
+    models.PositionScoreRollup,
+)
+
+# (survey_name, department|position) -> [avg_sum delta, employee_count delta]
+GroupDeltas = Dict[Tuple[str, str], List[float]]
+
+
+async def _add_question_scores(session: AsyncSession, rows: Iterable[Tuple[str, int, int, int]]) -> None:
+    """Adds (survey_name, question_no, score_sum, response_count) deltas to the per-question rollup."""
+    # Sorted so concurrent writers lock rows in the same order
+    params = [
+        {"survey_name": s, "question_no": q, "score_sum": total, "response_count": count}
+        for s, q, total, count in sorted(rows)
+    ]
+    if not params:
+        return
+    stmt = insert(models.QuestionScoreRollup)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.QuestionScoreRollup.survey_name, models.QuestionScoreRollup.question_no],
+        set_={
+            "score_sum": models.QuestionScoreRollup.score_sum + stmt.excluded.score_sum,
+            "response_count": models.QuestionScoreRollup.response_count + stmt.excluded.response_count,
+        },
+    )
+    await session.execute(stmt, params)
+
+
+async def _add_group_deltas(session: AsyncSession, model, key: str, deltas: GroupDeltas) -> None:
+    """Adds averaged-score deltas to the department or position rollup."""
+    params = [
+        {"survey_name": s, key: k, "avg_sum": d[0], "employee_count": int(d[1])}
+        for (s, k), d in sorted(deltas.items())
+        if d[0] or d[1]
+    ]
+    if not params:
+        return
+    stmt = insert(model)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[model.survey_name, getattr(model, key)],
+        set_={
+            "avg_sum": model.avg_sum + stmt.excluded.avg_sum,
+            "employee_count": model.employee_count + stmt.excluded.employee_count,
+        },
+    )
+    await session.execute(stmt, params)
+
+
+async def _add_employee_deltas(session: AsyncSession, dept_deltas: GroupDeltas, pos_deltas: GroupDeltas) -> None:
+    await _add_group_deltas(session, models.DepartmentScoreRollup, "department", dept_deltas)
+    await _add_group_deltas(session, models.PositionScoreRollup, "position", pos_deltas)
+
+
+@dataclass(frozen=True)
+class ScoredSubmission:
+    employee_id: int
+    department: str
+    position: str
+    survey_code: str
+    submission_hash: str
+    scores: Tuple[int, ...]
+
+
+async def record_submissions(session: AsyncSession, submissions: List[ScoredSubmission]) -> None:
+    """
+    Folds a batch of submissions into every rollup with one statement per
+    rollup table. Must run in the transaction that stores their responses.
+    """
+    if not submissions:
+        return
+
+    # 1. Per-submission totals
+    await session.execute(
+        insert(models.SubmissionTotal).values([
+            {
+                "submission_hash": sub.submission_hash,
+                "employee_id": sub.employee_id,
+                "survey_name": sub.survey_code,
+                "total_score": sum(sub.scores),
+                "question_count": len(sub.scores),
+            }
+            for sub in submissions
+        ])
+    )
+
+    # 2. Per-question sums. An upsert may touch each row only once, so the
+    # batch is summed per question first.
+    question_sums: Dict[Tuple[str, int], List[int]] = defaultdict(lambda: [0, 0])
+    for sub in submissions:
+        for i, score in enumerate(sub.scores, start=1):
+            question_sums[(sub.survey_code, i)][0] += score
+            question_sums[(sub.survey_code, i)][1] += 1
+    await _add_question_scores(session, [(s, q, t, c) for (s, q), (t, c) in question_sums.items()])
+
+    # 3. Per-employee sum/count. The upsert row-locks each employee's rollup,
+    # so the old average can be derived exactly from the returned new values.
+    added: Dict[Tuple[int, str], List] = {}
+    for sub in submissions:
+        entry = added.setdefault((sub.employee_id, sub.survey_code), [0, 0, sub.department, sub.position])
+        entry[0] += sum(sub.scores)
+        entry[1] += 1
+    stmt = insert(models.EmployeeScoreRollup).values([
+        {
+            "employee_id": employee_id,
+            "survey_name": survey_code,
+            "department": department,
+            "position": position,
+            "score_sum": total,
+            "submission_count": count,
+        }
+        for (employee_id, survey_code), (total, count, department, position) in sorted(added.items())
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.EmployeeScoreRollup.employee_id, models.EmployeeScoreRollup.survey_name],
+        set_={
+            "score_sum": models.EmployeeScoreRollup.score_sum + stmt.excluded.score_sum,
+            "submission_count": models.EmployeeScoreRollup.submission_count + stmt.excluded.submission_count,
+        },
+    ).returning(
+        models.EmployeeScoreRollup.employee_id,
+        models.EmployeeScoreRollup.survey_name,
+        models.EmployeeScoreRollup.department,
+        models.EmployeeScoreRollup.position,
+        models.EmployeeScoreRollup.score_sum,
+        models.EmployeeScoreRollup.submission_count,
+    )
+    rows = (await session.execute(stmt)).all()
+
+    # 4. Department/position averages (mean of employee averages)
+    dept_deltas: GroupDeltas = defaultdict(lambda: [0.0, 0])
+    pos_deltas: GroupDeltas = defaultdict(lambda: [0.0, 0])
+    for row in rows:
+        added_sum, added_count = added[(row.employee_id, row.survey_name)][:2]
+        new_avg = row.score_sum / row.submission_count
+        old_count = row.submission_count - added_count
+        old_avg = (row.score_sum - added_sum) / old_count if old_count else 0.0
+        for deltas, key in ((dept_deltas, row.department), (pos_deltas, row.position)):
+            deltas[(row.survey_name, key)][0] += new_avg - old_avg
+            deltas[(row.survey_name, key)][1] += 0 if old_count else 1
+    await _add_employee_deltas(session, dept_deltas, pos_deltas)
+
+
+async def forget_employee(session: AsyncSession, employee_id: int) -> None:
+    """
+    Removes an employee's contribution from every rollup. Call before the
+    employee's submissions and responses are deleted.
+    """
+    hashes_stmt = select(models.EmployeeSubmission.submission_hash).where(
+        models.EmployeeSubmission.employee_id == employee_id
+    )
+
+    # 1. Take their responses out of the per-question sums
+    sr = models.survey_responses.c
+    q_rows = (
+        await session.execute(
+            select(sr.survey_name, sr.question_no, func.sum(sr.score), func.count())
+            .where(sr.submission_hash.in_(hashes_stmt))
+            .group_by(sr.survey_name, sr.question_no)
+        )
+    ).all()
+    await _add_question_scores(session, [(s, q, -int(total), -count) for s, q, total, count in q_rows])
+
+    # 2. Drop their per-employee rows and take the averages out of dept/position
+    removed = (
+        await session.execute(
+            delete(models.EmployeeScoreRollup)
+            .where(models.EmployeeScoreRollup.employee_id == employee_id)
+            .returning(
+                models.EmployeeScoreRollup.survey_name,
+                models.EmployeeScoreRollup.department,
+                models.EmployeeScoreRollup.position,
+                models.EmployeeScoreRollup.score_sum,
+                models.EmployeeScoreRollup.submission_count,
+            )
+        )
+    ).all()
+    dept_deltas: GroupDeltas = defaultdict(lambda: [0.0, 0])
+    pos_deltas: GroupDeltas = defaultdict(lambda: [0.0, 0])
+    for r in removed:
+        if not r.submission_count:
+            continue
+        avg = r.score_sum / r.submission_count
+        for deltas, key in ((dept_deltas, r.department), (pos_deltas, r.position)):
+            deltas[(r.survey_name, key)][0] -= avg
+            deltas[(r.survey_name, key)][1] -= 1
+    await _add_employee_deltas(session, dept_deltas, pos_deltas)
+
+    # 3. Per-submission totals
+    await session.execute(
+        delete(models.SubmissionTotal).where(models.SubmissionTotal.employee_id == employee_id)
+    )
+
+
+async def reassign_employees(session: AsyncSession, employee_ids: Iterable[int]) -> None:
+    """
+    Moves employees' averages to their current department/position after an
+    edit or import changed them. Employees that did not move are untouched.
+    """
+    employee_ids = list(employee_ids)
+    if not employee_ids:
+        return
+
+    stmt = (
+        select(models.EmployeeScoreRollup, models.Employee.department, models.Employee.position)
+        .join(models.Employee, models.Employee.id == models.EmployeeScoreRollup.employee_id)
+        .where(
+            models.EmployeeScoreRollup.employee_id.in_(employee_ids),
+            (models.EmployeeScoreRollup.department != models.Employee.department)
+            | (models.EmployeeScoreRollup.position != models.Employee.position),
+        )
+        .with_for_update(of=models.EmployeeScoreRollup)
+    )
+    rows = (await session.execute(stmt)).all()
+
+    dept_deltas: GroupDeltas = defaultdict(lambda: [0.0, 0])
+    pos_deltas: GroupDeltas = defaultdict(lambda: [0.0, 0])
+    for rollup, department, position in rows:
+        if rollup.submission_count:
+            avg = rollup.score_sum / rollup.submission_count
+            s = rollup.survey_name
+            if rollup.department != department:
+                dept_deltas[(s, rollup.department)][0] -= avg
+                dept_deltas[(s, rollup.department)][1] -= 1
+                dept_deltas[(s, department)][0] += avg
+                dept_deltas[(s, department)][1] += 1
+            if rollup.position != position:
+                pos_deltas[(s, rollup.position)][0] -= avg
+                pos_deltas[(s, rollup.position)][1] -= 1
+                pos_deltas[(s, position)][0] += avg
+                pos_deltas[(s, position)][1] += 1
+        rollup.department = department
+        rollup.position = position
+
+    await session.flush()
+    await _add_employee_deltas(session, dept_deltas, pos_deltas)
+
+
+async def rebuild_rollups(session: AsyncSession) -> None:
+    """Recomputes every rollup table from employee_submissions/submission_scores."""
+    for model in ROLLUP_MODELS:
+        await session.execute(delete(model))
+
+    es = models.EmployeeSubmission
+    sr = models.survey_responses.c
+
+    # 1. Per-submission totals
+    await session.execute(
+        insert(models.SubmissionTotal).from_select(
+            ["submission_hash", "employee_id", "survey_name", "total_score", "question_count"],
+            select(es.submission_hash, es.employee_id, es.survey_name, func.sum(sr.score), func.count())
+            .join(models.survey_responses, sr.submission_hash == es.submission_hash)
+            .group_by(es.submission_hash, es.employee_id, es.survey_name),
+        )
+    )
+
+    # 2. Per-employee sums, attributed to their current department/position
+    st = models.SubmissionTotal
+    await session.execute(
+        insert(models.EmployeeScoreRollup).from_select(
+            ["employee_id", "survey_name", "department", "position", "score_sum", "submission_count"],
+            select(
+                st.employee_id,
+                st.survey_name,
+                models.Employee.department,
+                models.Employee.position,
+                func.sum(st.total_score),
+                func.count(),
+            )
+            .join(models.Employee, models.Employee.id == st.employee_id)
+            .group_by(st.employee_id, st.survey_name, models.Employee.department, models.Employee.position),
+        )
+    )
+
+    # 3. Per-question sums
+    await session.execute(
+        insert(models.QuestionScoreRollup).from_select(
+            ["survey_name", "question_no", "score_sum", "response_count"],
+            select(sr.survey_name, sr.question_no, func.sum(sr.score), func.count())
+            .group_by(sr.survey_name, sr.question_no),
+        )
+    )
+
+    # 4. Department/position sums of employee averages
+    er = models.EmployeeScoreRollup
+    employee_avg = cast(er.score_sum, Float) / er.submission_count
+    for model, key in ((models.DepartmentScoreRollup, "department"), (models.PositionScoreRollup, "position")):
+        key_col = getattr(er, key)
+        await session.execute(
+            insert(model).from_select(
+                ["survey_name", key, "avg_sum", "employee_count"],
+                select(er.survey_name, key_col, func.sum(employee_avg), func.count())
+                .where(er.submission_count > 0)
+                .group_by(er.survey_name, key_col),
+            )
+        )
+
+
+async def _rebuild() -> None:
+    from app.db import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as session:
+        await rebuild_rollups(session)
+        await session.commit()
+    print("[INFO] Score rollups rebuilt.")
+
+
+if __name__ == "__main__":
+    asyncio.run(_rebuild())
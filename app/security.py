@@ -1,6 +1,22 @@
+import asyncio
+import base64
+import datetime as dt
 import hashlib
+import hmac
+import ipaddress
+import re
+import secrets
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Dict, Iterable, List, Optional, Union
+
 from passlib.context import CryptContext
 
+from app.config import settings
+
+IPNetwork = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
@@ -8,9 +24,209 @@ def hash_token(token: str) -> str:
     return hashlib.sha256(token.encode()).hexdigest()
 
 
+# ===============================
+# Signed invite tokens
+# ===============================
+# "<assignment id>.<nonce>.<signature>", signed with SECRET_KEY. A link can be
+# checked without touching the database and resolved by primary key; the
+# stored invite_token_hash still decides which of an assignment's links is
+# current, so rotating it revokes the old one.
+
+_INVITE_TOKEN = re.compile(r"^([1-9][0-9]{0,18})\.([A-Za-z0-9_-]{22})\.([A-Za-z0-9_-]{22})$")
+# secrets.token_urlsafe(32), the format before signed tokens
+_LEGACY_INVITE_TOKEN = re.compile(r"^[A-Za-z0-9_-]{43}$")
+
+
+def _sign(payload: str, purpose: str = "invite") -> str:
+    digest = hmac.new(settings.secret_key.encode(), f"{purpose}:{payload}".encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:16]).rstrip(b"=").decode()
+
+
+def make_invite_token(assignment_id: int) -> str:
+    payload = f"{assignment_id}.{secrets.token_urlsafe(16)}"
+    return f"{payload}.{_sign(payload)}"
+
+
+def parse_invite_token(token: str) -> Optional[int]:
+    """Assignment id of a correctly signed token, otherwise None."""
+    match = _INVITE_TOKEN.fullmatch(token)
+    if not match:
+        return None
+    assignment_id, nonce, signature = match.groups()
+    if not hmac.compare_digest(signature, _sign(f"{assignment_id}.{nonce}")):
+        return None
+    return int(assignment_id)
+
+
+def is_legacy_invite_token(token: str) -> bool:
+    return bool(_LEGACY_INVITE_TOKEN.fullmatch(token))
+
+
+def legacy_invite_tokens_accepted(today: Optional[dt.date] = None) -> bool:
+    """Whether unsigned pre-rollout links are still looked up (until the configured cutoff)."""
+    if not settings.accept_legacy_invite_tokens:
+        return False
+    until = settings.legacy_invite_tokens_until
+    return until is None or (today or dt.datetime.utcnow().date()) <= until
+
+
+# Batch links ("complete all pending surveys") have the same shape, carry a
+# manager_invite_links id and are signed for a different purpose, so neither
+# kind of token is accepted in place of the other.
+
+def make_manager_token(link_id: int) -> str:
+    payload = f"{link_id}.{secrets.token_urlsafe(16)}"
+    return f"{payload}.{_sign(payload, 'manager')}"
+
+
+def parse_manager_token(token: str) -> Optional[int]:
+    """Manager link id of a correctly signed batch token, otherwise None."""
+    match = _INVITE_TOKEN.fullmatch(token)
+    if not match:
+        return None
+    link_id, nonce, signature = match.groups()
+    if not hmac.compare_digest(signature, _sign(f"{link_id}.{nonce}", "manager")):
+        return None
+    return int(link_id)
+
+
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
 def verify_password(password: str, hashed: str) -> bool:
     return pwd_context.verify(password, hashed)
+
+
+# ===============================
+# Off-loop password hashing
+# ===============================
+# bcrypt costs ~250 ms of CPU per call. It releases the GIL, so a few threads
+# keep it off the event loop; the semaphore bounds how many calls may run or
+# wait at once so a burst of logins is refused instead of queueing forever.
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing pool and its queue are full."""
+
+
+_hash_executor = ThreadPoolExecutor(
+    max_workers=max(settings.password_hash_workers, 1),
+    thread_name_prefix="bcrypt",
+)
+_hash_slots = asyncio.Semaphore(max(settings.password_hash_workers, 1) + max(settings.password_hash_queue, 0))
+
+
+async def _run_hasher(func, *args):
+    if _hash_slots.locked():
+        raise PasswordHasherBusy()
+    async with _hash_slots:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, func, *args)
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_hasher(get_password_hash, password)
+
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    return await _run_hasher(verify_password, password, hashed)
+
+
+# ===============================
+# Login attempt limiter
+# ===============================
+
+class LoginLimiter:
+    """
+    Sliding-window count of failed logins per key. A key with `max_failures`
+    failures in the last `window` seconds is refused before any bcrypt work
+    is done. In-process only: each worker counts its own attempts.
+    """
+
+    def __init__(self, max_failures: int, window: float):
+        self.max_failures = max_failures
+        self.window = window
+        self._failures: Dict[str, Deque[float]] = defaultdict(deque)
+
+    def _recent(self, key: str, now: float) -> Deque[float]:
+        failures = self._failures[key]
+        while failures and failures[0] <= now - self.window:
+            failures.popleft()
+        if not failures:
+            del self._failures[key]
+        return failures
+
+    def retry_after(self, keys: Iterable[str]) -> float:
+        """Seconds until every key may try again; 0 if none is blocked."""
+        now = time.monotonic()
+        wait = 0.0
+        for key in keys:
+            failures = self._recent(key, now)
+            if len(failures) >= self.max_failures:
+                wait = max(wait, failures[0] + self.window - now)
+        return wait
+
+    def record_failure(self, keys: Iterable[str]) -> None:
+        now = time.monotonic()
+        for key in keys:
+            self._failures[key].append(now)
+        if len(self._failures) > 10000:
+            for key in list(self._failures):
+                self._recent(key, now)
+
+    def reset(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self._failures.pop(key, None)
+
+
+# Per account, and per client address with a higher ceiling since several
+# admins may share an address (e.g. an office NAT)
+email_login_limiter = LoginLimiter(
+    max_failures=settings.login_max_failures,
+    window=settings.login_failure_window,
+)
+ip_login_limiter = LoginLimiter(
+    max_failures=settings.login_max_failures_per_ip,
+    window=settings.login_failure_window,
+)
+
+
+# ===============================
+# Client address behind the reverse proxy
+# ===============================
+# X-Forwarded-For is only believed when the connection comes from one of
+# TRUSTED_PROXIES; anyone else could send it to pick their own address.
+
+def _parse_networks(spec: str) -> List[IPNetwork]:
+    networks = []
+    for part in spec.split(","):
+        part = part.strip()
+        if part:
+            networks.append(ipaddress.ip_network(part, strict=False))
+    return networks
+
+
+trusted_proxies = _parse_networks(settings.trusted_proxies)
+
+
+def _is_trusted(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in trusted_proxies)
+
+
+def client_address(peer: Optional[str], forwarded_for: Optional[str]) -> str:
+    """
+    The address a request came from: the connecting peer, unless that is a
+    trusted proxy, in which case the nearest X-Forwarded-For hop that is
+    not itself a trusted proxy.
+    """
+    address = peer or "-"
+    if not forwarded_for or not _is_trusted(address):
+        return address
+    for hop in reversed([h.strip() for h in forwarded_for.split(",") if h.strip()]):
+        address = hop
+        if not _is_trusted(hop):
+            break
+    return address
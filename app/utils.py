@@ -200,50 +200,3 @@ GRADING_FUNCTIONS = {
     "ICSES": client_score_category,
     "TSES": team_score_category,
 }
-
-def aggregate_employee_scores(employee):
-    """
-    Returns a dict like:
-    {
-        "MSES": {"num_submissions": 3, "total_score": 87, "avg_score": 29, "category": "Exceeds Target"},
-        "ICSES": {...},
-    }
-    """
-    result = {}
-
-    # Iterate all manager summaries
-    for manager_data in getattr(employee, "manager_summary", {}).values():
-        for survey in manager_data["surveys"]:
-            s_code = survey["survey_name"]
-            res = survey.get("result")
-            if not res:
-                continue
-
-            total_score = res.get("total_score", 0)
-            if s_code not in result:
-                result[s_code] = {
-                    "num_submissions": 0,
-                    "total_score": 0,
-                    "avg_score": 0,
-                    "category": "N/A"
-                }
-
-            result[s_code]["num_submissions"] += 1
-            result[s_code]["total_score"] += total_score
-
-    # Compute average and category
-    for s_code, data in result.items():
-        if data["num_submissions"] > 0:
-            data["avg_score"] = round(data["total_score"] / data["num_submissions"], 2)
-            grading_func = GRADING_FUNCTIONS.get(s_code)
-            if grading_func:
-                data["category"] = grading_func(data["avg_score"])
-            else:
-                data["category"] = "N/A"
-        else:
-            data["avg_score"] = 0
-            data["category"] = "N/A"
-
-    return result
-
-
@@ -0,0 +1,134 @@
+"""
+Dashboard benchmark: query count and latency of the per-survey loop the
+dashboard used to run against raw responses (now the survey_responses view)
+versus app.dashboard.
+
+    python -m scripts.bench_dashboard --seed --employees 2000 --managers 300
+    python -m scripts.bench_dashboard --runs 50
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import event, func, select
+
+from app import models
+from app.dashboard import load_survey_stats
+from app.db import AsyncSessionLocal, engine
+from app.utils import GRADING_FUNCTIONS, SURVEY_DETAILS
+from scripts.seed import create_schema, seed_survey_data
+
+
+async def legacy_survey_stats(session):
+    """The original admin_dashboard loop, kept here as the baseline."""
+    survey_stats = {}
+    sr = models.survey_responses.c
+    for s_key, s_info in SURVEY_DETAILS.items():
+        grading_func = GRADING_FUNCTIONS.get(s_key)
+
+        assign_stmt = select(models.SurveyAssignment).where(models.SurveyAssignment.survey_name == s_key)
+        assignments = (await session.execute(assign_stmt)).scalars().all()
+        if not assignments:
+            continue
+
+        sub_stmt = (
+            select(
+                models.EmployeeSubmission.employee_id,
+                func.sum(sr.score).label("submission_total")
+            )
+            .join(models.survey_responses, models.EmployeeSubmission.submission_hash == sr.submission_hash)
+            .where(models.EmployeeSubmission.survey_name == s_key)
+            .group_by(models.EmployeeSubmission.submission_hash, models.EmployeeSubmission.employee_id)
+        ).subquery()
+        stmt = (
+            select(
+                models.Employee.name,
+                models.Employee.department,
+                models.Employee.position,
+                func.avg(sub_stmt.c.submission_total).label("avg_total_score"),
+                func.count(sub_stmt.c.employee_id).label("submission_count")
+            )
+            .join(sub_stmt, models.Employee.id == sub_stmt.c.employee_id)
+            .group_by(models.Employee.id, models.Employee.name, models.Employee.department, models.Employee.position)
+        )
+        results = (await session.execute(stmt)).all()
+
+        all_scores = []
+        dept_data = {}
+        pos_data = {}
+        for r in results:
+            score = float(r.avg_total_score)
+            all_scores.append(score)
+            dept_data.setdefault(r.department, []).append(score)
+            pos_data.setdefault(r.position, []).append(score)
+
+        q_avg_stmt = (
+            select(sr.question_no, func.avg(sr.score))
+            .where(sr.survey_name == s_key)
+            .group_by(sr.question_no)
+        )
+        q_results = (await session.execute(q_avg_stmt)).all()
+
+        survey_stats[s_key] = {
+            "total_employees": len(assignments),
+            "submitted_employees": sum(1 for a in assignments if a.is_submitted),
+            "overall_avg": sum(all_scores) / len(all_scores) if all_scores else 0,
+            "dept_avgs": {d: sum(s) / len(s) for d, s in dept_data.items()},
+            "pos_avgs": {p: sum(s) / len(s) for p, s in pos_data.items()},
+            "question_avgs": dict(q_results),
+        }
+    return survey_stats
+
+
+async def measure(name, func, runs):
+    queries = 0
+
+    def counter(*args, **kwargs):
+        nonlocal queries
+        queries += 1
+
+    event.listen(engine.sync_engine, "before_cursor_execute", counter)
+    timings = []
+    try:
+        for _ in range(runs):
+            async with AsyncSessionLocal() as session:
+                start = time.perf_counter()
+                await func(session)
+                timings.append((time.perf_counter() - start) * 1000)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", counter)
+
+    timings.sort()
+    p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+    print(
+        f"{name:<12} queries/view={queries / runs:>5.1f}  "
+        f"p50={statistics.median(timings):>8.2f} ms  p95={p95:>8.2f} ms  max={timings[-1]:>8.2f} ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", action="store_true", help="replace data with a synthetic org first")
+    parser.add_argument("--employees", type=int, default=2000)
+    parser.add_argument("--managers", type=int, default=300)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    await create_schema()
+    if args.seed:
+        async with AsyncSessionLocal() as session:
+            await seed_survey_data(session, employees=args.employees, managers=args.managers)
+
+    # Warm up connections and caches before timing
+    async with AsyncSessionLocal() as session:
+        await legacy_survey_stats(session)
+        await load_survey_stats(session)
+
+    await measure("legacy", legacy_survey_stats, args.runs)
+    await measure("dashboard", load_survey_stats, args.runs)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,212 @@
+"""
+Email rendering micro-benchmark: the f-string HTML assembly invite_employee
+used to do versus the compiled Jinja2 templates in app/templates/email/
+(subject + HTML + plain text per message).
+
+    python -m scripts.bench_email_render --messages 10000
+"""
+import argparse
+import datetime as dt
+import statistics
+import time
+
+from app.email_templates import INVITATION, render_email
+from app.main import SURVEY_EMAIL_CONTENT
+from app.utils import SURVEY_DETAILS
+
+# The old copy embedded the employee name in "intro"
+LEGACY_EMAIL_CONTENT = {
+    code: {**cfg, "intro": cfg["intro"] + " <strong>{employee_name}</strong>."}
+    for code, cfg in SURVEY_EMAIL_CONTENT.items()
+}
+
+
+def legacy_render(manager_name, survey_info, email_cfg, items):
+    """The original invite_employee HTML assembly, kept here as the baseline."""
+    # --- Single employee ---
+    if len(items) == 1:
+        item = items[0]
+        employee_name = item["employee_name"]
+        link = item["link"]
+
+        body_html = f"""
+        <p style="font-size:15px; line-height:1.6; color:#000;">
+            <strong>{survey_info['full_name']}</strong>
+        </p>
+
+        <p style="font-size:15px; line-height:1.6; color:#000;">
+            {email_cfg['intro'].format(employee_name=employee_name)}
+        </p>
+
+        <p style="font-size:15px; line-height:1.6; color:#000;">
+            {email_cfg['value']}
+        </p>
+
+        <div style="text-align:center; margin:16px 0;">
+            <a href="{link}"
+               style="display:inline-block; background:#000; color:#a99a68;
+                      padding:14px 28px; border-radius:6px;
+                      text-decoration:none; font-weight:bold;">
+                Start {survey_info['full_name']}
+            </a>
+        </div>
+
+        <p style="font-size:13px; color:#333; word-break:break-all;">
+            If the button above doesn’t work, please copy the link below:<br>
+            <a href="{link}" style="color:#000; text-decoration:underline;">
+                {link}
+            </a>
+        </p>
+        """
+    else:
+        # --- 2b. Multiple employees: table layout ---
+        rows = ""
+        for item in items:
+            employee_name = item["employee_name"]
+            link = item["link"]
+            rows += f"""
+            <tr>
+                <td style="padding:8px; border:1px solid #000;">{employee_name}</td>
+                <td style="padding:8px; border:1px solid #000; text-align:center;">
+                    <a href="{link}"
+                       style="display:inline-block; background:#000; color:#a99a68;
+                              padding:8px 16px; border-radius:6px; text-decoration:none; font-weight:bold;">
+                        Start Survey
+                    </a>
+                </td>
+                <td style="padding:8px; border:1px solid #000; word-break:break-all;">
+                    <a href="{link}" style="color:#000; text-decoration:underline;">{link}</a>
+                </td>
+            </tr>
+            """
+        body_html = f"""
+        <p style="font-size:15px; line-height:1.6; color:#000;">
+            <strong>{survey_info['full_name']}</strong>
+        </p>
+
+        <p style="font-size:15px; line-height:1.6; color:#000;">
+            {email_cfg['intro'].format(employee_name='your team members')}
+        </p>
+
+        <p style="font-size:15px; line-height:1.6; color:#000;">
+            {email_cfg['value']}
+        </p>
+
+        <table width="100%" cellpadding="4" cellspacing="0"
+               style="border-collapse:collapse; margin-top:16px; font-size:14px;">
+            <thead>
+                <tr style="background:#000; color:#a99a68;">
+                    <th style="padding:8px; border:1px solid #000;">Employee</th>
+                    <th style="padding:8px; border:1px solid #000;">Survey</th>
+                    <th style="padding:8px; border:1px solid #000;">Link</th>
+                </tr>
+            </thead>
+            <tbody>
+                {rows}
+            </tbody>
+        </table>
+        """
+
+    # --- 3️⃣ Wrap in full email template ---
+    html = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+      <meta charset="UTF-8">
+      <title>{survey_info['full_name']} Invitation</title>
+    </head>
+    <body style="margin:0; padding:40px; background:#000; font-family:Arial, Helvetica, sans-serif;">
+
+      <table width="100%" cellpadding="0" cellspacing="0">
+        <tr>
+          <td align="center">
+            <table width="600" cellpadding="0" cellspacing="0"
+                   style="background:#a99a68; border-radius:8px; overflow:hidden;">
+
+              <tr>
+                <td style="background:#000; color:#a99a68; padding:20px; text-align:center;">
+                  <h2 style="margin:0;">Survey Invitation</h2>
+                </td>
+              </tr>
+
+              <tr>
+                <td style="padding:32px;">
+                  <p style="font-size:16px;">Dear {manager_name},</p>
+                  {body_html}
+                  <p style="font-size:14px; margin-top:24px;">
+                    <strong>All responses are anonymous.</strong>
+                  </p>
+                
+                </td>
+              </tr>
+
+              <tr>
+                <td style="background:#000; color:#a99a68; padding:16px; text-align:center; font-size:12px;">
+                  © {dt.datetime.utcnow().year} InfinityCapital. All rights reserved.
+                </td>
+              </tr>
+
+            </table>
+          </td>
+        </tr>
+      </table>
+
+    </body>
+    </html>
+    """
+
+    return f"Feedback Survey – {survey_info['full_name']}", html
+
+
+def template_render(manager_name, survey_info, email_cfg, items):
+    rendered = render_email(
+        INVITATION,
+        manager_name=manager_name,
+        survey_name=survey_info["full_name"],
+        content=email_cfg,
+        items=items,
+        year=dt.datetime.utcnow().year,
+    )
+    return rendered.subject, rendered.html, rendered.text
+
+
+def make_items(n: int):
+    return [
+        {"employee_name": f"Employee {i}", "link": f"https://survey.example.com/survey/{'x' * 43}{i}"}
+        for i in range(n)
+    ]
+
+
+def bench(label, render, content, messages, team_size, rounds):
+    survey_info = SURVEY_DETAILS["MSES"]
+    email_cfg = content["MSES"]
+    items = make_items(team_size)
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for i in range(messages):
+            render(f"Manager {i}", survey_info, email_cfg, items)
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    print(
+        f"{label:<10} {messages} messages x {team_size} employees: "
+        f"best {best * 1000:.0f} ms, median {statistics.median(timings) * 1000:.0f} ms, "
+        f"{messages / best:,.0f} msg/s"
+    )
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    for team_size in (1, 8):
+        legacy = bench("f-string", legacy_render, LEGACY_EMAIL_CONTENT, args.messages, team_size, args.rounds)
+        jinja = bench("jinja2", template_render, SURVEY_EMAIL_CONTENT, args.messages, team_size, args.rounds)
+        print(f"{'':<10} ratio jinja2/f-string: {jinja / legacy:.2f}x (jinja2 also renders the text part)\n")
+
+
+if __name__ == "__main__":
+    main()
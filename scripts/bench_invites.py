@@ -0,0 +1,253 @@
+"""
+End-to-end invitation throughput against a local SMTP sink.
+
+Starts an in-process aiosmtpd server that requires STARTTLS (self-signed
+certificate made with `openssl`) and AUTH, with configurable per-message
+latency and failure rate. Then it seeds a synthetic org, runs invite_managers
+for invites and then reminders, and drains the email outbox through the real
+delivery path: outbox -> rate limiter -> send_email -> SMTP pool. It reports
+messages per second, p50/p95 per-message send latency and how many
+connections/logins the sink saw.
+
+Needs `pip install aiosmtpd` (not an app dependency).
+
+WARNING: writes into the database configured by DATABASE_URL (seed data,
+outbox rows, and temporarily the SMTP settings row). Point it at a throwaway
+database.
+
+    python -m scripts.bench_invites --employees 2000 --managers 600
+    python -m scripts.bench_invites --latency-ms 80 --failure-rate 0.02
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import ssl
+import statistics
+import subprocess
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import List
+
+try:
+    from aiosmtpd.controller import Controller
+    from aiosmtpd.smtp import SMTP as SMTPServer, AuthResult
+except ImportError:  # pragma: no cover - optional benchmark dependency
+    raise SystemExit("This benchmark needs aiosmtpd: pip install aiosmtpd")
+
+from sqlalchemy import delete, func, select
+
+from app import models, outbox
+from app.cache import smtp_cache
+from app.config import settings
+from app.db import AsyncSessionLocal, engine
+from app.email import close_smtp_pools
+from app.main import invite_managers
+from scripts.seed import create_schema, seed_survey_data
+
+USERNAME = "bench@example.com"
+PASSWORD = "bench-password"
+
+
+@dataclass
+class SinkStats:
+    connections: int = 0
+    logins: int = 0
+    accepted: int = 0
+    rejected: int = 0
+
+
+class SinkHandler:
+    """Accepts every message after `latency` seconds, or rejects it with a 4xx reply."""
+
+    def __init__(self, latency: float, jitter: float, failure_rate: float, seed: int):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.stats = SinkStats()
+
+    async def handle_DATA(self, server, session, envelope):
+        await asyncio.sleep(max(0.0, self.rng.gauss(self.latency, self.jitter)))
+        if self.rng.random() < self.failure_rate:
+            self.stats.rejected += 1
+            # Half throttling replies, half "closing connection"
+            return "421 4.3.2 Service not available" if self.rng.random() < 0.5 else "451 4.7.500 Try again later"
+        self.stats.accepted += 1
+        return "250 Message accepted for delivery"
+
+
+class CountingSMTPServer(SMTPServer):
+    def connection_made(self, transport):
+        self.event_handler.stats.connections += 1
+        super().connection_made(transport)
+
+
+class SinkController(Controller):
+    def factory(self):
+        return CountingSMTPServer(self.handler, **self.SMTP_kwargs)
+
+
+def _authenticator(handler: SinkHandler):
+    def authenticate(server, session, envelope, mechanism, auth_data):
+        handler.stats.logins += 1
+        ok = auth_data.login == USERNAME.encode() and auth_data.password == PASSWORD.encode()
+        return AuthResult(success=ok)
+    return authenticate
+
+
+def _self_signed_context(directory: str) -> ssl.SSLContext:
+    cert = os.path.join(directory, "cert.pem")
+    key = os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-keyout", key, "-out", cert,
+         "-days", "1", "-subj", "/CN=localhost"],
+        check=True,
+        capture_output=True,
+    )
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert, key)
+    return context
+
+
+@dataclass
+class RunStats:
+    latencies: List[float] = field(default_factory=list)
+
+
+async def drain_outbox(first_id: int) -> float:
+    """Delivers every pending row created by this run, including retries. Returns the elapsed seconds."""
+    start = time.perf_counter()
+    while True:
+        if await outbox.deliver_batch():
+            continue
+        async with AsyncSessionLocal() as session:
+            pending = (await session.execute(
+                select(func.count()).where(
+                    models.EmailOutbox.id >= first_id,
+                    models.EmailOutbox.status == outbox.PENDING,
+                )
+            )).scalar_one()
+        if not pending:
+            return time.perf_counter() - start
+        await asyncio.sleep(0.05)  # wait for retries to come due
+
+
+async def run_phase(label: str, reminders_only: bool, run: RunStats, handler: SinkHandler, quiet: bool):
+    async with AsyncSessionLocal() as session:
+        first_id = ((await session.execute(select(func.max(models.EmailOutbox.id)))).scalar_one() or 0) + 1
+        start = time.perf_counter()
+        managers = await invite_managers(session, "http://bench.local", reminders_only=reminders_only)
+        enqueue_seconds = time.perf_counter() - start
+
+    before = SinkStats(**vars(handler.stats))
+    run.latencies.clear()
+    out = io.StringIO() if quiet else None
+    with contextlib.redirect_stdout(out) if quiet else contextlib.nullcontext():
+        drain_seconds = await drain_outbox(first_id)
+
+    async with AsyncSessionLocal() as session:
+        sent, dead, attempts = (await session.execute(
+            select(
+                func.count().filter(models.EmailOutbox.status == outbox.SENT),
+                func.count().filter(models.EmailOutbox.status == outbox.DEAD),
+                func.coalesce(func.sum(models.EmailOutbox.attempts), 0),
+            ).where(models.EmailOutbox.id >= first_id)
+        )).one()
+
+    lat = sorted(run.latencies) or [0.0]
+    p95 = lat[max(0, int(len(lat) * 0.95) - 1)]
+    stats = handler.stats
+    print(f"--- {label} ---")
+    print(f"managers queued      {managers}  (enqueue took {enqueue_seconds * 1000:.0f} ms)")
+    print(f"messages             {sent} sent, {dead} dead, {attempts - sent - dead} retries")
+    print(f"throughput           {sent / drain_seconds if drain_seconds else 0:,.1f} msg/s over {drain_seconds:.2f} s")
+    print(f"send latency         p50={statistics.median(lat) * 1000:.1f} ms  p95={p95 * 1000:.1f} ms")
+    print(
+        f"sink                 {stats.connections - before.connections} connections, "
+        f"{stats.logins - before.logins} logins, {stats.rejected - before.rejected} injected failures"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--employees", type=int, default=2000)
+    parser.add_argument("--managers", type=int, default=600)
+    parser.add_argument("--managers-per-employee", type=int, default=2)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="mean server-side delay per message")
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of messages answered with 421/451")
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--verbose", action="store_true", help="keep the per-message [DEBUG] output")
+    args = parser.parse_args()
+
+    handler = SinkHandler(args.latency_ms / 1000, args.jitter_ms / 1000, args.failure_rate, args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        tls_context = _self_signed_context(tmp)
+        controller = SinkController(
+            handler,
+            hostname="127.0.0.1",
+            port=args.port,
+            tls_context=tls_context,
+            require_starttls=True,
+            authenticator=_authenticator(handler),
+            auth_require_tls=True,
+        )
+        controller.start()
+
+    # Self-signed sink certificate; retries come due almost immediately
+    settings.smtp_validate_certs = False
+    settings.email_retry_backoff = 0.05
+
+    # Time each send on the real delivery path
+    run = RunStats()
+    send_email = outbox.send_email
+
+    async def timed_send_email(*a, **kw):
+        start = time.perf_counter()
+        try:
+            return await send_email(*a, **kw)
+        finally:
+            run.latencies.append(time.perf_counter() - start)
+
+    outbox.send_email = timed_send_email
+
+    await create_schema()
+    async with AsyncSessionLocal() as session:
+        await seed_survey_data(
+            session,
+            employees=args.employees,
+            managers=args.managers,
+            managers_per_employee=args.managers_per_employee,
+            submitted_ratio=0.0,
+        )
+        await session.execute(delete(models.EmailOutbox))
+        await session.execute(delete(models.SMTPRateBucket))
+        smtp = (await session.execute(select(models.SMTPSettings).limit(1))).scalars().first()
+        saved = {c: getattr(smtp, c) for c in ("host", "port", "username", "password", "rate_per_minute", "rate_per_day")}
+        smtp.host, smtp.port, smtp.username, smtp.password = "127.0.0.1", args.port, USERNAME, PASSWORD
+        smtp.rate_per_minute = smtp.rate_per_day = 0  # measure the pipeline, not the quota
+        await session.commit()
+    smtp_cache.bump()
+
+    try:
+        await run_phase("invites", False, run, handler, quiet=not args.verbose)
+        await run_phase("reminders", True, run, handler, quiet=not args.verbose)
+    finally:
+        outbox.send_email = send_email
+        async with AsyncSessionLocal() as session:
+            smtp = (await session.execute(select(models.SMTPSettings).limit(1))).scalars().first()
+            for column, value in saved.items():
+                setattr(smtp, column, value)
+            await session.commit()
+        await close_smtp_pools()
+        controller.stop()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+"""
+Event-loop latency while admin logins are being verified.
+
+Runs a stand-in for survey traffic (a coroutine that wakes every
+--interval-ms and records how late it woke) while --logins concurrent
+password checks run, first with the blocking `verify_password` called on
+the loop (how admin_login used to work) and then with
+`verify_password_async`. Reports p50/p95/max wake-up delay for each mode,
+plus how many checks the bounded hashing queue refused.
+
+It fails (exit status 1) if the offloaded mode's p95 wake-up delay exceeds
+--max-p95-ms, i.e. if login load would noticeably delay survey requests on
+the same worker.
+
+No database or server needed; it uses the same bcrypt settings as the app.
+
+    python -m scripts.bench_login_latency --logins 20
+    PASSWORD_HASH_WORKERS=4 python -m scripts.bench_login_latency --logins 50 --max-p95-ms 20
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from typing import List
+
+from app.config import settings
+from app.security import PasswordHasherBusy, get_password_hash, verify_password, verify_password_async
+
+
+async def ticker(interval: float, delays: List[float], stop: asyncio.Event) -> None:
+    """Records how far past its deadline each wake-up is."""
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        delays.append(max(time.perf_counter() - expected, 0.0))
+
+
+async def blocking_login(password: str, hashed: str) -> bool:
+    return verify_password(password, hashed)
+
+
+async def offloaded_login(password: str, hashed: str) -> bool:
+    return await verify_password_async(password, hashed)
+
+
+async def run_mode(label: str, login, logins: int, interval: float, hashed: str) -> float:
+    """Runs one burst of logins and returns the p95 wake-up delay in seconds."""
+    delays: List[float] = []
+    stop = asyncio.Event()
+    tick = asyncio.create_task(ticker(interval, delays, stop))
+    await asyncio.sleep(interval * 5)  # baseline samples before the burst
+
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(login("wrong-password", hashed) for _ in range(logins)),
+        return_exceptions=True,
+    )
+    elapsed = time.perf_counter() - start
+
+    await asyncio.sleep(interval * 5)
+    stop.set()
+    await tick
+
+    refused = sum(isinstance(r, PasswordHasherBusy) for r in results)
+    lat = sorted(delays) or [0.0]
+    p95 = lat[max(0, int(len(lat) * 0.95) - 1)]
+    print(f"--- {label} ---")
+    print(f"logins               {logins - refused} verified, {refused} refused (busy) in {elapsed:.2f} s")
+    print(
+        f"loop delay           p50={statistics.median(lat) * 1000:.1f} ms  "
+        f"p95={p95 * 1000:.1f} ms  max={lat[-1] * 1000:.1f} ms  ({len(lat)} samples)"
+    )
+    return p95
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=20, help="concurrent login attempts")
+    parser.add_argument("--interval-ms", type=float, default=10.0, help="survey stand-in wake-up interval")
+    parser.add_argument(
+        "--max-p95-ms", type=float, default=10.0,
+        help="fail if verify_password_async's p95 loop delay is above this",
+    )
+    args = parser.parse_args()
+
+    hashed = get_password_hash("correct-password")
+    interval = args.interval_ms / 1000
+    print(
+        f"hash workers={settings.password_hash_workers} queue={settings.password_hash_queue} "
+        f"logins={args.logins} interval={args.interval_ms:.0f} ms"
+    )
+    await run_mode("blocking verify_password", blocking_login, args.logins, interval, hashed)
+    p95 = await run_mode("verify_password_async", offloaded_login, args.logins, interval, hashed)
+
+    if p95 * 1000 > args.max_p95_ms:
+        print(f"[FAIL] verify_password_async p95 loop delay {p95 * 1000:.1f} ms is over {args.max_p95_ms:g} ms")
+        sys.exit(1)
+    print(f"[  ok] verify_password_async p95 loop delay {p95 * 1000:.1f} ms within {args.max_p95_ms:g} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
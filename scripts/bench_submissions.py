@@ -0,0 +1,155 @@
+"""
+Survey submission throughput: per-request commits versus group commit.
+
+Seeds a synthetic org with nothing submitted, gives 2 x --submissions
+assignments signed invite links, then submits them from --concurrency
+simulated clients, first half through the per-request path (each
+submission stores and commits in its own transaction) and second half
+through app.group_commit's writer. Each client does what submit_survey
+does after parsing the form: resolve the token, build the Submission and
+store it. Reports submissions per second, p50/p95 latency, commits and the
+writer's average batch size.
+
+Both paths share the app's connection pool (SQLAlchemy defaults: 5 + 10
+overflow), which caps how many per-request transactions run at once.
+
+WARNING: writes into the database configured by DATABASE_URL. Point it at a
+throwaway database.
+
+    python -m scripts.bench_submissions --submissions 2000 --concurrency 200
+    SUBMIT_BATCH_WINDOW_MS=10 python -m scripts.bench_submissions
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import List
+
+from sqlalchemy import bindparam, event, select, update
+
+from app import group_commit, models
+from app.config import settings
+from app.db import AsyncSessionLocal, engine
+from app.main import get_assignment_by_token, get_survey_data
+from app.security import hash_token, make_invite_token
+from app.utils import SCORES
+from scripts.seed import create_schema, seed_survey_data
+
+
+async def issue_tokens(count: int) -> List[str]:
+    """Signed links for the first `count` unsubmitted assignments."""
+    a = models.SurveyAssignment
+    async with AsyncSessionLocal() as session:
+        ids = (await session.execute(
+            select(a.id).where(a.is_submitted == False).order_by(a.id).limit(count)  # noqa: E712
+        )).scalars().all()
+        if len(ids) < count:
+            raise SystemExit(f"Only {len(ids)} unsubmitted assignments; seed a bigger org (--employees).")
+        tokens = [make_invite_token(assignment_id) for assignment_id in ids]
+        await session.execute(
+            update(a.__table__).where(a.__table__.c.id == bindparam("b_id")).values(invite_token_hash=bindparam("b_hash")),
+            [{"b_id": i, "b_hash": hash_token(t)} for i, t in zip(ids, tokens)],
+        )
+        await session.commit()
+    return tokens
+
+
+async def submit(token: str, rng: random.Random, use_writer: bool) -> bool:
+    """submit_survey's storage path without the HTTP and template layers."""
+    async with AsyncSessionLocal() as session:
+        assignment = await get_assignment_by_token(session, token)
+        employee = assignment.employee
+        survey_code, survey_info = get_survey_data(assignment.survey_name)
+        submission = group_commit.Submission(
+            assignment_id=assignment.id,
+            token_hash=assignment.invite_token_hash,
+            employee_id=employee.id,
+            department=employee.department,
+            position=employee.position,
+            manager_email=assignment.manager_email,
+            survey_code=survey_code,
+            scores=tuple(rng.choice(list(SCORES)) for _ in survey_info["questions"]),
+        )
+        if use_writer:
+            await session.close()
+            return await group_commit.writer.submit(submission)
+        stored = await group_commit.store_submissions(session, [submission])
+        await session.commit()
+        return submission.submission_hash in stored
+
+
+async def run_phase(label: str, tokens: List[str], concurrency: int, use_writer: bool, seed: int) -> None:
+    commits = 0
+
+    def on_commit(conn):
+        nonlocal commits
+        commits += 1
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for token in tokens:
+        queue.put_nowait(token)
+    latencies: List[float] = []
+    failures = 0
+
+    async def client(n: int) -> None:
+        nonlocal failures
+        rng = random.Random(seed + n)
+        while not queue.empty():
+            token = queue.get_nowait()
+            start = time.perf_counter()
+            if not await submit(token, rng, use_writer):
+                failures += 1
+            latencies.append(time.perf_counter() - start)
+
+    batches_before = group_commit.writer.batches
+    event.listen(engine.sync_engine, "commit", on_commit)
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(client(n) for n in range(concurrency)))
+    finally:
+        elapsed = time.perf_counter() - start
+        event.remove(engine.sync_engine, "commit", on_commit)
+
+    lat = sorted(latencies) or [0.0]
+    p95 = lat[max(0, int(len(lat) * 0.95) - 1)]
+    print(f"--- {label} ---")
+    print(f"submissions          {len(latencies) - failures} stored, {failures} rejected in {elapsed:.2f} s")
+    print(f"throughput           {len(latencies) / elapsed if elapsed else 0:,.1f} submissions/s")
+    print(f"latency              p50={statistics.median(lat) * 1000:.1f} ms  p95={p95 * 1000:.1f} ms  max={lat[-1] * 1000:.1f} ms")
+    line = f"commits              {commits}"
+    if use_writer:
+        batches = group_commit.writer.batches - batches_before
+        line += f"  ({batches} batches, {len(latencies) / batches if batches else 0:.1f} submissions/batch)"
+    print(line)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--submissions", type=int, default=2000, help="per phase")
+    parser.add_argument("--concurrency", type=int, default=200, help="simulated managers submitting at once")
+    parser.add_argument("--employees", type=int, default=2000)
+    parser.add_argument("--managers", type=int, default=600)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    await create_schema()
+    async with AsyncSessionLocal() as session:
+        await seed_survey_data(session, employees=args.employees, managers=args.managers, submitted_ratio=0.0)
+    tokens = await issue_tokens(2 * args.submissions)
+
+    print(
+        f"concurrency={args.concurrency} batch size={settings.submit_batch_size} "
+        f"window={settings.submit_batch_window_ms:g} ms"
+    )
+    try:
+        await run_phase("per-request commit", tokens[:args.submissions], args.concurrency, False, args.seed)
+        group_commit.writer.start()
+        await run_phase("group commit", tokens[args.submissions:], args.concurrency, True, args.seed)
+    finally:
+        await group_commit.writer.stop()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
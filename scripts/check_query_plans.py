@@ -0,0 +1,227 @@
+"""
+Query-plan regression check for the hot queries.
+
+Runs `EXPLAIN (ANALYZE, FORMAT JSON)` for each statement the admin pages,
+invite runs, employee toggle and survey submit issue, built from the same
+helpers the app uses. It fails (exit status 1) if a plan reads one of the
+check's large tables with a sequential scan, or if the planner's total cost
+exceeds the check's budget. Budgets are planner cost units for the default
+seed volume; scale them with --budget-scale for bigger datasets.
+
+Only SELECTs are explained, so nothing is written outside --seed.
+
+WARNING: --seed replaces the data in the database configured by
+DATABASE_URL. Point it at a throwaway database.
+
+    python -m scripts.check_query_plans --seed --employees 20000 --managers 2000
+    python -m scripts.check_query_plans --verbose
+"""
+import argparse
+import asyncio
+import json
+import sys
+from dataclasses import dataclass
+from typing import Iterator, List, Set
+
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import joinedload
+
+from app import models
+from app.dashboard import employee_averages_stmt, survey_summary_stmt
+from app.db import AsyncSessionLocal, engine
+from app.main import (
+    employee_filter_conditions,
+    employee_submission_scores_stmt,
+    pending_assignment_ids_stmt,
+)
+from scripts.seed import create_schema, seed_survey_data
+
+
+@dataclass
+class PlanCheck:
+    name: str
+    stmt: object
+    no_seq_scan: Set[str]  # tables that must be read through an index
+    max_cost: float
+
+
+@dataclass
+class PlanResult:
+    check: PlanCheck
+    cost: float
+    seq_scans: List[str]
+    time_ms: float
+    failures: List[str]
+
+
+def _nodes(plan: dict) -> Iterator[dict]:
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _nodes(child)
+
+
+async def build_checks(session) -> List[PlanCheck]:
+    """Statements parameterised with real values from the seeded data."""
+    a = models.SurveyAssignment
+    es = models.EmployeeSubmission
+
+    employee_id = (await session.execute(
+        select(es.employee_id).order_by(es.id).limit(1)
+    )).scalar_one()
+    assignment_id, manager_email, token_hash = (await session.execute(
+        select(a.id, a.manager_email, a.invite_token_hash).order_by(a.id).limit(1)
+    )).one()
+    department = (await session.execute(
+        select(models.Employee.department).order_by(models.Employee.id).limit(1)
+    )).scalar_one()
+    page_ids = (await session.execute(
+        select(models.Employee.id).order_by(models.Employee.id).limit(50)
+    )).scalars().all()
+
+    def employees_page(**filters):
+        return (
+            select(models.Employee)
+            .where(*employee_filter_conditions(**filters))
+            .order_by(models.Employee.id)
+            .limit(51)
+        )
+
+    hashes = select(es.submission_hash).where(es.employee_id == employee_id)
+    sr = models.survey_responses.c
+
+    return [
+        # Dashboard
+        PlanCheck("dashboard summary", survey_summary_stmt(), set(), 50000),
+        PlanCheck("dashboard employee averages", employee_averages_stmt(), set(), 5000),
+        # Employee directory
+        PlanCheck("directory first page", employees_page(), {"employees"}, 100),
+        PlanCheck("directory by department", employees_page(department=department), set(), 2000),
+        PlanCheck("directory by manager", employees_page(manager=manager_email), {"survey_assignments"}, 2000),
+        PlanCheck(
+            "directory departments",
+            select(models.Employee.department).distinct().order_by(models.Employee.department),
+            set(),
+            5000,
+        ),
+        PlanCheck(
+            "directory page rollups",
+            select(models.EmployeeScoreRollup).where(models.EmployeeScoreRollup.employee_id.in_(page_ids)),
+            {"employee_score_rollups"},
+            1000,
+        ),
+        PlanCheck(
+            "employee details scores",
+            employee_submission_scores_stmt(employee_id),
+            {"employee_submissions", "submission_scores"},
+            200,
+        ),
+        # Invite and reminder runs (org-wide runs read most pending rows, so
+        # only their cost is budgeted)
+        PlanCheck("invite run", pending_assignment_ids_stmt(False), set(), 50000),
+        PlanCheck("reminder run", pending_assignment_ids_stmt(True), set(), 50000),
+        PlanCheck(
+            "invite one employee",
+            pending_assignment_ids_stmt(False, employee_id),
+            {"survey_assignments"},
+            100,
+        ),
+        # Employee toggle (the selects behind its deletes)
+        PlanCheck(
+            "toggle per-question scores",
+            select(sr.survey_name, sr.question_no, func.sum(sr.score), func.count())
+            .where(sr.submission_hash.in_(hashes))
+            .group_by(sr.survey_name, sr.question_no),
+            {"employee_submissions", "submission_scores"},
+            500,
+        ),
+        PlanCheck(
+            "toggle submission totals",
+            select(models.SubmissionTotal).where(models.SubmissionTotal.employee_id == employee_id),
+            {"submission_totals"},
+            100,
+        ),
+        PlanCheck(
+            "toggle submissions",
+            select(es).where(es.employee_id == employee_id),
+            {"employee_submissions"},
+            100,
+        ),
+        # Survey form and submit: signed tokens carry the assignment id, so
+        # get_assignment_by_token loads by primary key with its employee
+        PlanCheck(
+            "assignment by token",
+            select(a).options(joinedload(a.employee)).where(a.id == assignment_id),
+            {"survey_assignments", "employees"},
+            50,
+        ),
+        # ACCEPT_LEGACY_INVITE_TOKENS fallback for unsigned pre-rollout links
+        PlanCheck(
+            "assignment by legacy token",
+            select(a).options(joinedload(a.employee)).where(a.invite_token_hash == token_hash),
+            {"survey_assignments", "employees"},
+            50,
+        ),
+    ]
+
+
+async def explain(session, check: PlanCheck, budget_scale: float) -> PlanResult:
+    sql = str(check.stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    raw = (await session.execute(text(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}"))).scalar_one()
+    doc = json.loads(raw) if isinstance(raw, str) else raw
+    plan = doc[0]["Plan"]
+
+    seq_scans = [n["Relation Name"] for n in _nodes(plan) if n["Node Type"] == "Seq Scan"]
+    cost = plan["Total Cost"]
+    budget = check.max_cost * budget_scale
+    failures = [f"sequential scan on {rel}" for rel in seq_scans if rel in check.no_seq_scan]
+    if cost > budget:
+        failures.append(f"cost {cost:,.0f} over budget {budget:,.0f}")
+    return PlanResult(check, cost, seq_scans, doc[0].get("Execution Time", 0.0), failures)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", action="store_true", help="replace the data with synthetic rows first")
+    parser.add_argument("--employees", type=int, default=20000)
+    parser.add_argument("--managers", type=int, default=2000)
+    parser.add_argument("--budget-scale", type=float, default=1.0)
+    parser.add_argument("--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args()
+
+    if args.seed:
+        await create_schema()
+        async with AsyncSessionLocal() as session:
+            await seed_survey_data(session, employees=args.employees, managers=args.managers)
+
+    # Fresh statistics so the plans match what production would choose
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("VACUUM ANALYZE"))
+
+    results = []
+    async with AsyncSessionLocal() as session:
+        for check in await build_checks(session):
+            results.append(await explain(session, check, args.budget_scale))
+            if args.verbose:
+                sql = check.stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+                plan = (await session.execute(text(f"EXPLAIN {sql}"))).scalars().all()
+                print(f"--- {check.name} ---")
+                print("\n".join(plan))
+        await session.rollback()
+    await engine.dispose()
+
+    failed = 0
+    for r in results:
+        status = "FAIL" if r.failures else "ok"
+        failed += bool(r.failures)
+        seq = f"  seq scans: {', '.join(r.seq_scans)}" if r.seq_scans else ""
+        print(f"[{status:>4}] {r.check.name:<30} cost={r.cost:>10,.0f}  time={r.time_ms:>8.2f} ms{seq}")
+        for failure in r.failures:
+            print(f"       {failure}")
+    print(f"{len(results) - failed}/{len(results)} plans within budget")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
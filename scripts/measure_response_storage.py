@@ -0,0 +1,122 @@
+"""
+On-disk size of the two survey answer layouts.
+
+Builds scratch copies of both layouts with the same synthetic submissions:
+the old one-row-per-answer survey_responses table (serial id primary key)
+and submission_scores (one row per submission, SMALLINT[] of answers, hash
+primary key). Reports heap, index and total size of each plus the ratio.
+The scratch tables are dropped afterwards, and the app's tables are only
+read, for the live size line.
+
+    python -m scripts.measure_response_storage --submissions 100000 --questions 12
+"""
+import argparse
+import asyncio
+
+from sqlalchemy import text
+
+from app.db import engine
+
+ROWS_TABLE = "measure_rows_layout"
+ARRAY_TABLE = "measure_array_layout"
+
+CREATE = [
+    f"""
+    CREATE TABLE {ROWS_TABLE} (
+        id serial PRIMARY KEY,
+        submission_hash varchar(128) NOT NULL,
+        survey_name varchar(50) NOT NULL,
+        department varchar(255) NOT NULL,
+        question_no integer NOT NULL,
+        score integer NOT NULL,
+        created_at timestamp NOT NULL
+    )
+    """,
+    f"""
+    CREATE TABLE {ARRAY_TABLE} (
+        submission_hash varchar(128) PRIMARY KEY,
+        survey_name varchar(50) NOT NULL,
+        department varchar(255) NOT NULL,
+        scores smallint[] NOT NULL,
+        created_at timestamp NOT NULL
+    )
+    """,
+]
+
+# Same submissions in both layouts: 64-hex-char hashes like secrets.token_hex(32)
+FILL = [
+    f"""
+    INSERT INTO {ARRAY_TABLE} (submission_hash, survey_name, department, scores, created_at)
+    SELECT md5(g::text) || md5((g + 1)::text),
+           (ARRAY['MSES', 'ICSES', 'TSES'])[1 + g % 3],
+           (ARRAY['Operations', 'Engineering', 'People', 'Finance', 'Sales', 'Legal'])[1 + g % 6],
+           ARRAY(SELECT (1 + (g * 7 + q) % 5)::smallint FROM generate_series(1, :questions) q),
+           now()
+    FROM generate_series(1, :submissions) g
+    """,
+    f"""
+    INSERT INTO {ROWS_TABLE} (submission_hash, survey_name, department, question_no, score, created_at)
+    SELECT s.submission_hash, s.survey_name, s.department, r.question_no, r.score, s.created_at
+    FROM {ARRAY_TABLE} s
+    CROSS JOIN LATERAL unnest(s.scores) WITH ORDINALITY AS r(score, question_no)
+    ORDER BY s.submission_hash, r.question_no
+    """,
+]
+
+SIZES = """
+SELECT pg_table_size(CAST(:name AS regclass)),
+       pg_indexes_size(CAST(:name AS regclass)),
+       pg_total_relation_size(CAST(:name AS regclass))
+"""
+
+
+def _mb(size: int) -> str:
+    return f"{size / 1024 / 1024:8.1f} MB"
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--submissions", type=int, default=100000)
+    parser.add_argument("--questions", type=int, default=12, help="answers per submission (MSES 12, TSES 16)")
+    args = parser.parse_args()
+
+    async with engine.begin() as conn:
+        for name in (ROWS_TABLE, ARRAY_TABLE):
+            await conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+        for stmt in CREATE:
+            await conn.execute(text(stmt))
+        for stmt in FILL:
+            await conn.execute(text(stmt), {"submissions": args.submissions, "questions": args.questions})
+
+    # VACUUM cannot run in a transaction; it settles the visibility map and FSM
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        for name in (ROWS_TABLE, ARRAY_TABLE):
+            await conn.execute(text(f"VACUUM ANALYZE {name}"))
+
+    try:
+        async with engine.connect() as conn:
+            sizes = {}
+            for label, name in (("row per answer", ROWS_TABLE), ("score array", ARRAY_TABLE)):
+                sizes[label] = (await conn.execute(text(SIZES), {"name": name})).one()
+            live = (await conn.execute(
+                text("SELECT count(*), pg_total_relation_size('submission_scores') FROM submission_scores")
+            )).one()
+    finally:
+        async with engine.begin() as conn:
+            for name in (ROWS_TABLE, ARRAY_TABLE):
+                await conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+        await engine.dispose()
+
+    print(f"{args.submissions} submissions x {args.questions} answers")
+    print(f"{'layout':<16}{'heap':>12}{'indexes':>12}{'total':>12}{'bytes/submission':>18}")
+    for label, (heap, indexes, total) in sizes.items():
+        print(f"{label:<16}{_mb(heap):>12}{_mb(indexes):>12}{_mb(total):>12}{total / args.submissions:>18.0f}")
+    rows_total = sizes["row per answer"][2]
+    array_total = sizes["score array"][2]
+    print(f"reduction       {rows_total / array_total:.1f}x smaller")
+    print(f"live            submission_scores holds {live[0]} submissions in {_mb(live[1]).strip()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
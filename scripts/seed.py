@@ -0,0 +1,111 @@
+"""
+Synthetic data for the benchmark scripts.
+
+WARNING: seeding writes into the database configured by DATABASE_URL. Point it
+at a throwaway database.
+"""
+import random
+import secrets
+import datetime as dt
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+from app.db import Base, engine
+from app.rollups import rebuild_rollups
+from app.utils import SURVEY_DETAILS, hash_token
+
+DEPARTMENTS = ["Operations", "Engineering", "People", "Finance", "Sales", "Legal"]
+POSITIONS = ["Analyst", "Associate", "Manager", "Senior Manager", "Director"]
+
+
+async def create_schema() -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def seed_survey_data(
+    session: AsyncSession,
+    *,
+    employees: int,
+    managers: int,
+    managers_per_employee: int = 2,
+    submitted_ratio: float = 0.6,
+    seed: int = 42,
+) -> None:
+    """
+    Replaces employees/assignments/submissions with `employees` synthetic
+    employees, each assigned every survey by `managers_per_employee` of
+    `managers` managers, and submits `submitted_ratio` of the assignments.
+    """
+    rng = random.Random(seed)
+    await session.execute(delete(models.SubmissionScores))
+    await session.execute(delete(models.EmployeeSubmission))
+    await session.execute(delete(models.Employee))
+
+    emp_rows = [
+        {
+            "name": f"Employee {i}",
+            "email": f"employee{i}@example.com",
+            "department": rng.choice(DEPARTMENTS),
+            "position": rng.choice(POSITIONS),
+            "is_active": True,
+            "created_at": dt.datetime.utcnow(),
+        }
+        for i in range(employees)
+    ]
+    await session.execute(insert(models.Employee), emp_rows)
+    emp_ids = (await session.execute(select(models.Employee.id).order_by(models.Employee.id))).scalars().all()
+
+    now = dt.datetime.utcnow()
+    assignment_rows = []
+    submission_rows = []
+    score_rows = []
+    for emp_id in emp_ids:
+        dept = rng.choice(DEPARTMENTS)
+        for m in rng.sample(range(managers), min(managers_per_employee, managers)):
+            for survey_code, info in SURVEY_DETAILS.items():
+                submitted = rng.random() < submitted_ratio
+                assignment_rows.append({
+                    "employee_id": emp_id,
+                    "manager_email": f"manager{m}@example.com",
+                    "manager_name": f"Manager {m}",
+                    "survey_name": survey_code,
+                    "invite_token_hash": hash_token(secrets.token_urlsafe(32)),
+                    "invited_at": None,
+                    "is_submitted": submitted,
+                    "submitted_at": now if submitted else None,
+                })
+                if not submitted:
+                    continue
+                submission_hash = secrets.token_hex(32)
+                submission_rows.append({
+                    "employee_id": emp_id,
+                    "survey_name": survey_code,
+                    "manager_email": f"manager{m}@example.com",
+                    "submission_hash": submission_hash,
+                    "submitted_at": now,
+                })
+                score_rows.append({
+                    "submission_hash": submission_hash,
+                    "survey_name": survey_code,
+                    "department": dept,
+                    "scores": [rng.randint(1, 5) for _ in info["questions"]],
+                    "created_at": now,
+                })
+
+    for model, rows in (
+        (models.SurveyAssignment, assignment_rows),
+        (models.EmployeeSubmission, submission_rows),
+        (models.SubmissionScores, score_rows),
+    ):
+        for i in range(0, len(rows), 5000):
+            await session.execute(insert(model), rows[i:i + 5000])
+
+    await rebuild_rollups(session)
+    await session.commit()
+    print(
+        f"[INFO] Seeded {len(emp_ids)} employees, {len(assignment_rows)} assignments, "
+        f"{len(submission_rows)} submissions, {sum(len(r['scores']) for r in score_rows)} responses."
+    )